@@ -8,6 +8,9 @@ Endpoints para administración de módulos
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
 from main import get_db, MedicalModule, License, LicenseType
+from invalidation import invalidation_bus, SCOPE_CATALOG
+from single_flight import validation_flights
+from admission import admission
 from datetime import datetime
 import logging
 
@@ -85,6 +88,7 @@ async def create_module(module_data: dict, db: Session = Depends(get_db)):
             new_module.created_at = datetime.utcnow()
         
         db.add(new_module)
+        invalidation_bus.publish(db, SCOPE_CATALOG, new_module.name)
         db.commit()
         db.refresh(new_module)
         
@@ -116,6 +120,9 @@ async def update_module(module_id: int, module_data: dict, db: Session = Depends
         if not module:
             raise HTTPException(status_code=404, detail="Módulo no encontrado")
         
+        # Invalidar también el nombre anterior si se renombra
+        invalidation_bus.publish(db, SCOPE_CATALOG, module.name)
+        
         # Actualizar campos básicos
         basic_fields = ["name", "display_name", "description", "version", "category", "min_license_level"]
         for field in basic_fields:
@@ -167,6 +174,7 @@ async def delete_module(module_id: int, db: Session = Depends(get_db)):
         
         module_name = module.name
         db.delete(module)
+        invalidation_bus.publish(db, SCOPE_CATALOG, module_name)
         db.commit()
         
         logger.info(f"Módulo eliminado: {module_name}")
@@ -213,7 +221,11 @@ async def get_admin_stats(db: Session = Depends(get_db)):
                 "modules_by_category": modules_by_category,
                 "core_modules": core_modules,
                 "custom_modules": custom_modules,
-                "categories": list(modules_by_category.keys())
+                "categories": list(modules_by_category.keys()),
+                # Validaciones idénticas concurrentes resueltas con una sola consulta (este worker)
+                "validations_executed": validation_flights.stats["executed"],
+                "validations_coalesced": validation_flights.stats["coalesced"],
+                "admission": admission.stats
             }
         }
     except Exception as e:
@@ -275,6 +287,7 @@ async def create_license_type(license_type_data: dict, db: Session = Depends(get
         )
         
         db.add(new_license_type)
+        invalidation_bus.publish(db, SCOPE_CATALOG, new_license_type.name)
         db.commit()
         db.refresh(new_license_type)
         
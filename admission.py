@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+Admission Control
+=================
+Control de admisión por clase de ruta para que el tráfico de administración no
+deje sin servicio a la validación de licencias.
+
+Cada request entra por un carril con su propio límite de concurrencia y su cola:
+
+- ``validation``: ``/license/validate``, ``/license/validate/batch`` y
+  ``/license/seat/release``.
+- ``admin``: ``/admin/*`` y el feed ``/sync/*`` (listados completos, compras,
+  importaciones, exportaciones).
+- ``default``: el resto.
+
+Los streams SSE y ``/health`` quedan fuera: duran lo que dure la conexión. Los
+montajes estáticos (``/static``, ``/js``, ``/css``, ``/assets``) tampoco pasan:
+no usan la base de datos y no deben gastar el cupo de admin y default.
+
+Cuando un carril está lleno la request espera en su cola, con un plazo máximo
+(``*_WAIT_MS``). La espera se estima con el tiempo medio de servicio del
+carril; si la estimación ya supera el plazo, o la cola está llena, se responde
+503 con ``Retry-After`` sin hacer esperar al cliente. Al liberarse un hueco se
+atiende primero a validation, luego default y por último admin.
+
+Reserva de conexiones: admin y default comparten un cupo de
+``capacidad del pool - SAPIENTIA_VALIDATION_RESERVED_CONNECTIONS`` requests en
+curso (cada request usa como mucho una sesión de get_db). Las conexiones
+restantes del pool del worker quedan siempre para validation.
+
+``SAPIENTIA_ADMISSION=0`` desactiva el control.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from static_assets import STATIC_PREFIXES
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("SAPIENTIA_ADMISSION", "1") == "1"
+RESERVED_CONNECTIONS = int(os.getenv("SAPIENTIA_VALIDATION_RESERVED_CONNECTIONS", 4))
+
+LANE_VALIDATION = "validation"
+LANE_ADMIN = "admin"
+LANE_DEFAULT = "default"
+
+# Orden en que se reparten los huecos libres
+PRIORITY = (LANE_VALIDATION, LANE_DEFAULT, LANE_ADMIN)
+
+# (concurrencia, cola, espera máxima en ms) por defecto de cada carril
+LANE_DEFAULTS = {
+    LANE_VALIDATION: (64, 256, 2000),
+    LANE_DEFAULT: (16, 128, 5000),
+    LANE_ADMIN: (4, 32, 10000),
+}
+
+VALIDATION_PATHS = ("/license/validate", "/license/seat/release")
+ADMIN_PATHS = ("/admin/", "/sync/")
+EXEMPT_PATHS = ("/health", "/license/events/", "/admin/stream") + STATIC_PREFIXES
+
+# Media móvil del tiempo de servicio (segundos)
+SERVICE_TIME_ALPHA = 0.2
+INITIAL_SERVICE_TIME = 0.1
+
+
+def _lane_setting(lane: str, name: str, index: int) -> int:
+    return int(os.getenv(f"SAPIENTIA_ADMISSION_{lane.upper()}_{name}", LANE_DEFAULTS[lane][index]))
+
+
+class Lane:
+    """Límite de concurrencia, cola FIFO y tiempo medio de servicio de una clase de rutas"""
+
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait: float, shared: bool):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        # Cuenta contra el cupo compartido (todas menos validation)
+        self.shared = shared
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.service_time = INITIAL_SERVICE_TIME
+        self.stats = {"admitted": 0, "queued": 0, "shed": 0, "timeouts": 0}
+
+    @classmethod
+    def from_env(cls, name: str) -> "Lane":
+        return cls(
+            name,
+            limit=_lane_setting(name, "CONCURRENCY", 0),
+            max_queue=_lane_setting(name, "QUEUE", 1),
+            max_wait=_lane_setting(name, "WAIT_MS", 2) / 1000,
+            shared=name != LANE_VALIDATION
+        )
+
+
+class AdmissionController:
+    """Admite, encola o rechaza requests por carril (solo desde el event loop del worker)"""
+
+    def __init__(self, lanes: Dict[str, Lane], shared_limit: Optional[int] = None):
+        self.lanes = lanes
+        self.shared_limit = shared_limit
+        self.shared_active = 0
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        lanes = {name: Lane.from_env(name) for name in PRIORITY}
+        capacity = _pool_capacity()
+        shared_limit = None
+        if capacity is not None:
+            shared_limit = max(1, capacity - RESERVED_CONNECTIONS)
+            logger.info(f"Admisión: {shared_limit} de {capacity} conexiones del pool para admin/default, "
+                        f"{capacity - shared_limit} reservadas para validación")
+        return cls(lanes, shared_limit)
+
+    def classify(self, path: str) -> Optional[Lane]:
+        """Carril de una ruta o None si no pasa por el control de admisión"""
+        if path.startswith(EXEMPT_PATHS):
+            return None
+        if path.startswith(VALIDATION_PATHS):
+            return self.lanes[LANE_VALIDATION]
+        if path.startswith(ADMIN_PATHS):
+            return self.lanes[LANE_ADMIN]
+        return self.lanes[LANE_DEFAULT]
+
+    def _can_start(self, lane: Lane) -> bool:
+        if lane.active >= lane.limit:
+            return False
+        return not lane.shared or self.shared_limit is None or self.shared_active < self.shared_limit
+
+    def _start(self, lane: Lane):
+        lane.active += 1
+        lane.stats["admitted"] += 1
+        if lane.shared:
+            self.shared_active += 1
+
+    def estimated_wait(self, lane: Lane, position: int) -> float:
+        """Segundos hasta que la request en esa posición de la cola empiece"""
+        parallel = lane.limit
+        if lane.shared and self.shared_limit is not None:
+            parallel = min(parallel, self.shared_limit)
+        return math.ceil(position / max(1, parallel)) * lane.service_time
+
+    async def admit(self, lane: Lane) -> Optional[float]:
+        """None si la request puede seguir (ocupa un hueco) o los segundos de Retry-After"""
+        if not lane.waiters and self._can_start(lane):
+            self._start(lane)
+            return None
+
+        position = len(lane.waiters) + 1
+        estimate = self.estimated_wait(lane, position)
+        if len(lane.waiters) >= lane.max_queue or estimate > lane.max_wait:
+            # Falla rápido: esperar no serviría de nada
+            lane.stats["shed"] += 1
+            return estimate
+
+        future = asyncio.get_running_loop().create_future()
+        lane.waiters.append(future)
+        lane.stats["queued"] += 1
+        try:
+            await asyncio.wait_for(future, timeout=lane.max_wait)
+            return None
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # El hueco llegó a la vez que el plazo: se aprovecha
+                return None
+            self._discard(lane, future)
+            lane.stats["timeouts"] += 1
+            return self.estimated_wait(lane, len(lane.waiters) + 1)
+        except asyncio.CancelledError:
+            # Cliente desconectado: devolver el hueco si ya se le había asignado
+            if future.done() and not future.cancelled():
+                self.release(lane, None)
+            else:
+                self._discard(lane, future)
+            raise
+
+    def _discard(self, lane: Lane, future: asyncio.Future):
+        try:
+            lane.waiters.remove(future)
+        except ValueError:
+            pass
+
+    def release(self, lane: Lane, elapsed: Optional[float]):
+        lane.active -= 1
+        if lane.shared:
+            self.shared_active -= 1
+        if elapsed is not None:
+            lane.service_time += SERVICE_TIME_ALPHA * (elapsed - lane.service_time)
+        self._wake()
+
+    def _wake(self):
+        """Reparte los huecos libres por prioridad de carril"""
+        for name in PRIORITY:
+            lane = self.lanes[name]
+            while lane.waiters and self._can_start(lane):
+                future = lane.waiters.popleft()
+                if future.done():
+                    continue
+                self._start(lane)
+                future.set_result(None)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "shared_limit": self.shared_limit,
+            "shared_active": self.shared_active,
+            "lanes": {
+                name: {
+                    **lane.stats,
+                    "active": lane.active,
+                    "waiting": len(lane.waiters),
+                    "limit": lane.limit,
+                    "service_ms": round(lane.service_time * 1000, 1)
+                }
+                for name, lane in self.lanes.items()
+            }
+        }
+
+
+def _pool_capacity() -> Optional[int]:
+    """Conexiones máximas del pool del engine (None si no está acotado o no es un QueuePool)"""
+    from main import engine
+
+    pool = engine.pool
+    if not hasattr(pool, "size"):
+        return None
+    # QueuePool no expone max_overflow; -1 significa sin límite
+    max_overflow = getattr(pool, "_max_overflow", 0)
+    if max_overflow < 0:
+        return None
+    return pool.size() + max_overflow
+
+
+class AdmissionMiddleware:
+    """Middleware ASGI: cada request ocupa un hueco de su carril o recibe 503 + Retry-After"""
+
+    def __init__(self, app, controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.controller = controller or admission
+
+    async def __call__(self, scope, receive, send):
+        lane = self.controller.classify(scope["path"]) if ENABLED and scope["type"] == "http" else None
+        if lane is None:
+            return await self.app(scope, receive, send)
+
+        retry_after = await self.controller.admit(lane)
+        if retry_after is not None:
+            body = json.dumps({
+                "detail": "Servidor saturado, reintente más tarde",
+                "lane": lane.name
+            }).encode()
+            await send({"type": "http.response.start", "status": 503, "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode())
+            ]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(lane, time.monotonic() - started)
+
+
+# Instancia del proceso
+admission = AdmissionController.from_env()
@@ -5,8 +5,18 @@ from main import app, get_db
 from license_endpoints import router as license_router
 from admin_endpoints import admin_router
 from control_endpoints import control_router
-from utils import populate_initial_data
+from sync_endpoints import sync_router, ensure_change_log_baseline, compact_periodically
+from utils import populate_initial_data, run_migrations, load_monitor
+from invalidation import invalidation_bus
+from license_index import license_index
+from expiry import expiry_sweeper
+from group_commit import group_committer
+from idempotency import IdempotencyMiddleware
+from admission import AdmissionMiddleware
+from fastapi import Request
+import asyncio
 import logging
+import os
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -17,23 +27,68 @@ try:
     app.include_router(license_router)
     app.include_router(admin_router)
     app.include_router(control_router)
+    app.include_router(sync_router)
     logger.info("✅ Todos los endpoints cargados correctamente")
 except Exception as e:
     logger.error(f"❌ Error cargando endpoints: {e}")
 
+# Medir requests en curso (usado para estirar next_check_after bajo carga)
+@app.middleware("http")
+async def track_in_flight(request: Request, call_next):
+    load_monitor.enter()
+    try:
+        return await call_next(request)
+    finally:
+        load_monitor.exit()
+
+# Carriles de admisión: el tráfico de administración no puede dejar sin servicio a la validación
+app.add_middleware(AdmissionMiddleware)
+
+# Reintentos con Idempotency-Key: una ejecución por clave y el resto recibe la respuesta guardada.
+# Se añade después, así que queda por fuera de la admisión. Las repeticiones no ocupan hueco.
+app.add_middleware(IdempotencyMiddleware)
+
 # Cargar datos iniciales al startup
 @app.on_event("startup")
 async def startup_event():
     """Eventos de inicio"""
     try:
-        # Cargar datos iniciales
+        # Con server_launcher.py la carga inicial ya la hizo el proceso master antes del fork
+        if os.getenv("SAPIENTIA_SEEDED_BY_MASTER") != "1":
+            run_migrations()
+            db = next(get_db())
+            populate_initial_data(db)
+            db.close()
+        
+        # Feed de cambios: estado inicial si la tabla está vacía y compactación periódica
         db = next(get_db())
-        populate_initial_data(db)
-        db.close()
+        try:
+            ensure_change_log_baseline(db)
+        finally:
+            db.close()
+        app.state.change_log_compactor = asyncio.create_task(compact_periodically())
+        # Barrido de licencias vencidas
+        app.state.expiry_sweeper = asyncio.create_task(expiry_sweeper.run())
+        
+        # Invalidaciones de otros workers/nodos (LISTEN/NOTIFY o tabla en SQLite)
+        invalidation_bus.start()
+        # Índice de licencias en memoria compartida (SAPIENTIA_SHM_INDEX=1)
+        license_index.start()
         logger.info("✅ Servidor iniciado correctamente")
     except Exception as e:
         logger.error(f"❌ Error en startup: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Eventos de cierre"""
+    for name in ("change_log_compactor", "expiry_sweeper"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    group_committer.stop()
+    license_index.stop()
+    invalidation_bus.stop()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# build_assets.py - PIPELINE DE ASSETS ESTÁTICOS DEL FRONTEND
+# ============================================================================
+#
+# Por cada página HTML del frontend:
+#   1. Junta sus hojas de estilo locales (resolviendo @import) y sus scripts
+#      locales en un bundle CSS y un bundle JS, en el mismo orden de la página
+#   2. Minifica de forma conservadora (comentarios y espacios)
+#   3. Escribe los bundles con el hash del contenido en el nombre
+#      (index.3f9a1c2b.js) más variantes precomprimidas .gz y .br
+#   4. Reescribe el HTML para apuntar a los bundles
+#   5. Los módulos que navigation.js carga con import() ('/js/modules/*.js')
+#      se publican por separado, con hash, y se reescriben sus rutas en el bundle
+#
+# El servidor (static_assets.py) sirve la variante precomprimida y marca los
+# archivos con hash como 'immutable', así la compresión no consume CPU de la API.
+#
+# Uso:  python build_assets.py [--out build/frontend]
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+try:
+    import brotli  # opcional
+except ImportError:
+    brotli = None
+
+BASE_DIR = Path(__file__).resolve().parent
+FRONTEND_DIR = BASE_DIR / "frontend"
+DEFAULT_OUT_DIR = Path(os.getenv("SAPIENTIA_ASSET_DIR", BASE_DIR / "build" / "frontend"))
+
+# Prefijo URL bajo el que integration_server monta los bundles
+PUBLIC_PREFIX = "/static"
+
+PAGES = ["index.html"]
+
+LINK_RE = re.compile(r'[ \t]*<link\s+rel="stylesheet"\s+href="(?!https?:|//)([^"]+)"\s*/?>[ \t]*\n?')
+SCRIPT_RE = re.compile(r'[ \t]*<script\s+src="(?!https?:|//)([^"]+)"\s*>\s*</script>[ \t]*\n?')
+CSS_IMPORT_RE = re.compile(r"@import\s+url\(\s*['\"]?([^'\")]+)['\"]?\s*\)\s*;")
+CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+LAZY_MODULE_RE = re.compile(r"(['\"])/(js/modules/[\w.-]+\.js)\1")
+
+
+# ============================================================================
+# MINIFICACIÓN CONSERVADORA
+# ============================================================================
+
+def minify_css(css: str) -> str:
+    css = CSS_COMMENT_RE.sub("", css)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    # Solo el espacio tras ':' (antes podría ser un selector descendiente, p.ej. 'div :hover')
+    css = re.sub(r":\s+", ":", css)
+    css = css.replace(";}", "}")
+    return css.strip()
+
+
+def minify_js(js: str) -> str:
+    """Quita indentación, líneas vacías y líneas que son solo comentario '//'
+
+    No toca el contenido de las líneas: los saltos de línea se conservan,
+    así que la inserción automática de ';' se comporta igual que en el original.
+    """
+    lines = []
+    for line in js.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("//"):
+            continue
+        lines.append(stripped)
+    return "\n".join(lines)
+
+
+# ============================================================================
+# BUNDLES
+# ============================================================================
+
+def read_css(path: Path, seen: set) -> str:
+    """Lee un CSS resolviendo sus @import locales (cada archivo una sola vez)"""
+    path = path.resolve()
+    if path in seen:
+        return ""
+    seen.add(path)
+
+    css = path.read_text(encoding="utf-8")
+
+    def inline(match):
+        target = match.group(1)
+        if target.startswith(("http:", "https:", "//")):
+            return match.group(0)
+        return read_css(path.parent / target, seen)
+
+    return CSS_IMPORT_RE.sub(inline, css)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def write_asset(out_dir: Path, stem: str, ext: str, text: str) -> str:
+    """Escribe el bundle con hash y sus variantes comprimidas; devuelve el nombre"""
+    data = text.encode("utf-8")
+    name = f"{stem}.{content_hash(data)}.{ext}"
+    target = out_dir / name
+
+    target.write_bytes(data)
+    with open(f"{target}.gz", "wb") as fh:
+        # mtime=0: el .gz es reproducible y no cambia entre builds
+        fh.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        Path(f"{target}.br").write_bytes(brotli.compress(data, quality=11))
+
+    return name
+
+
+def publish_lazy_modules(js: str, out_dir: Path, published: dict) -> str:
+    """Publica con hash los módulos cargados con import() y reescribe sus rutas"""
+    def rewrite(match):
+        quote, src = match.groups()
+        if src not in published:
+            source = minify_js((FRONTEND_DIR / src).read_text(encoding="utf-8"))
+            published[src] = write_asset(out_dir, Path(src).stem, "js", source)
+        return f"{quote}{PUBLIC_PREFIX}/{published[src]}{quote}"
+
+    return LAZY_MODULE_RE.sub(rewrite, js)
+
+
+def build_page(page: str, out_dir: Path) -> dict:
+    html_path = FRONTEND_DIR / page
+    html = html_path.read_text(encoding="utf-8")
+    stem = Path(page).stem
+
+    stylesheets = LINK_RE.findall(html)
+    scripts = SCRIPT_RE.findall(html)
+
+    seen = set()
+    css = "\n".join(read_css(FRONTEND_DIR / href, seen) for href in stylesheets)
+    js = "\n;\n".join(
+        f"/* {src} */\n" + minify_js((FRONTEND_DIR / src).read_text(encoding="utf-8"))
+        for src in scripts
+    )
+    lazy_modules = {}
+    js = publish_lazy_modules(js, out_dir, lazy_modules)
+
+    css_name = write_asset(out_dir, stem, "css", minify_css(css)) if stylesheets else None
+    js_name = write_asset(out_dir, stem, "js", js) if scripts else None
+
+    # Reemplazar el primer <link>/<script> local por el bundle y eliminar el resto
+    def replace_first(regex, replacement, text):
+        state = {"done": False}
+
+        def sub(match):
+            if state["done"]:
+                return ""
+            state["done"] = True
+            indent = re.match(r"[ \t]*", match.group(0)).group(0)
+            return f"{indent}{replacement}\n"
+
+        return regex.sub(sub, text)
+
+    if css_name:
+        html = replace_first(LINK_RE, f'<link rel="stylesheet" href="{PUBLIC_PREFIX}/{css_name}">', html)
+    if js_name:
+        html = replace_first(SCRIPT_RE, f'<script src="{PUBLIC_PREFIX}/{js_name}"></script>', html)
+
+    # El HTML se reemplaza de forma atómica; los bundles anteriores se conservan
+    # para los navegadores que aún tengan la versión previa de la página
+    tmp_path = out_dir / f".{page}.tmp"
+    tmp_path.write_text(html, encoding="utf-8")
+    os.replace(tmp_path, out_dir / page)
+
+    return {
+        "page": page,
+        "css": css_name,
+        "js": js_name,
+        "stylesheets": stylesheets,
+        "scripts": scripts,
+        "lazy_modules": lazy_modules
+    }
+
+
+def build(out_dir: Path = DEFAULT_OUT_DIR) -> dict:
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest = {"pages": [build_page(page, out_dir) for page in PAGES]}
+    (out_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construye los bundles estáticos del frontend")
+    parser.add_argument("--out", type=Path, default=DEFAULT_OUT_DIR, help="Directorio de salida")
+    args = parser.parse_args()
+
+    print("📦 Construyendo assets del frontend...")
+    manifest = build(args.out)
+    for page in manifest["pages"]:
+        print(f"✅ {page['page']}: {page['css']} ({len(page['stylesheets'])} CSS), "
+              f"{page['js']} ({len(page['scripts'])} JS), "
+              f"{len(page['lazy_modules'])} módulos diferidos")
+    if brotli is None:
+        print("⚠️ Módulo 'brotli' no instalado: solo se generaron variantes .gz")
+    print(f"📁 Salida: {args.out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+"""
+Two-Tier Cache
+==============
+Caché de dos niveles para estado de validación de licencias, snapshots del
+catálogo y agregados del dashboard:
+
+- L1: LRU en memoria del worker, pequeña y con TTL corto
+- L2: Redis compartido por todos los workers y nodos (opcional)
+
+Sin Redis configurado (``SAPIENTIA_REDIS_URL``), o si deja de responder, la
+caché funciona solo con L1 y reintenta la conexión pasado un tiempo: una caída
+de Redis nunca rompe una request, solo la hace ir a la base de datos.
+
+La coherencia entre workers la da el bus de invalidación (invalidation.py):
+el proceso que hace el cambio borra la entrada en L2 y todos los workers la
+descartan de su L1 con ``invalidate``.
+
+Cada entrada guarda el instante en que empezó su carga. Cada worker recuerda
+cuándo recibió la última invalidación de cada clave y descarta las entradas
+cargadas antes. Así no importa el orden entre el aviso del bus y el borrado en
+L2 que hace el proceso de origen (un worker que recarga desde L2 antes de ese
+borrado no recupera el valor viejo), y un loader que leyó la base de datos
+antes del commit no deja su resultado en ninguna caché. A las entradas de L2,
+escritas quizá por otro nodo, se les exige además ``CLOCK_SKEW_SECONDS`` de
+margen.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional
+
+try:
+    import redis  # opcional
+except ImportError:
+    redis = None
+
+from invalidation import invalidation_bus, change_keys, SCOPE_LICENSE, SCOPE_CATALOG
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("SAPIENTIA_REDIS_URL")
+KEY_PREFIX = os.getenv("SAPIENTIA_CACHE_PREFIX", "sapientia:")
+L1_MAX_ENTRIES = int(os.getenv("SAPIENTIA_L1_CACHE_SIZE", 4096))
+L1_TTL_SECONDS = float(os.getenv("SAPIENTIA_L1_CACHE_TTL", 5))
+REDIS_TIMEOUT_SECONDS = float(os.getenv("SAPIENTIA_REDIS_TIMEOUT", 0.1))
+REDIS_RETRY_SECONDS = 30
+# Margen por desfase de relojes entre nodos al comparar instantes de carga de L2
+CLOCK_SKEW_SECONDS = float(os.getenv("SAPIENTIA_CACHE_CLOCK_SKEW", 1.0))
+# Tiempo que se recuerda una invalidación (mayor que el TTL más largo en uso)
+INVALIDATION_MEMORY_SECONDS = 900
+MAX_INVALIDATIONS = 50000
+
+# Marca de "no existe" para cachear resultados negativos (clave inválida, etc.)
+MISSING = {"__missing__": True}
+
+
+class TwoTierCache:
+    """L1 en proceso + L2 Redis con modo degradado"""
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = REDIS_URL,
+        l1_max_entries: int = L1_MAX_ENTRIES,
+        l1_ttl: float = L1_TTL_SECONDS,
+        prefix: str = KEY_PREFIX
+    ):
+        self.redis_url = redis_url
+        self.l1_max_entries = l1_max_entries
+        self.l1_ttl = l1_ttl
+        self.prefix = prefix
+        self._l1: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # (namespace, key o None para todo el namespace) -> instante de la última invalidación
+        self._invalidated: Dict[tuple, float] = {}
+        self._client = None
+        self._retry_at = 0.0
+        self.stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "l2_errors": 0, "stale_rejected": 0}
+
+    # ------------------------------------------------------------------
+    # Redis (L2)
+    # ------------------------------------------------------------------
+
+    def _redis(self):
+        """Cliente Redis o None si no está configurado o está en pausa tras un error"""
+        if redis is None or not self.redis_url:
+            return None
+        if self._client is None:
+            if time.monotonic() < self._retry_at:
+                return None
+            self._client = redis.Redis.from_url(
+                self.redis_url,
+                socket_timeout=REDIS_TIMEOUT_SECONDS,
+                socket_connect_timeout=REDIS_TIMEOUT_SECONDS
+            )
+        return self._client
+
+    def _l2_failed(self, error: Exception):
+        """Pasa a modo degradado (solo L1) hasta el próximo reintento"""
+        self.stats["l2_errors"] += 1
+        if self._client is not None:
+            logger.warning(f"Redis no disponible, caché solo en memoria durante {REDIS_RETRY_SECONDS}s: {error}")
+        self._client = None
+        self._retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+    @property
+    def l2_available(self) -> bool:
+        return self._redis() is not None
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}{namespace}:{key}"
+
+    # ------------------------------------------------------------------
+    # L1
+    # ------------------------------------------------------------------
+
+    def _l1_get(self, namespace: str, key: str):
+        full_key = self._key(namespace, key)
+        with self._lock:
+            entry = self._l1.get(full_key)
+            if entry is None:
+                return None
+            expires_at, loaded_at, value = entry
+            if expires_at < time.monotonic() or not self._fresh(namespace, key, loaded_at):
+                del self._l1[full_key]
+                return None
+            self._l1.move_to_end(full_key)
+            return value
+
+    def _l1_set(self, full_key: str, value: Any, ttl: float, loaded_at: float):
+        with self._lock:
+            self._l1[full_key] = (time.monotonic() + min(ttl, self.l1_ttl), loaded_at, value)
+            self._l1.move_to_end(full_key)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # Versiones
+    # ------------------------------------------------------------------
+
+    def _fresh(self, namespace: str, key: str, loaded_at: float, margin: float = 0.0) -> bool:
+        """Si una entrada cargada en loaded_at es posterior a la última invalidación de su clave"""
+        invalidated_at = max(
+            self._invalidated.get((namespace, key), 0.0),
+            self._invalidated.get((namespace, None), 0.0)
+        )
+        return not invalidated_at or loaded_at > invalidated_at + margin
+
+    def _decode(self, namespace: str, key: str, raw) -> Optional[tuple]:
+        """(valor, instante de carga) de una entrada de L2, o None si es anterior a una invalidación"""
+        entry = json.loads(raw)
+        if isinstance(entry, dict) and "_loaded_at" in entry and "_value" in entry:
+            value, loaded_at = entry["_value"], entry["_loaded_at"]
+        else:
+            # Formato anterior, sin versión
+            value, loaded_at = entry, 0.0
+        if not self._fresh(namespace, key, loaded_at, CLOCK_SKEW_SECONDS):
+            self.stats["stale_rejected"] += 1
+            return None
+        return value, loaded_at
+
+    def _load(self, namespace: str, keys: list, loader: Callable[[], Any]):
+        """Ejecuta el loader; si alguna clave se invalidó durante la carga, lo repite una vez
+
+        Devuelve (resultado, instante de carga, ¿se puede guardar?).
+        """
+        for _ in range(2):
+            started = time.time()
+            value = loader()
+            if all(self._fresh(namespace, key, started) for key in keys):
+                return value, started, True
+        return value, started, False
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+
+    def get(self, namespace: str, key: str, loader: Optional[Callable[[], Any]] = None, ttl: float = 60):
+        """Valor cacheado; si no está y hay loader, lo carga y lo guarda en ambos niveles"""
+        full_key = self._key(namespace, key)
+
+        value = self._l1_get(namespace, key)
+        if value is not None:
+            self.stats["l1_hits"] += 1
+            return value
+
+        client = self._redis()
+        if client is not None:
+            try:
+                raw = client.get(full_key)
+                entry = self._decode(namespace, key, raw) if raw is not None else None
+                if entry is not None:
+                    value, loaded_at = entry
+                    self.stats["l2_hits"] += 1
+                    self._l1_set(full_key, value, ttl, loaded_at)
+                    return value
+            except Exception as e:
+                self._l2_failed(e)
+
+        self.stats["misses"] += 1
+        if loader is None:
+            return None
+        value, loaded_at, storable = self._load(namespace, [key], loader)
+        if value is not None and storable:
+            self.set(namespace, key, value, ttl, loaded_at)
+        return value
+
+    def get_many(
+        self,
+        namespace: str,
+        keys: Iterable[str],
+        loader: Optional[Callable[[list], Dict[str, Any]]] = None,
+        ttl: float = 60
+    ) -> Dict[str, Any]:
+        """Varias claves con un solo viaje a Redis (MGET); las que falten se cargan juntas"""
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, Any] = {}
+        pending = []
+        for key in keys:
+            value = self._l1_get(namespace, key)
+            if value is not None:
+                self.stats["l1_hits"] += 1
+                found[key] = value
+            else:
+                pending.append(key)
+
+        client = self._redis() if pending else None
+        if client is not None:
+            try:
+                raws = client.mget([self._key(namespace, key) for key in pending])
+                still_pending = []
+                for key, raw in zip(pending, raws):
+                    entry = self._decode(namespace, key, raw) if raw is not None else None
+                    if entry is None:
+                        still_pending.append(key)
+                        continue
+                    value, loaded_at = entry
+                    self.stats["l2_hits"] += 1
+                    found[key] = value
+                    self._l1_set(self._key(namespace, key), value, ttl, loaded_at)
+                pending = still_pending
+            except Exception as e:
+                self._l2_failed(e)
+
+        self.stats["misses"] += len(pending)
+        if pending and loader is not None:
+            loaded, loaded_at, storable = self._load(namespace, pending, lambda: loader(pending))
+            loaded = {key: value for key, value in loaded.items() if value is not None}
+            if storable:
+                self.set_many(namespace, loaded, ttl, loaded_at)
+            found.update(loaded)
+        return found
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float = 60, loaded_at: Optional[float] = None):
+        self.set_many(namespace, {key: value}, ttl, loaded_at)
+
+    def set_many(self, namespace: str, values: Dict[str, Any], ttl: float = 60, loaded_at: Optional[float] = None):
+        """Guarda en L1 y, con un pipeline, en L2; loaded_at: inicio de la lectura que produjo los valores"""
+        if not values:
+            return
+        if loaded_at is None:
+            loaded_at = time.time()
+        for key, value in values.items():
+            self._l1_set(self._key(namespace, key), value, ttl, loaded_at)
+
+        client = self._redis()
+        if client is None:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for key, value in values.items():
+                pipe.set(
+                    self._key(namespace, key),
+                    json.dumps({"_loaded_at": loaded_at, "_value": value}, default=str),
+                    ex=max(1, int(ttl))
+                )
+            pipe.execute()
+        except Exception as e:
+            self._l2_failed(e)
+
+    def invalidate(self, namespace: str, *keys: str, shared: bool = False):
+        """Marca claves (o, sin keys, todo el namespace) como cambiadas desde ahora
+
+        Descarta L1 y rechaza en adelante las entradas cargadas antes. Con shared=True
+        (proceso que hizo el cambio) borra también L2.
+        """
+        now = time.time()
+        with self._lock:
+            for key in keys or (None,):
+                self._invalidated[(namespace, key)] = now
+            if len(self._invalidated) > MAX_INVALIDATIONS:
+                cutoff = now - INVALIDATION_MEMORY_SECONDS
+                self._invalidated = {k: t for k, t in self._invalidated.items() if t >= cutoff}
+        if shared and keys:
+            self.delete(namespace, *keys)
+        elif keys:
+            for key in keys:
+                self.evict_local(namespace, key)
+        else:
+            self.evict_local(namespace)
+
+    def claim(self, namespace: str, key: str, ttl: float) -> Optional[bool]:
+        """Reserva una clave en L2 si nadie la tiene (SET NX); None sin Redis"""
+        client = self._redis()
+        if client is None:
+            return None
+        try:
+            return bool(client.set(self._key(namespace, key), "1", nx=True, ex=max(1, int(ttl))))
+        except Exception as e:
+            self._l2_failed(e)
+            return None
+
+    def evict_local(self, namespace: str, key: Optional[str] = None):
+        """Descarta de L1 una clave o, sin key, todo el namespace"""
+        with self._lock:
+            if key is not None:
+                self._l1.pop(self._key(namespace, key), None)
+                return
+            prefix = self._key(namespace, "")
+            for full_key in [k for k in self._l1 if k.startswith(prefix)]:
+                del self._l1[full_key]
+
+    def delete(self, namespace: str, *keys: str):
+        """Borra claves de ambos niveles"""
+        for key in keys:
+            self.evict_local(namespace, key)
+        client = self._redis()
+        if client is None or not keys:
+            return
+        try:
+            client.delete(*[self._key(namespace, key) for key in keys])
+        except Exception as e:
+            self._l2_failed(e)
+
+    def clear_local(self):
+        with self._lock:
+            self._l1.clear()
+
+
+# Instancia del proceso
+cache = TwoTierCache()
+
+
+# ============================================================================
+# NAMESPACES E INVALIDACIÓN
+# ============================================================================
+
+NS_LICENSE = "license"      # estado de validación por license_key
+NS_CATALOG = "catalog"      # snapshots de tipos de licencia y módulos
+NS_DASHBOARD = "dashboard"  # agregados del panel de administración
+NS_IDEMPOTENCY = "idempotency"            # respuestas guardadas por Idempotency-Key
+NS_IDEMPOTENCY_LOCK = "idempotency-lock"  # ejecución en curso de una Idempotency-Key
+
+CATALOG_KEYS = ("license_types", "modules")
+
+
+def _on_license_change(change: Dict[str, Any]):
+    keys = change_keys(change)
+    if keys:
+        # Quien hizo el cambio borra L2; el resto de workers solo su L1
+        cache.invalidate(NS_LICENSE, *keys, shared=change.get("origin") == invalidation_bus.origin)
+    cache.evict_local(NS_DASHBOARD)
+
+
+def _on_catalog_change(change: Dict[str, Any]):
+    if change.get("origin") == invalidation_bus.origin:
+        cache.invalidate(NS_CATALOG, *CATALOG_KEYS, shared=True)
+    else:
+        cache.invalidate(NS_CATALOG)
+    cache.evict_local(NS_DASHBOARD)
+
+
+invalidation_bus.subscribe(SCOPE_LICENSE, _on_license_change)
+invalidation_bus.subscribe(SCOPE_CATALOG, _on_catalog_change)
@@ -1,40 +1,78 @@
 # control_endpoints.py - CONTROL Y GESTIÓN DE LICENCIAS
 # -*- coding: utf-8 -*-
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, File, Request, UploadFile
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from main import get_db, License, LicenseValidation
-from schemas import DashboardStats, LicenseControlResponse
+from sqlalchemy import DateTime, case, delete, func, not_, or_, update
+from main import get_db, License, LicenseModule, LicenseType, LicenseValidation, MedicalModule
+from license_events import EVENT_REVOKED, EVENT_REACTIVATED, EVENT_RENEWED, EVENT_MODULES_CHANGED
+from invalidation import invalidation_bus, SCOPE_LICENSE
+from cache import cache, NS_DASHBOARD
+from dashboard_stream import hub as dashboard_hub
+from expiry import expiry_sweeper
+from group_commit import group_committer
+from sync_endpoints import lock_change_log, record_license_changes
+from license_import import import_licenses, iter_rows, ImportFormatError
+from schemas import (
+    BulkLicenseRequest, BulkRenewRequest, BulkStatusRequest,
+    DashboardStats, LicenseControlResponse, ModuleEntitlementRequest
+)
+from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import List
+from typing import List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
 control_router = APIRouter(prefix="/admin", tags=["License Control"])
 
+def compute_dashboard_stats(db: Session) -> dict:
+    """Estadísticas del dashboard (compartidas por el endpoint y el stream SSE)"""
+    total_licenses = db.query(License).count()
+    active_licenses = db.query(License).filter(License.is_active == True).count()
+    expired_licenses = License.expired_before(db, datetime.utcnow()).count()
+    
+    # Validaciones recientes (24 horas)
+    recent_validations = LicenseValidation.after(db, datetime.utcnow() - timedelta(hours=24)).count()
+    
+    return {
+        "total_licenses": total_licenses,
+        "active_licenses": active_licenses,
+        "expired_licenses": expired_licenses,
+        "recent_validations_24h": recent_validations
+    }
+
+# Los agregados se comparten entre workers vía caché: con N workers el costo
+# no se multiplica por N (ni por el número de pestañas abiertas)
+DASHBOARD_STATS_TTL = 5
+
+def cached_dashboard_stats(db: Session) -> dict:
+    return cache.get(NS_DASHBOARD, "stats", lambda: compute_dashboard_stats(db), ttl=DASHBOARD_STATS_TTL)
+
+def serialize_license(lic: License) -> dict:
+    """Representación de una licencia para el panel de control"""
+    return {
+        "id": lic.id,
+        "license_key": lic.license_key,
+        "client_name": lic.client_name,
+        "client_email": lic.client_email,
+        "license_type": lic.license_type,
+        "issued_date": lic.issued_date.isoformat() if lic.issued_date else None,
+        "expiry_date": lic.expiry_date.isoformat(),
+        "max_users": lic.max_users,
+        "current_users": lic.current_users or 0,
+        "allowed_modules": list(lic.allowed_modules),
+        "is_active": lic.is_active,
+        "expired_at": lic.expired_at.isoformat() if lic.expired_at else None,
+        "validation_count": lic.validation_count or 0
+    }
+
 @control_router.get("/dashboard")
 async def get_dashboard_stats(db: Session = Depends(get_db)):
     """Dashboard administrativo con estadísticas"""
     try:
-        total_licenses = db.query(License).count()
-        active_licenses = db.query(License).filter(License.is_active == True).count()
-        expired_licenses = db.query(License).filter(License.expiry_date < datetime.utcnow()).count()
-        
-        # Validaciones recientes (24 horas)
-        recent_validations = db.query(LicenseValidation).filter(
-            LicenseValidation.validation_time > datetime.utcnow() - timedelta(hours=24)
-        ).count()
-        
-        return {
-            "stats": {
-                "total_licenses": total_licenses,
-                "active_licenses": active_licenses,
-                "expired_licenses": expired_licenses,
-                "recent_validations_24h": recent_validations
-            }
-        }
+        return {"stats": cached_dashboard_stats(db)}
     except Exception as e:
         logger.error(f"Error obteniendo dashboard: {e}")
         return {
@@ -46,6 +84,19 @@ async def get_dashboard_stats(db: Session = Depends(get_db)):
             }
         }
 
+@control_router.get("/stream")
+async def admin_stream(request: Request, licenses: bool = False):
+    """Stream SSE del panel: estadísticas por tick y deltas de la lista de licencias
+    
+    Eventos: 'stats' (estadísticas, catálogo y estado del sistema) y 'licenses'
+    (primero {"full": true, "licenses": [...]}, luego {"upserted": [...], "removed": [...]}).
+    """
+    return StreamingResponse(
+        dashboard_hub.stream(licenses, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @control_router.get("/licenses")
 async def get_all_licenses(db: Session = Depends(get_db)):
     """Panel de administración - Ver todas las licencias"""
@@ -53,39 +104,252 @@ async def get_all_licenses(db: Session = Depends(get_db)):
         licenses = db.query(License).order_by(License.issued_date.desc()).all()
         
         return {
-            "licenses": [
-                {
-                    "id": lic.id,
-                    "license_key": lic.license_key,
-                    "client_name": lic.client_name,
-                    "client_email": lic.client_email,
-                    "license_type": lic.license_type,
-                    "issued_date": lic.issued_date.isoformat() if lic.issued_date else None,
-                    "expiry_date": lic.expiry_date.isoformat(),
-                    "max_users": lic.max_users,
-                    "current_users": lic.current_users or 0,
-                    "allowed_modules": lic.allowed_modules,
-                    "is_active": lic.is_active,
-                    "validation_count": lic.validation_count or 0
-                }
-                for lic in licenses
-            ],
+            "licenses": [serialize_license(lic) for lic in licenses],
             "total_licenses": len(licenses)
         }
     except Exception as e:
         logger.error(f"Error obteniendo licencias: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Tamaño máximo de página del listado paginado
+MAX_PAGE_SIZE = 500
+
+@control_router.get("/licenses/page")
+async def get_licenses_page(
+    offset: int = 0,
+    limit: int = 100,
+    search: Optional[str] = None,
+    license_type: Optional[str] = None,
+    status: Optional[str] = None,
+    module: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Listado paginado y filtrado en servidor para la tabla virtualizada del panel
+    
+    status: 'active' (activa y vigente), 'inactive' o 'expired'.
+    module: solo licencias con ese módulo (índice inverso de license_modules).
+    """
+    offset = max(offset, 0)
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    
+    try:
+        query = License.listing(db, datetime.utcnow(), search, license_type, module, status)
+        total = query.order_by(None).count()
+        licenses = query.offset(offset).limit(limit).all()
+        
+        return {
+            "licenses": [serialize_license(lic) for lic in licenses],
+            "total": total,
+            "offset": offset,
+            "limit": limit
+        }
+    except Exception as e:
+        logger.error(f"Error obteniendo página de licencias: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Máximo de días consultables en próximos vencimientos
+MAX_EXPIRING_DAYS = 366
+
+@control_router.get("/licenses/expiring")
+async def get_expiring_licenses(days: int = 30, limit: int = 100, db: Session = Depends(get_db)):
+    """Licencias activas que vencen en los próximos días, con el conteo por día
+    
+    Lecturas por rango sobre el índice parcial ix_licenses_active_expiry.
+    """
+    days = min(max(days, 1), MAX_EXPIRING_DAYS)
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    now = datetime.utcnow()
+    until = now + timedelta(days=days)
+    
+    try:
+        licenses = License.expiring(db, now, until).order_by(License.expiry_date).limit(limit).all()
+        # Solo la columna indexada: no lee las filas
+        per_day = defaultdict(int)
+        for (expiry_date,) in License.expiring(db, now, until, License.expiry_date):
+            per_day[expiry_date.date().isoformat()] += 1
+        
+        return {
+            "days": days,
+            "total": sum(per_day.values()),
+            "per_day": dict(sorted(per_day.items())),
+            "licenses": [serialize_license(lic) for lic in licenses],
+            "sweeper": expiry_sweeper.stats
+        }
+    except Exception as e:
+        logger.error(f"Error obteniendo próximos vencimientos: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Máximo de licencias por operación en bloque y filas por INSERT (límite de parámetros de SQLite)
+MAX_BULK_LICENSES = 5000
+BULK_INSERT_ROWS = 1000
+
+# ============================================================================
+# RENOVACIÓN, DESACTIVACIÓN Y CAMBIO DE ESTADO EN BLOQUE
+# ============================================================================
+
+# Antes de las rutas /licenses/{license_id}/...: "bulk" no es un id y no debe caer en ellas
+
+# Claves por UPDATE ... RETURNING (un lote acotado por sentencia)
+BULK_UPDATE_ROWS = 500
+
+def _bulk_targets(db: Session, request: BulkLicenseRequest):
+    """Claves de las licencias seleccionadas y claves pedidas que no cumplen los filtros o no existen"""
+    if not (request.license_keys or request.license_type or request.client or request.expiring_before):
+        raise HTTPException(status_code=400, detail="Debe indicar licencias o algún filtro")
+    
+    query = db.query(License.license_key)
+    requested = list(dict.fromkeys(request.license_keys or []))
+    if requested:
+        if len(requested) > MAX_BULK_LICENSES:
+            raise HTTPException(status_code=400, detail=f"Máximo {MAX_BULK_LICENSES} licencias por operación")
+        query = query.filter(License.license_key.in_(requested))
+    if request.license_type:
+        query = query.filter(License.license_type == request.license_type)
+    if request.client:
+        pattern = f"%{request.client.strip()}%"
+        query = query.filter(or_(License.client_name.ilike(pattern), License.client_email.ilike(pattern)))
+    if request.expiring_before:
+        query = query.filter(License.expiry_date < request.expiring_before)
+    
+    license_keys = [key for (key,) in query.order_by(License.license_key).limit(MAX_BULK_LICENSES + 1)]
+    if len(license_keys) > MAX_BULK_LICENSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"La selección supera {MAX_BULK_LICENSES} licencias; acote los filtros"
+        )
+    selected = set(license_keys)
+    return license_keys, [key for key in requested if key not in selected]
+
+def _bulk_update(db: Session, license_keys: List[str], values: dict, *returning) -> list:
+    """Un UPDATE ... RETURNING por lote de claves; devuelve (license_key, *returning) por fila"""
+    lock_change_log(db)  # antes de bloquear las filas: después se registran los cambios
+    rows = []
+    for start in range(0, len(license_keys), BULK_UPDATE_ROWS):
+        rows += db.execute(
+            update(License)
+            .where(License.license_key.in_(license_keys[start:start + BULK_UPDATE_ROWS]))
+            .values(**values)
+            .returning(License.license_key, *returning)
+            .execution_options(synchronize_session=False)
+        ).all()
+    return rows
+
+def _renewed_expiry(db: Session, now: datetime, days: int):
+    """max(ahora, expiry_date) + days calculado en la base de datos"""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.greatest(License.expiry_date, now, type_=DateTime) + timedelta(days=days)
+    # SQLite guarda las fechas como texto ISO: max() escalar y datetime() con modificador
+    return func.datetime(func.max(License.expiry_date, now), f"{days:+d} days")
+
+def _bulk_audit(action: str, request: BulkLicenseRequest, license_keys: List[str], missing: List[str]) -> dict:
+    """Resumen de la operación: se registra en el log y se devuelve al panel"""
+    filters = request.model_dump(exclude_none=True, exclude={"license_keys"}, mode="json")
+    summary = {
+        "action": action,
+        "requested_keys": len(request.license_keys or []),
+        "filters": filters,
+        "updated": len(license_keys),
+        "missing_licenses": missing,
+        "at": datetime.utcnow().isoformat()
+    }
+    logger.info(
+        f"Operación en bloque '{action}': {len(license_keys)} licencias actualizadas"
+        f" (claves pedidas: {summary['requested_keys']}, filtros: {filters or '-'}"
+        f", no encontradas: {len(missing)})"
+    )
+    return summary
+
+@control_router.post("/licenses/bulk/renew")
+async def bulk_renew_licenses(request: BulkRenewRequest, db: Session = Depends(get_db)):
+    """Renueva varias licencias con un UPDATE ... RETURNING por lote"""
+    if request.renewal_days <= 0:
+        raise HTTPException(status_code=400, detail="renewal_days debe ser positivo")
+    license_keys, missing = _bulk_targets(db, request)
+    try:
+        rows = _bulk_update(db, license_keys, {
+            "expiry_date": _renewed_expiry(db, datetime.utcnow(), request.renewal_days),
+            "is_active": True,
+            "expired_at": None
+        }, License.expiry_date)
+        
+        renewed = [key for key, _ in rows]
+        record_license_changes(db, renewed)
+        invalidation_bus.publish_many(db, SCOPE_LICENSE, renewed, EVENT_RENEWED, {
+            "renewal_days": request.renewal_days
+        })
+        db.commit()
+        return {
+            "success": True,
+            "licenses": [{"license_key": key, "new_expiry_date": expiry.isoformat()} for key, expiry in rows],
+            "summary": _bulk_audit("renew", request, renewed, missing)
+        }
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error renovando licencias en bloque: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@control_router.post("/licenses/bulk/deactivate")
+async def bulk_deactivate_licenses(request: BulkLicenseRequest, db: Session = Depends(get_db)):
+    """Desactiva varias licencias con un UPDATE ... RETURNING por lote"""
+    license_keys, missing = _bulk_targets(db, request)
+    try:
+        # Desactivación explícita, no por vencimiento
+        deactivated = [key for (key,) in _bulk_update(db, license_keys, {"is_active": False, "expired_at": None})]
+        record_license_changes(db, deactivated)
+        invalidation_bus.publish_many(db, SCOPE_LICENSE, deactivated, EVENT_REVOKED, {"reason": "deactivated"})
+        db.commit()
+        return {
+            "success": True,
+            "licenses": deactivated,
+            "summary": _bulk_audit("deactivate", request, deactivated, missing)
+        }
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error desactivando licencias en bloque: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@control_router.post("/licenses/bulk/toggle")
+async def bulk_toggle_licenses(request: BulkStatusRequest, db: Session = Depends(get_db)):
+    """Activa/desactiva varias licencias (is_active=None invierte el estado de cada una)"""
+    license_keys, missing = _bulk_targets(db, request)
+    try:
+        is_active = not_(License.is_active) if request.is_active is None else request.is_active
+        rows = _bulk_update(db, license_keys, {"is_active": is_active, "expired_at": None}, License.is_active)
+        
+        activated = [key for key, active in rows if active]
+        deactivated = [key for key, active in rows if not active]
+        record_license_changes(db, [key for key, _ in rows])
+        invalidation_bus.publish_many(db, SCOPE_LICENSE, activated, EVENT_REACTIVATED, {"reason": "toggled"})
+        invalidation_bus.publish_many(db, SCOPE_LICENSE, deactivated, EVENT_REVOKED, {"reason": "toggled"})
+        db.commit()
+        return {
+            "success": True,
+            "activated": activated,
+            "deactivated": deactivated,
+            "summary": _bulk_audit("toggle", request, [key for key, _ in rows], missing)
+        }
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error cambiando estado de licencias en bloque: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @control_router.post("/licenses/{license_id}/toggle")
 async def toggle_license_status(license_id: int, db: Session = Depends(get_db)):
     """Activar/Desactivar una licencia específica"""
-    try:
+    def write(db: Session) -> dict:
         license_obj = db.query(License).filter(License.id == license_id).first()
         if not license_obj:
             raise HTTPException(status_code=404, detail="Licencia no encontrada")
         
         license_obj.is_active = not license_obj.is_active
-        db.commit()
+        license_obj.expired_at = None
+        invalidation_bus.publish(
+            db,
+            SCOPE_LICENSE,
+            license_obj.license_key,
+            EVENT_REACTIVATED if license_obj.is_active else EVENT_REVOKED,
+            {"reason": "toggled"}
+        )
         
         status = "activada" if license_obj.is_active else "desactivada"
         return {
@@ -95,6 +359,9 @@ async def toggle_license_status(license_id: int, db: Session = Depends(get_db)):
             "is_active": license_obj.is_active,
             "message": f"Licencia {status} exitosamente"
         }
+    
+    try:
+        return await group_committer.run(db, write)
     except HTTPException:
         raise
     except Exception as e:
@@ -104,29 +371,176 @@ async def toggle_license_status(license_id: int, db: Session = Depends(get_db)):
 @control_router.post("/licenses/{license_id}/block-module")
 async def block_module_for_license(license_id: int, module_name: str, db: Session = Depends(get_db)):
     """Bloquear un módulo específico de una licencia"""
-    try:
+    def write(db: Session) -> dict:
         license_obj = db.query(License).filter(License.id == license_id).first()
         if not license_obj:
             raise HTTPException(status_code=404, detail="Licencia no encontrada")
         
-        if module_name in license_obj.allowed_modules:
-            license_obj.allowed_modules.remove(module_name)
-            db.commit()
-            
-            return {
-                "success": True,
-                "message": f"Módulo '{module_name}' bloqueado para {license_obj.client_name}",
-                "license_key": license_obj.license_key,
-                "remaining_modules": license_obj.allowed_modules
-            }
-        else:
+        if module_name not in license_obj.allowed_modules:
             raise HTTPException(status_code=400, detail="El módulo no está en esta licencia")
+        
+        # Borra la fila de license_modules (delete-orphan)
+        license_obj.allowed_modules.remove(module_name)
+        invalidation_bus.publish(db, SCOPE_LICENSE, license_obj.license_key, EVENT_MODULES_CHANGED, {
+            "blocked_module": module_name,
+            "allowed_modules": list(license_obj.allowed_modules)
+        })
+        
+        return {
+            "success": True,
+            "message": f"Módulo '{module_name}' bloqueado para {license_obj.client_name}",
+            "license_key": license_obj.license_key,
+            "remaining_modules": list(license_obj.allowed_modules)
+        }
+    
+    try:
+        return await group_committer.run(db, write)
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error bloqueando módulo: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _bulk_entitlement_targets(db: Session, request: ModuleEntitlementRequest):
+    """Claves existentes y módulos del catálogo de una petición en bloque"""
+    license_keys = list(dict.fromkeys(request.license_keys))
+    module_names = list(dict.fromkeys(request.module_names))
+    if not license_keys or not module_names:
+        raise HTTPException(status_code=400, detail="Debe indicar licencias y módulos")
+    if len(license_keys) > MAX_BULK_LICENSES:
+        raise HTTPException(status_code=400, detail=f"Máximo {MAX_BULK_LICENSES} licencias por operación")
+    
+    known = {name for (name,) in db.query(MedicalModule.name).filter(MedicalModule.name.in_(module_names))}
+    unknown = [name for name in module_names if name not in known]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Módulos inexistentes: {', '.join(unknown)}")
+    
+    existing = {key for (key,) in db.query(License.license_key).filter(License.license_key.in_(license_keys))}
+    return [key for key in license_keys if key in existing], module_names, [key for key in license_keys if key not in existing]
+
+def _over_module_limit(db: Session, license_keys: List[str], module_names: List[str]) -> set:
+    """Licencias que superarían max_modules de su tipo al recibir module_names"""
+    limits = dict(
+        db.query(License.license_key, LicenseType.max_modules)
+        .join(LicenseType, LicenseType.name == License.license_type)
+        .filter(License.license_key.in_(license_keys), LicenseType.max_modules > 0)
+    )
+    if not limits:
+        return set()
+    # Módulos actuales y cuántos de los pedidos ya tiene cada licencia
+    counts = {
+        key: (total, already)
+        for key, total, already in db.query(
+            LicenseModule.license_key,
+            func.count(),
+            func.sum(case((LicenseModule.module_name.in_(module_names), 1), else_=0))
+        )
+        .filter(LicenseModule.license_key.in_(list(limits)))
+        .group_by(LicenseModule.license_key)
+    }
+    over = set()
+    for key, max_modules in limits.items():
+        total, already = counts.get(key, (0, 0))
+        if total + len(module_names) - (already or 0) > max_modules:
+            over.add(key)
+    return over
+
+def _publish_module_changes(db: Session, license_keys: List[str], change: dict):
+    """Change log e invalidación de las licencias cuyas filas de license_modules cambiaron"""
+    record_license_changes(db, license_keys)
+    invalidation_bus.publish_many(db, SCOPE_LICENSE, license_keys, EVENT_MODULES_CHANGED, change)
+
+@control_router.post("/licenses/modules/grant")
+async def grant_modules(request: ModuleEntitlementRequest, db: Session = Depends(get_db)):
+    """Habilita módulos en varias licencias con un solo INSERT ... ON CONFLICT DO NOTHING
+    
+    Las licencias que superarían el límite de módulos de su tipo se omiten y se
+    informan en 'over_limit_licenses'.
+    """
+    license_keys, module_names, missing = _bulk_entitlement_targets(db, request)
+    try:
+        over = _over_module_limit(db, license_keys, module_names) if license_keys else set()
+        over_limit = [key for key in license_keys if key in over]
+        license_keys = [key for key in license_keys if key not in over]
+        if db.get_bind().dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        now = datetime.utcnow()
+        pairs = [
+            {"license_key": key, "module_name": name, "granted_at": now}
+            for key in license_keys for name in module_names
+        ]
+        granted = []
+        lock_change_log(db)
+        for start in range(0, len(pairs), BULK_INSERT_ROWS):
+            granted += db.execute(
+                insert(LicenseModule)
+                .values(pairs[start:start + BULK_INSERT_ROWS])
+                .on_conflict_do_nothing(index_elements=["license_key", "module_name"])
+                .returning(LicenseModule.license_key)
+            ).scalars().all()
+        
+        changed = sorted(set(granted))
+        _publish_module_changes(db, changed, {"granted_modules": module_names})
+        db.commit()
+        return {
+            "success": True,
+            "granted": len(granted),
+            "licenses_changed": len(changed),
+            "missing_licenses": missing,
+            "over_limit_licenses": over_limit
+        }
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error habilitando módulos en bloque: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@control_router.post("/licenses/modules/revoke")
+async def revoke_modules(request: ModuleEntitlementRequest, db: Session = Depends(get_db)):
+    """Retira módulos de varias licencias con un solo DELETE"""
+    license_keys, module_names, missing = _bulk_entitlement_targets(db, request)
+    try:
+        lock_change_log(db)
+        revoked = db.execute(
+            delete(LicenseModule)
+            .where(LicenseModule.license_key.in_(license_keys), LicenseModule.module_name.in_(module_names))
+            .returning(LicenseModule.license_key)
+        ).scalars().all() if license_keys else []
+        
+        changed = sorted(set(revoked))
+        _publish_module_changes(db, changed, {"blocked_modules": module_names})
+        db.commit()
+        return {
+            "success": True,
+            "revoked": len(revoked),
+            "licenses_changed": len(changed),
+            "missing_licenses": missing
+        }
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error retirando módulos en bloque: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@control_router.post("/licenses/import")
+def import_licenses_file(file: UploadFile = File(...), dry_run: bool = False, db: Session = Depends(get_db)):
+    """Alta masiva desde CSV/XLSX con informe por fila (license_import.py)
+    
+    Función síncrona: FastAPI la ejecuta en el pool de hilos y la importación no
+    bloquea el event loop.
+    """
+    try:
+        report = import_licenses(db, iter_rows(file.file, file.filename or ""), dry_run=dry_run)
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error importando licencias: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    logger.info(f"Importación de {file.filename}: {report['valid']}/{report['total']} licencias "
+                f"{'válidas' if dry_run else 'creadas'} ({report['licenses_per_second']} licencias/s)")
+    return report
+
 @control_router.get("/purchases")
 async def get_purchases(db: Session = Depends(get_db)):
     """Obtener historial de compras/licencias generadas"""
@@ -143,7 +557,7 @@ async def get_purchases(db: Session = Depends(get_db)):
                 "license_type": lic.license_type,
                 "purchase_date": lic.issued_date.isoformat() if lic.issued_date else None,
                 "amount": 0,  # Agregar campo price en futuras versiones
-                "modules": lic.allowed_modules,
+                "modules": list(lic.allowed_modules),
                 "status": "active" if lic.is_active else "inactive"
             })
         
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Dashboard Stream
+================
+Stream SSE único para el panel de administración.
+
+Un solo ticker por proceso calcula las estadísticas del dashboard y el diff de
+la lista de licencias, y reparte el mismo payload a todas las pestañas abiertas.
+El costo en base de datos ya no crece con el número de administradores conectados.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from license_events import format_sse
+
+logger = logging.getLogger(__name__)
+
+TICK_SECONDS = float(os.getenv("SAPIENTIA_DASHBOARD_TICK", 10))
+SUBSCRIBER_QUEUE_SIZE = 8
+
+
+class _Subscriber:
+    def __init__(self, wants_licenses: bool):
+        self.wants_licenses = wants_licenses
+        # True hasta recibir el estado completo; luego solo recibe deltas
+        self.needs_snapshot = True
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+
+class DashboardHub:
+    """Calcula una vez por tick y reparte a todos los suscriptores"""
+
+    def __init__(self, tick_seconds: float = TICK_SECONDS):
+        self.tick_seconds = tick_seconds
+        self._subscribers = set()
+        self._task: Optional[asyncio.Task] = None
+        self._last_stats: Optional[Dict[str, Any]] = None
+        # Último estado conocido de cada licencia: {id: licencia serializada}
+        self._licenses: Optional[Dict[int, Dict[str, Any]]] = None
+
+    # ------------------------------------------------------------------
+    # Cálculo (se ejecuta en un hilo para no bloquear el event loop)
+    # ------------------------------------------------------------------
+
+    def _compute(self, include_licenses: bool):
+        from main import SessionLocal, License
+        from control_endpoints import cached_dashboard_stats, serialize_license
+        from license_endpoints import catalog_snapshot
+
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            catalog = catalog_snapshot(db)
+            stats = {
+                "stats": cached_dashboard_stats(db),
+                "catalog": {
+                    "total_modules": len(catalog["modules"]),
+                    "total_license_types": len(catalog["license_types"])
+                },
+                "system": {
+                    "status": "online",
+                    "version": "2.0.0",
+                    "timestamp": datetime.utcnow().isoformat()
+                }
+            }
+            licenses = None
+            if include_licenses:
+                licenses = {
+                    lic.id: serialize_license(lic)
+                    for lic in db.query(License).order_by(License.issued_date.desc()).all()
+                }
+        finally:
+            db.close()
+
+        stats["compute_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return stats, licenses
+
+    def _diff(self, licenses: Dict[int, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        previous = self._licenses or {}
+        upserted = [lic for lic_id, lic in licenses.items() if previous.get(lic_id) != lic]
+        removed = [lic_id for lic_id in previous if lic_id not in licenses]
+        if not upserted and not removed:
+            return None
+        return {"full": False, "upserted": upserted, "removed": removed}
+
+    # ------------------------------------------------------------------
+    # Reparto
+    # ------------------------------------------------------------------
+
+    def _deliver(self, subscriber: _Subscriber, message: str):
+        try:
+            subscriber.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Cliente lento: se descartan sus mensajes pendientes y se le reenvía el estado completo
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(self._snapshot_message(subscriber))
+
+    def _snapshot_message(self, subscriber: _Subscriber) -> str:
+        message = format_sse(None, "stats", self._last_stats) if self._last_stats else ""
+        if subscriber.wants_licenses and self._licenses is not None:
+            message += format_sse(None, "licenses", {
+                "full": True,
+                "licenses": list(self._licenses.values())
+            })
+        return message
+
+    async def _run(self):
+        while self._subscribers:
+            include_licenses = any(sub.wants_licenses for sub in self._subscribers)
+            try:
+                stats, licenses = await asyncio.to_thread(self._compute, include_licenses)
+            except Exception as e:
+                logger.error(f"Error calculando stream del dashboard: {e}")
+                await asyncio.sleep(self.tick_seconds)
+                continue
+
+            self._last_stats = stats
+            stats_message = format_sse(None, "stats", stats)
+
+            delta_message = None
+            if licenses is not None:
+                if self._licenses is None:
+                    self._licenses = licenses
+                else:
+                    delta = self._diff(licenses)
+                    self._licenses = licenses
+                    if delta:
+                        delta_message = format_sse(None, "licenses", delta)
+
+            for subscriber in list(self._subscribers):
+                if subscriber.needs_snapshot:
+                    subscriber.needs_snapshot = False
+                    self._deliver(subscriber, self._snapshot_message(subscriber))
+                    continue
+                message = stats_message
+                if subscriber.wants_licenses and delta_message:
+                    message += delta_message
+                self._deliver(subscriber, message)
+
+            await asyncio.sleep(self.tick_seconds)
+
+        self._task = None
+        self._licenses = None
+
+    # ------------------------------------------------------------------
+    # Suscripción
+    # ------------------------------------------------------------------
+
+    async def stream(self, wants_licenses: bool, is_disconnected, heartbeat_seconds: float = 15):
+        """Generador SSE para un suscriptor"""
+        subscriber = _Subscriber(wants_licenses)
+        self._subscribers.add(subscriber)
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+        try:
+            if self._last_stats is not None and (not wants_licenses or self._licenses is not None):
+                subscriber.needs_snapshot = False
+                yield self._snapshot_message(subscriber)
+
+            while not await is_disconnected():
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield message
+        finally:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+
+# Instancia del proceso
+hub = DashboardHub()
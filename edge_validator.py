@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Edge Validator
+==============
+Validador de licencias autónomo para desplegar cerca de las clínicas.
+
+Sirve ``POST /license/validate`` y ``POST /license/validate/batch`` con el
+mismo contrato que license_endpoints, pero a partir de un snapshot binario
+(license_snapshot.py) abierto con mmap: no necesita base de datos ni Redis.
+Cuando el archivo se reemplaza (exportador + rsync/scp) se carga el nuevo
+snapshot en caliente sin cortar requests.
+
+Diferencias con el servidor central:
+- No registra las validaciones ni arrienda puestos (seats.py): current_users
+  es el número de puestos ocupados al exportar el snapshot.
+- El estado es el del último snapshot recibido: ``/health`` informa su edad.
+
+Uso:
+    python edge_validator.py --snapshot data/licenses.snap --port 8100
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from contextlib import asynccontextmanager
+from datetime import datetime
+from types import SimpleNamespace
+
+from fastapi import FastAPI, HTTPException
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from license_snapshot import SnapshotStore, DEFAULT_PATH
+from schemas import LicenseValidationRequest, LicenseBatchValidationRequest
+from utils import SecurityManager, RevalidationScheduler, LicenseRules
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("sapientia.edge")
+
+SNAPSHOT_PATH = os.getenv("SAPIENTIA_SNAPSHOT_PATH", DEFAULT_PATH)
+RELOAD_SECONDS = float(os.getenv("SAPIENTIA_SNAPSHOT_RELOAD", 5))
+
+store = SnapshotStore(SNAPSHOT_PATH)
+
+
+async def _watch_snapshot():
+    """Comprueba periódicamente si hay un snapshot nuevo"""
+    while True:
+        await asyncio.sleep(RELOAD_SECONDS)
+        try:
+            store.reload_if_changed()
+        except Exception as e:
+            logger.error(f"Error recargando snapshot: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not store.reload_if_changed():
+        logger.warning(f"Sin snapshot de licencias en {store.path}: las validaciones fallarán hasta recibirlo")
+    watcher = asyncio.create_task(_watch_snapshot())
+    yield
+    watcher.cancel()
+
+
+app = FastAPI(
+    title="Sapientia Edge Validator",
+    description="Validación de licencias desde snapshot local",
+    version="2.0.0",
+    lifespan=lifespan
+)
+
+
+def _license_state(snapshot, license_key: str):
+    state = snapshot.lookup(license_key)
+    if state is None:
+        return None
+    return SimpleNamespace(**{**state, "expiry_date": datetime.fromisoformat(state["expiry_date"])})
+
+
+def _run_validations(license_key: str, module_names, hardware_info, user_count: int):
+    """Igual que en el servidor central, sin persistencia"""
+    snapshot = store.current
+    if snapshot is None:
+        return [LicenseRules.error_response(license_key, name, "Snapshot de licencias no disponible")
+                for name in module_names]
+
+    license_record = _license_state(snapshot, license_key)
+    current_fingerprint = SecurityManager.generate_hardware_fingerprint(hardware_info)
+
+    results = []
+    for module_name in module_names:
+        error_message = LicenseRules.check(license_record, module_name, current_fingerprint, user_count)
+        results.append(LicenseRules.response(license_key, module_name, license_record, error_message))
+    return results
+
+
+@app.post("/license/validate", response_model=dict)
+async def validate_license(validation_req: LicenseValidationRequest):
+    """Valida una licencia para un módulo específico"""
+    try:
+        return _run_validations(
+            validation_req.license_key,
+            [validation_req.module_name],
+            validation_req.hardware_info,
+            validation_req.user_count
+        )[0]
+    except Exception as e:
+        logger.error(f"Error validando licencia: {str(e)}")
+        return LicenseRules.error_response(validation_req.license_key, validation_req.module_name)
+
+
+@app.post("/license/validate/batch", response_model=dict)
+async def validate_license_batch(batch_req: LicenseBatchValidationRequest):
+    """Valida varios módulos de una misma licencia en una sola llamada"""
+    module_names = list(dict.fromkeys(batch_req.module_names))
+    if not module_names:
+        raise HTTPException(status_code=400, detail="Debe indicar al menos un módulo")
+
+    try:
+        results = _run_validations(
+            batch_req.license_key,
+            module_names,
+            batch_req.hardware_info,
+            batch_req.user_count
+        )
+    except Exception as e:
+        logger.error(f"Error validando lote de licencia: {str(e)}")
+        results = [LicenseRules.error_response(batch_req.license_key, name) for name in module_names]
+
+    return {
+        "license_key": batch_req.license_key,
+        "next_check_after": RevalidationScheduler.next_check_after(batch_req.license_key),
+        "results": {result["module_name"]: result for result in results},
+        "all_valid": all(result["valid"] for result in results)
+    }
+
+
+@app.get("/health")
+async def health():
+    snapshot = store.current
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail="Snapshot de licencias no disponible")
+    return {"status": "healthy", "snapshot": snapshot.info()}
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Validador de licencias de borde (sin base de datos)")
+    parser.add_argument("--snapshot", default=SNAPSHOT_PATH, help="Ruta del snapshot (SAPIENTIA_SNAPSHOT_PATH)")
+    parser.add_argument("--host", default=os.getenv("SAPIENTIA_EDGE_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SAPIENTIA_EDGE_PORT", 8100)))
+    args = parser.parse_args()
+
+    store.path = args.snapshot
+    print(f"🩺 Sapientia Edge Validator en {args.host}:{args.port} (snapshot {store.path})")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="info")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
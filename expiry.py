@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Expiry Sweeper
+==============
+Barrido en segundo plano de licencias vencidas.
+
+- Desactiva por lotes las licencias activas con ``expiry_date`` pasada
+  (``is_active = False``, ``expired_at = ahora``) y publica el cambio en el bus
+  de invalidación: cachés L1/L2, índice compartido, clientes SSE y change_log
+  se actualizan como con cualquier desactivación.
+- Mantiene en memoria una rueda de vencimientos: las licencias que vencen en
+  las próximas ``HORIZON`` horas agrupadas en buckets de ``BUCKET_SECONDS``. El
+  barrido se despierta al cerrar cada bucket con vencimientos, así el estado
+  cacheado se refresca en el momento de la expiración y no minutos después.
+- Las lecturas de próximos vencimientos usan el índice parcial
+  ``ix_licenses_active_expiry`` (rango sobre licencias activas).
+
+Cada worker ejecuta su barrido; en Postgres los lotes se toman con
+``FOR UPDATE SKIP LOCKED`` y nunca se solapan. Antes del ``FOR UPDATE`` se toma
+el advisory lock del change_log (ver sync_endpoints.py), así que los barridos de
+varios workers se confirman uno tras otro.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+
+from main import SessionLocal, License
+from invalidation import invalidation_bus, change_keys, SCOPE_LICENSE
+from license_events import EVENT_EXPIRED
+from sync_endpoints import lock_change_log
+
+logger = logging.getLogger(__name__)
+
+SWEEP_SECONDS = float(os.getenv("SAPIENTIA_EXPIRY_SWEEP_SECONDS", 300))
+BATCH_SIZE = int(os.getenv("SAPIENTIA_EXPIRY_BATCH", 500))
+BUCKET_SECONDS = int(os.getenv("SAPIENTIA_EXPIRY_BUCKET_SECONDS", 60))
+HORIZON = timedelta(hours=int(os.getenv("SAPIENTIA_EXPIRY_HORIZON_HOURS", 24)))
+
+
+def _epoch(value: datetime) -> float:
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+
+class ExpiryWheel:
+    """Licencias activas que vencen dentro del horizonte, por bucket de tiempo"""
+
+    def __init__(self, bucket_seconds: int = BUCKET_SECONDS):
+        self.bucket_seconds = bucket_seconds
+        self._buckets: Dict[int, Set[str]] = defaultdict(set)
+
+    def _bucket(self, expiry: datetime) -> int:
+        return int(_epoch(expiry) // self.bucket_seconds)
+
+    def load(self, rows):
+        """Reemplaza el contenido con filas (license_key, expiry_date)"""
+        buckets = defaultdict(set)
+        for license_key, expiry_date in rows:
+            buckets[self._bucket(expiry_date)].add(license_key)
+        self._buckets = buckets
+
+    def discard(self, license_key: str):
+        for keys in self._buckets.values():
+            keys.discard(license_key)
+
+    def next_due(self) -> Optional[float]:
+        """Instante (epoch) en que cierra el próximo bucket no vacío"""
+        due = [bucket for bucket, keys in self._buckets.items() if keys]
+        if not due:
+            return None
+        return (min(due) + 1) * self.bucket_seconds
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self._buckets.values())
+
+
+class ExpirySweeper:
+    """Desactiva licencias vencidas y agenda el siguiente barrido según la rueda"""
+
+    def __init__(self):
+        self.wheel = ExpiryWheel()
+        self.stats = {"expired": 0, "sweeps": 0, "last_sweep": None}
+
+    def sweep(self) -> int:
+        """Desactiva por lotes las licencias vencidas; devuelve cuántas"""
+        total = 0
+        while True:
+            now = datetime.utcnow()
+            db = SessionLocal()
+            try:
+                # Advisory lock del change_log antes que los locks de fila del FOR UPDATE
+                lock_change_log(db)
+                batch = License.expired_batch(db, now, BATCH_SIZE).all()
+                for license_obj in batch:
+                    license_obj.is_active = False
+                    license_obj.expired_at = now
+                # Un aviso por lote; expired_at es el del barrido, igual que la columna
+                invalidation_bus.publish_many(db, SCOPE_LICENSE, [license_obj.license_key for license_obj in batch],
+                                              EVENT_EXPIRED, {"expired_at": now.isoformat()})
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+            total += len(batch)
+            if len(batch) < BATCH_SIZE:
+                break
+
+        self.stats["expired"] += total
+        self.stats["sweeps"] += 1
+        self.stats["last_sweep"] = datetime.utcnow().isoformat()
+        if total:
+            logger.info(f"Barrido de vencimientos: {total} licencias desactivadas")
+        return total
+
+    def refresh_wheel(self):
+        """Carga los vencimientos del horizonte (lectura por rango del índice parcial)"""
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            rows = License.expiring(db, now, now + HORIZON, License.license_key, License.expiry_date).all()
+        finally:
+            db.close()
+        self.wheel.load(rows)
+
+    def run_once(self) -> float:
+        """Barrido + recarga de la rueda; devuelve los segundos hasta el siguiente"""
+        self.sweep()
+        self.refresh_wheel()
+        wake = time.time() + SWEEP_SECONDS
+        next_due = self.wheel.next_due()
+        if next_due is not None:
+            wake = min(wake, next_due)
+        return max(1.0, wake - time.time())
+
+    async def run(self):
+        """Tarea de fondo del worker"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                delay = await loop.run_in_executor(None, self.run_once)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error en barrido de vencimientos: {e}")
+                delay = SWEEP_SECONDS
+            await asyncio.sleep(delay)
+
+
+def _on_license_change(change):
+    # Renovaciones y desactivaciones mueven la licencia de bucket: se recoloca en la próxima recarga
+    if change.get("event_type") != EVENT_EXPIRED:
+        for license_key in change_keys(change):
+            expiry_sweeper.wheel.discard(license_key)
+
+
+# Instancia del proceso
+expiry_sweeper = ExpirySweeper()
+invalidation_bus.subscribe(SCOPE_LICENSE, _on_license_change)
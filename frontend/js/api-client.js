@@ -175,6 +175,14 @@ try {
         return this.get('/admin/licenses');
     }
     
+    async getLicensesPage({ offset = 0, limit = 100, search = '', licenseType = '', status = '' } = {}) {
+        const params = new URLSearchParams({ offset, limit });
+        if (search) params.set('search', search);
+        if (licenseType) params.set('license_type', licenseType);
+        if (status) params.set('status', status);
+        return this.get(`/admin/licenses/page?${params}`);
+    }
+    
     async toggleLicenseStatus(licenseId) {
         return this.post(`/admin/licenses/${licenseId}/toggle`);
     }
@@ -200,6 +208,85 @@ try {
 // Instancia global del cliente API
 window.apiClient = new ApiClient();
 
+// ============================================================================
+// STREAM SSE DEL PANEL DE ADMINISTRACIÓN
+// ============================================================================
+
+// Una sola conexión EventSource a /admin/stream compartida por todos los módulos
+class AdminStream {
+    constructor() {
+        this.listeners = new Map();
+        this.nextId = 1;
+        this.source = null;
+        this.withLicenses = false;
+    }
+    
+    // handlers: { onStats(data), onLicenses(delta), onError() }
+    subscribe(handlers) {
+        const id = this.nextId++;
+        this.listeners.set(id, handlers);
+        this.connect();
+        return id;
+    }
+    
+    unsubscribe(id) {
+        if (!this.listeners.delete(id)) return;
+        this.connect();
+    }
+    
+    connect() {
+        if (this.listeners.size === 0) {
+            this.close();
+            return;
+        }
+        
+        // Solo se pide la lista de licencias si algún módulo la necesita
+        const needLicenses = [...this.listeners.values()].some(h => h.onLicenses);
+        if (this.source && needLicenses === this.withLicenses) return;
+        
+        this.close();
+        this.withLicenses = needLicenses;
+        
+        const url = `${CONFIG.API.BASE_URL}/admin/stream${needLicenses ? '?licenses=true' : ''}`;
+        this.source = new EventSource(url);
+        
+        this.source.addEventListener('stats', (event) => {
+            this.dispatch('onStats', JSON.parse(event.data));
+        });
+        this.source.addEventListener('licenses', (event) => {
+            this.dispatch('onLicenses', JSON.parse(event.data));
+        });
+        this.source.onerror = () => {
+            // EventSource reconecta solo; al reconectar el servidor reenvía el estado completo
+            Logger.warn('Stream de administración interrumpido, reconectando...');
+            this.dispatch('onError');
+        };
+        
+        Logger.debug(`Stream de administración conectado: ${url}`);
+    }
+    
+    dispatch(handlerName, payload) {
+        for (const handlers of this.listeners.values()) {
+            if (typeof handlers[handlerName] === 'function') {
+                try {
+                    handlers[handlerName](payload);
+                } catch (error) {
+                    Logger.error(`Error en handler ${handlerName} del stream:`, error);
+                }
+            }
+        }
+    }
+    
+    close() {
+        if (this.source) {
+            this.source.close();
+            this.source = null;
+        }
+    }
+}
+
+window.adminStream = new AdminStream();
+
 // Sistema de caché inteligente
 class CacheManager {
     constructor() {
@@ -54,7 +54,8 @@ window.SAPIENTIA = {
         currentTab: 'dashboard',
         isLoading: false,
         user: null,
-        hardwareInfo: null
+        hardwareInfo: null,
+        startTime: Date.now()
     },
     
     // Datos compartidos
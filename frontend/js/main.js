@@ -236,20 +236,26 @@ class SapientiaApp {
     async initializeUIModules() {
         Logger.debug('Inicializando módulos de UI...');
         
+        // Los módulos de UI se importan al abrir su pestaña (navigation.js);
+        // se registran los ya cargados y el resto a medida que llegan
+        this.registerUIModules();
+        window.SAPIENTIA.events.on('tabModulesLoaded', () => this.registerUIModules());
+    }
+    
+    registerUIModules() {
         const uiModules = [
             { name: 'dashboardManager', module: window.dashboardManager },
             { name: 'licenseGenerator', module: window.licenseGenerator },
             { name: 'licenseValidator', module: window.licenseValidator },
             { name: 'moduleAdmin', module: window.moduleAdmin },
+            { name: 'licenseTypesAdmin', module: window.licenseTypesAdmin },
             { name: 'controlPanel', module: window.controlPanel }
         ];
         
         for (const { name, module } of uiModules) {
-            if (module) {
+            if (module && !this.modules.has(name)) {
                 this.modules.set(name, module);
                 Logger.debug(`Módulo UI ${name} registrado`);
-            } else {
-                Logger.warn(`Módulo UI ${name} no disponible`);
             }
         }
     }
@@ -573,11 +579,6 @@ class SapientiaApp {
    
 }
 
- setTimeout(() => {
-    if (window.navigationManager) {
-        window.navigationManager.showTab('dashboard');
-    }
-}, 2000); 
 // Crear instancia global de la aplicación
 window.sapientiaApp = new SapientiaApp();
 
@@ -1,44 +1,246 @@
 // modules/control-panel.js - PANEL DE CONTROL DE LICENCIAS
 // ============================================================================
 
+// Tabla virtualizada: filas de altura fija y páginas pedidas al servidor según el scroll.
+// En el DOM solo viven las filas visibles (más un margen); en memoria, unas pocas páginas.
+const LICENSE_ROW_HEIGHT = 64;
+const LICENSE_PAGE_SIZE = 100;
+const LICENSE_OVERSCAN = 10;
+const LICENSE_MAX_CACHED_PAGES = 20;
+const LICENSE_SEARCH_DEBOUNCE = 300;
+
 class ControlPanel {
     constructor() {
-        this.allLicenses = [];
-        this.filteredLicenses = [];
-        this.refreshInterval = 60000; // 1 minuto
-        this.intervalId = null;
+        this.pages = new Map();          // índice de página -> licencias
+        this.pendingPages = new Set();
+        this.total = 0;
+        this.query = null;
+        this.queryVersion = 0;
+        this.visibleRange = [0, -1];
+        this.renderScheduled = false;
+        this.streamId = null;
+        this.lastStats = null;
+        this.lastStatsSignature = null;
+        this.scheduleQuery = Utils.debounce(() => this.resetQuery(), LICENSE_SEARCH_DEBOUNCE);
     }
     
     async load() {
         Logger.debug('Cargando Control Panel...');
         
-        try {
-            await this.loadControlData();
-            this.startAutoRefresh();
-            
-        } catch (error) {
-            Logger.error('Error cargando Control Panel:', error);
-            this.showError('Error cargando panel de control');
+        // Pintar el último estado conocido mientras llega el snapshot del stream
+        if (this.lastStats) {
+            this.updateDashboard(this.lastStats);
+        }
+        
+        this.setupViewport();
+        
+        // El HTML de la pestaña se regenera al entrar: si los filtros coinciden
+        // con la última consulta se reutilizan las páginas ya descargadas
+        const filters = this.readFilters();
+        if (this.query && this.pages.size > 0 && JSON.stringify(filters) === JSON.stringify(this.query)) {
+            this.render();
+            this.refreshVisiblePages();
+        } else {
+            await this.resetQuery();
+        }
+        
+        // Las estadísticas llegan por el stream SSE compartido (/admin/stream);
+        // la lista se pide por páginas, así que no se suscribe a la lista completa
+        this.startAutoRefresh();
+    }
+    
+    // ------------------------------------------------------------------
+    // Consulta y páginas
+    // ------------------------------------------------------------------
+    
+    readFilters() {
+        return {
+            search: (document.getElementById('searchLicenses')?.value || '').trim(),
+            licenseType: document.getElementById('filterLicenseType')?.value || '',
+            status: document.getElementById('filterLicenseStatus')?.value || ''
+        };
+    }
+    
+    filterLicenses() {
+        // Llamado desde los filtros de la pestaña; la búsqueda se resuelve en el servidor
+        this.scheduleQuery();
+    }
+    
+    async resetQuery() {
+        this.query = this.readFilters();
+        this.queryVersion++;
+        this.pages.clear();
+        this.pendingPages.clear();
+        this.total = 0;
+        
+        const container = this.setupViewport();
+        if (container) {
+            container.scrollTop = 0;
         }
+        this.render();
+        
+        await this.fetchPage(0);
     }
     
-    async loadControlData() {
+    async fetchPage(pageIndex, force = false) {
+        if (this.pendingPages.has(pageIndex) || (!force && this.pages.has(pageIndex))) {
+            return;
+        }
+        
+        const version = this.queryVersion;
+        this.pendingPages.add(pageIndex);
+        
         try {
-            // Cargar datos en paralelo
-            const [dashboardStats, allLicenses] = await Promise.all([
-                this.loadDashboardStats(),
-                this.loadAllLicenses()
-            ]);
+            const response = await window.apiClient.getLicensesPage({
+                ...this.query,
+                offset: pageIndex * LICENSE_PAGE_SIZE,
+                limit: LICENSE_PAGE_SIZE
+            });
             
-            this.updateDashboard(dashboardStats);
-            this.updateLicensesList(allLicenses);
+            // Respuesta de una búsqueda anterior: se descarta
+            if (version !== this.queryVersion) return;
             
+            this.total = response.total || 0;
+            this.pages.set(pageIndex, response.licenses || []);
+            this.evictPages();
+            this.scheduleRender();
         } catch (error) {
-            Logger.error('Error cargando datos del control panel:', error);
-            throw error;
+            Logger.error('Error cargando página de licencias:', error);
+            if (version === this.queryVersion && pageIndex === 0) {
+                this.showError(`Error cargando licencias: ${error.message}`);
+            }
+        } finally {
+            if (version === this.queryVersion) {
+                this.pendingPages.delete(pageIndex);
+            }
+        }
+    }
+    
+    evictPages() {
+        if (this.pages.size <= LICENSE_MAX_CACHED_PAGES) return;
+        
+        // Descartar las páginas más alejadas de la zona visible
+        const center = Math.floor(this.visibleRange[0] / LICENSE_PAGE_SIZE);
+        const byDistance = [...this.pages.keys()].sort(
+            (a, b) => Math.abs(b - center) - Math.abs(a - center)
+        );
+        while (this.pages.size > LICENSE_MAX_CACHED_PAGES) {
+            this.pages.delete(byDistance.shift());
+        }
+    }
+    
+    refreshVisiblePages() {
+        // Vuelve a pedir las páginas visibles (se siguen mostrando las actuales
+        // hasta que llegan) y descarta las demás, que se pedirán al hacer scroll
+        const [first, last] = this.visibleRange;
+        const firstPage = Math.floor(first / LICENSE_PAGE_SIZE);
+        const lastPage = Math.max(firstPage, Math.floor(last / LICENSE_PAGE_SIZE));
+        
+        for (const pageIndex of [...this.pages.keys()]) {
+            if (pageIndex < firstPage || pageIndex > lastPage) {
+                this.pages.delete(pageIndex);
+            }
+        }
+        for (let pageIndex = firstPage; pageIndex <= lastPage; pageIndex++) {
+            this.fetchPage(pageIndex, true);
+        }
+    }
+    
+    getLicenseAt(index) {
+        const page = this.pages.get(Math.floor(index / LICENSE_PAGE_SIZE));
+        return page ? page[index % LICENSE_PAGE_SIZE] || null : null;
+    }
+    
+    findLicense(licenseId) {
+        for (const page of this.pages.values()) {
+            const license = page.find(l => l.id === licenseId);
+            if (license) return license;
+        }
+        return null;
+    }
+    
+    // ------------------------------------------------------------------
+    // Render virtualizado
+    // ------------------------------------------------------------------
+    
+    setupViewport() {
+        const container = document.getElementById('licensesList');
+        if (!container) return null;
+        
+        if (!container.classList.contains('licenses-viewport')) {
+            container.className = 'licenses-viewport';
+            container.innerHTML = '<div class="licenses-spacer"></div>';
+            container.addEventListener('scroll', () => this.scheduleRender(), { passive: true });
+        }
+        return container;
+    }
+    
+    scheduleRender() {
+        if (this.renderScheduled) return;
+        this.renderScheduled = true;
+        requestAnimationFrame(() => this.render());
+    }
+    
+    render() {
+        this.renderScheduled = false;
+        
+        const container = document.getElementById('licensesList');
+        if (!container || !container.classList.contains('licenses-viewport')) return;
+        const spacer = container.firstElementChild;
+        
+        if (!this.pages.has(0) && this.total === 0) {
+            spacer.style.height = '';
+            spacer.innerHTML = `
+                <div class="loading-container">
+                    <div class="loading"></div>
+                    <p>Cargando licencias...</p>
+                </div>
+            `;
+            return;
+        }
+        
+        if (this.total === 0) {
+            spacer.style.height = '';
+            spacer.innerHTML = `
+                <div class="empty-state">
+                    <div class="empty-state-icon">📄</div>
+                    <div class="empty-state-title">No hay licencias</div>
+                    <div class="empty-state-description">No se encontraron licencias con los filtros actuales</div>
+                </div>
+            `;
+            return;
+        }
+        
+        spacer.style.height = `${this.total * LICENSE_ROW_HEIGHT}px`;
+        
+        const first = Math.max(0, Math.floor(container.scrollTop / LICENSE_ROW_HEIGHT) - LICENSE_OVERSCAN);
+        const last = Math.min(
+            this.total - 1,
+            Math.ceil((container.scrollTop + container.clientHeight) / LICENSE_ROW_HEIGHT) + LICENSE_OVERSCAN
+        );
+        this.visibleRange = [first, last];
+        
+        // Pedir las páginas que cubren la zona visible
+        for (let pageIndex = Math.floor(first / LICENSE_PAGE_SIZE); pageIndex <= Math.floor(last / LICENSE_PAGE_SIZE); pageIndex++) {
+            this.fetchPage(pageIndex);
         }
+        
+        const rows = [];
+        for (let index = first; index <= last; index++) {
+            const license = this.getLicenseAt(index);
+            rows.push(license ? this.createLicenseRowHtml(license, index) : this.createPlaceholderRowHtml(index));
+        }
+        spacer.innerHTML = rows.join('');
+    }
+    
+    displayLicenses() {
+        this.scheduleRender();
     }
     
+    // ------------------------------------------------------------------
+    // Estadísticas
+    // ------------------------------------------------------------------
+    
     async loadDashboardStats() {
         try {
             const response = await window.apiClient.getDashboardStats();
@@ -54,20 +256,6 @@ class ControlPanel {
         }
     }
     
-    async loadAllLicenses() {
-        try {
-            const response = await window.apiClient.getAllLicenses();
-            this.allLicenses = response.licenses || [];
-            this.filteredLicenses = [...this.allLicenses];
-            return this.allLicenses;
-        } catch (error) {
-            Logger.error('Error cargando licencias:', error);
-            this.allLicenses = [];
-            this.filteredLicenses = [];
-            return [];
-        }
-    }
-    
     updateDashboard(stats) {
         // Actualizar contadores
         const elements = {
@@ -106,134 +294,63 @@ class ControlPanel {
         }, 50);
     }
     
-    updateLicensesList(licenses) {
-        const container = document.getElementById('licensesList');
-        if (!container) return;
-        
-        if (licenses.length === 0) {
-            container.innerHTML = `
-                <div class="empty-state">
-                    <div class="empty-state-icon">📄</div>
-                    <div class="empty-state-title">No hay licencias</div>
-                    <div class="empty-state-description">No se encontraron licencias en el sistema</div>
-                </div>
-            `;
-            return;
-        }
-        
-        this.displayLicenses();
-    }
+    // ------------------------------------------------------------------
+    // Filas
+    // ------------------------------------------------------------------
     
-    displayLicenses() {
-        const container = document.getElementById('licensesList');
-        if (!container) return;
-        
-        const licensesHtml = this.filteredLicenses.map(license => {
-            return this.createLicenseItemHtml(license);
-        }).join('');
-        
-        container.innerHTML = licensesHtml;
+    getLicenseStatus(license) {
+        const isExpired = new Date(license.expiry_date) < new Date();
+        if (!license.is_active) return { statusClass: 'inactive', statusText: 'Inactiva', statusIcon: '❌' };
+        if (isExpired) return { statusClass: 'expired', statusText: 'Expirada', statusIcon: '⏰' };
+        return { statusClass: 'active', statusText: 'Activa', statusIcon: '✅' };
     }
     
-    createLicenseItemHtml(license) {
-        const isExpired = new Date(license.expiry_date) < new Date();
-        const statusClass = license.is_active ? (isExpired ? 'expired' : 'active') : 'inactive';
-        const statusText = license.is_active ? (isExpired ? 'Expirada' : 'Activa') : 'Inactiva';
-        const statusIcon = license.is_active ? (isExpired ? '⏰' : '✅') : '❌';
+    createLicenseRowHtml(license, index) {
+        const { statusClass, statusText, statusIcon } = this.getLicenseStatus(license);
         
         return `
-            <div class="license-item ${statusClass}" data-license="${license.id}">
-                <div class="license-header">
-                    <div class="license-info-section">
-                        <div class="license-key">${license.license_key}</div>
-                        <div class="license-client">
-                            <div class="license-client-name">${license.client_name}</div>
-                            <div class="license-client-email">${license.client_email}</div>
-                        </div>
-                    </div>
-                    <div class="license-actions">
-                        <span class="license-status ${statusClass}">
-                            ${statusIcon} ${statusText}
-                        </span>
-                        <div class="license-controls">
-                            <button class="control-button ${license.is_active ? 'deactivate' : 'activate'}" 
-                                    onclick="controlPanel.toggleLicense(${license.id})" 
-                                    title="${license.is_active ? 'Desactivar' : 'Activar'} licencia">
-                                ${license.is_active ? '🚫 Desactivar' : '✅ Activar'}
-                            </button>
-                            <button class="control-button info" 
-                                    onclick="controlPanel.showLicenseDetails(${license.id})" 
-                                    title="Ver detalles">
-                                📋 Detalles
-                            </button>
-                        </div>
-                    </div>
+            <div class="license-row ${statusClass}" data-license="${license.id}"
+                 style="top: ${index * LICENSE_ROW_HEIGHT}px; height: ${LICENSE_ROW_HEIGHT}px;">
+                <div class="license-key">${license.license_key}</div>
+                <div class="license-client">
+                    <div class="license-client-name">${license.client_name}</div>
+                    <div class="license-client-email">${license.client_email}</div>
                 </div>
-                
-                <div class="license-details">
-                    <div class="license-info">
-                        <div class="info-item">
-                            <div class="info-label">Tipo</div>
-                            <div class="info-value">🎫 ${license.license_type}</div>
-                        </div>
-                        <div class="info-item">
-                            <div class="info-label">Usuarios</div>
-                            <div class="info-value">👥 ${license.current_users}/${license.max_users}</div>
-                        </div>
-                        <div class="info-item">
-                            <div class="info-label">Expira</div>
-                            <div class="info-value">📅 ${Utils.formatDate(license.expiry_date)}</div>
-                        </div>
-                        <div class="info-item">
-                            <div class="info-label">Validaciones</div>
-                            <div class="info-value">🔄 ${license.validation_count}</div>
-                        </div>
-                    </div>
-                    
-                    <div class="license-modules">
-                        <div class="modules-header">📦 Módulos Permitidos:</div>
-                        <div class="modules-list">
-                            ${license.allowed_modules.map(module => `
-                                <span class="module-tag">
-                                    ${module}
-                                    <button onclick="controlPanel.blockModule(${license.id}, '${module}')" 
-                                            title="Bloquear módulo">❌</button>
-                                </span>
-                            `).join('')}
-                        </div>
-                    </div>
+                <div class="license-row-meta">🎫 ${license.license_type}</div>
+                <div class="license-row-meta">👥 ${license.current_users}/${license.max_users}</div>
+                <div class="license-row-meta">📅 ${Utils.formatDate(license.expiry_date)}</div>
+                <span class="license-status ${statusClass}">${statusIcon} ${statusText}</span>
+                <div class="license-controls">
+                    <button class="control-button ${license.is_active ? 'deactivate' : 'activate'}" 
+                            onclick="controlPanel.toggleLicense(${license.id})" 
+                            title="${license.is_active ? 'Desactivar' : 'Activar'} licencia">
+                        ${license.is_active ? '🚫' : '✅'}
+                    </button>
+                    <button class="control-button info" 
+                            onclick="controlPanel.showLicenseDetails(${license.id})" 
+                            title="Ver detalles y módulos">
+                        📋
+                    </button>
                 </div>
             </div>
         `;
     }
     
-    filterLicenses() {
-        const searchTerm = document.getElementById('searchLicenses')?.value.toLowerCase() || '';
-        const typeFilter = document.getElementById('filterLicenseType')?.value || '';
-        const statusFilter = document.getElementById('filterLicenseStatus')?.value || '';
-        
-        this.filteredLicenses = this.allLicenses.filter(license => {
-            const matchesSearch = !searchTerm || 
-                license.client_name.toLowerCase().includes(searchTerm) ||
-                license.client_email.toLowerCase().includes(searchTerm) ||
-                license.license_key.toLowerCase().includes(searchTerm);
-            
-            const matchesType = !typeFilter || license.license_type === typeFilter;
-            
-            const isExpired = new Date(license.expiry_date) < new Date();
-            let matchesStatus = true;
-            if (statusFilter === 'active') matchesStatus = license.is_active && !isExpired;
-            if (statusFilter === 'inactive') matchesStatus = !license.is_active;
-            if (statusFilter === 'expired') matchesStatus = isExpired;
-            
-            return matchesSearch && matchesType && matchesStatus;
-        });
-        
-        this.displayLicenses();
+    createPlaceholderRowHtml(index) {
+        return `
+            <div class="license-row placeholder"
+                 style="top: ${index * LICENSE_ROW_HEIGHT}px; height: ${LICENSE_ROW_HEIGHT}px;">
+                <div class="loading"></div>
+            </div>
+        `;
     }
     
+    // ------------------------------------------------------------------
+    // Acciones
+    // ------------------------------------------------------------------
+    
     async toggleLicense(licenseId) {
-        const license = this.allLicenses.find(l => l.id === licenseId);
+        const license = this.findLicense(licenseId);
         if (!license) return;
         
         const action = license.is_active ? 'desactivar' : 'activar';
@@ -276,11 +393,12 @@ class ControlPanel {
             if (response.success) {
                 this.showSuccess(response.message);
                 
-                // Actualizar estado local
-                const license = this.allLicenses.find(l => l.id === licenseId);
+                // Actualizar estado local y el modal de detalles abierto
+                const license = this.findLicense(licenseId);
                 if (license) {
                     license.allowed_modules = response.remaining_modules;
-                    this.displayLicenses();
+                    document.querySelectorAll('.modal.license-details-dialog').forEach(modal => modal.remove());
+                    this.showLicenseDetails(licenseId);
                 }
             } else {
                 this.showError('Error bloqueando módulo');
@@ -293,7 +411,7 @@ class ControlPanel {
     }
     
     showLicenseDetails(licenseId) {
-        const license = this.allLicenses.find(l => l.id === licenseId);
+        const license = this.findLicense(licenseId);
         if (!license) return;
         
         const modal = this.createLicenseDetailsModal(license);
@@ -306,7 +424,7 @@ class ControlPanel {
         const daysRemaining = Math.ceil((new Date(license.expiry_date) - new Date()) / (1000 * 60 * 60 * 24));
         
         const modal = document.createElement('div');
-        modal.className = 'modal';
+        modal.className = 'modal license-details-dialog';
         modal.innerHTML = `
             <div class="modal-content" style="max-width: 700px;">
                 <div class="modal-header">
@@ -348,7 +466,11 @@ class ControlPanel {
                         <h4>📦 Módulos</h4>
                         <div class="modules-detail">
                             ${license.allowed_modules.map(module => `
-                                <span class="module-tag">${module}</span>
+                                <span class="module-tag">
+                                    ${module}
+                                    <button onclick="controlPanel.blockModule(${license.id}, '${module}')" 
+                                            title="Bloquear módulo">❌</button>
+                                </span>
                             `).join('')}
                         </div>
                     </div>
@@ -378,25 +500,27 @@ class ControlPanel {
     }
     
     startAutoRefresh() {
-        if (this.intervalId) {
-            clearInterval(this.intervalId);
-        }
+        if (this.streamId !== null) return;
         
-        this.intervalId = setInterval(async () => {
-            if (document.querySelector('#control.active')) {
-                try {
-                    await this.loadControlData();
-                } catch (error) {
-                    Logger.error('Error en auto-refresh del control panel:', error);
+        this.streamId = window.adminStream.subscribe({
+            onStats: (data) => {
+                this.lastStats = data.stats || {};
+                this.updateDashboard(this.lastStats);
+                
+                // Si cambiaron las estadísticas, refrescar solo las páginas visibles
+                const signature = JSON.stringify(this.lastStats);
+                if (this.lastStatsSignature !== null && signature !== this.lastStatsSignature) {
+                    this.refreshVisiblePages();
                 }
+                this.lastStatsSignature = signature;
             }
-        }, this.refreshInterval);
+        });
     }
     
     stopAutoRefresh() {
-        if (this.intervalId) {
-            clearInterval(this.intervalId);
-            this.intervalId = null;
+        if (this.streamId !== null) {
+            window.adminStream.unsubscribe(this.streamId);
+            this.streamId = null;
         }
     }
     
@@ -449,4 +573,13 @@ class ControlPanel {
 // Instancia global
 window.controlPanel = new ControlPanel();
 
+// Cerrar la suscripción al stream al salir de la pestaña
+if (window.SAPIENTIA && window.SAPIENTIA.events) {
+    window.SAPIENTIA.events.on('tabChanged', (event) => {
+        if (event.from === 'control' && event.to !== 'control') {
+            window.controlPanel.stopAutoRefresh();
+        }
+    });
+}
+
 Logger.info('Control Panel initialized');
\ No newline at end of file
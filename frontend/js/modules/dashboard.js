@@ -3,25 +3,45 @@
 
 class DashboardManager {
     constructor() {
-        this.refreshInterval = 30000; // 30 segundos
-        this.intervalId = null;
+        this.streamId = null;
+        this.lastStats = null;
         this.isLoading = false;
     }
     
     async load() {
         Logger.debug('Cargando dashboard...');
         
-        try {
-            this.isLoading = true;
-            await this.loadDashboardData();
-            this.startAutoRefresh();
-            
-        } catch (error) {
-            Logger.error('Error cargando dashboard:', error);
-            this.showDashboardError(error.message);
-        } finally {
-            this.isLoading = false;
+        // Pintar el último estado conocido mientras llega el siguiente tick
+        if (this.lastStats) {
+            this.handleStreamStats(this.lastStats);
         }
+        
+        // Las métricas llegan por el stream SSE compartido (/admin/stream)
+        this.startAutoRefresh();
+    }
+    
+    handleStreamStats(data) {
+        this.lastStats = data;
+        this.updateDashboardMetrics({
+            totalModules: data.catalog.total_modules,
+            totalLicenseTypes: data.catalog.total_license_types,
+            systemStatus: data.system.status,
+            responseTime: Math.round(data.compute_ms)
+        });
+        
+        this.updateSystemInfo({
+            status: data.system.status,
+            version: data.system.version,
+            uptime: this.calculateUptime()
+        });
+    }
+    
+    handleStreamError() {
+        this.updateSystemInfo({
+            status: 'offline',
+            version: '2.0.0',
+            uptime: this.calculateUptime()
+        });
     }
     
     async loadDashboardData() {
@@ -206,30 +226,21 @@ class DashboardManager {
     }
     
     startAutoRefresh() {
-        // Limpiar intervalo existente
-        if (this.intervalId) {
-            clearInterval(this.intervalId);
-        }
+        if (this.streamId !== null) return;
         
-        // Configurar nuevo intervalo
-        this.intervalId = setInterval(async () => {
-            if (!this.isLoading && document.querySelector('#dashboard.active')) {
-                try {
-                    await this.loadDashboardData();
-                } catch (error) {
-                    Logger.error('Error en auto-refresh del dashboard:', error);
-                }
-            }
-        }, this.refreshInterval);
+        this.streamId = window.adminStream.subscribe({
+            onStats: (data) => this.handleStreamStats(data),
+            onError: () => this.handleStreamError()
+        });
         
-        Logger.debug(`Auto-refresh configurado cada ${this.refreshInterval / 1000}s`);
+        Logger.debug('Dashboard suscrito al stream de administración');
     }
     
     stopAutoRefresh() {
-        if (this.intervalId) {
-            clearInterval(this.intervalId);
-            this.intervalId = null;
-            Logger.debug('Auto-refresh detenido');
+        if (this.streamId !== null) {
+            window.adminStream.unsubscribe(this.streamId);
+            this.streamId = null;
+            Logger.debug('Dashboard desuscrito del stream de administración');
         }
     }
     
@@ -314,17 +325,10 @@ if (window.SAPIENTIA && window.SAPIENTIA.events) {
     console.log('⚠️ SAPIENTIA events no disponible - usando fallback');
 }
 
-// Configurar tiempo de inicio SOLO SI SAPIENTIA EXISTE
-if (window.SAPIENTIA && window.SAPIENTIA.state) {
-    window.SAPIENTIA.state.startTime = Date.now();
-} else {
-    // Crear estructura básica si no existe
-    window.SAPIENTIA = window.SAPIENTIA || { state: {} };
-    window.SAPIENTIA.state = window.SAPIENTIA.state || {};
-    window.SAPIENTIA.state.startTime = Date.now();
-}
-
-// Configurar tiempo de inicio de la aplicación
-window.SAPIENTIA.state.startTime = Date.now();
+// El módulo se carga al abrir la pestaña: el uptime cuenta desde el arranque
+// de la aplicación (config.js), no desde la primera visita al dashboard
+window.SAPIENTIA = window.SAPIENTIA || { state: {} };
+window.SAPIENTIA.state = window.SAPIENTIA.state || {};
+window.SAPIENTIA.state.startTime = window.SAPIENTIA.state.startTime || Date.now();
 
 Logger.info('Dashboard Manager initialized');
\ No newline at end of file
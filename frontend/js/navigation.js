@@ -1,9 +1,21 @@
 // navigation.js - SISTEMA DE NAVEGACIÓN ENTRE PESTAÑAS
 // ============================================================================
 
+// Módulos de cada pestaña: se cargan con import() la primera vez que se abre
+// la pestaña, así el arranque no descarga ni consulta la API de las demás.
+// Las rutas son absolutas: build_assets.py las reescribe a versiones con hash.
+const TAB_MODULES = {
+    dashboard: ['/js/modules/dashboard.js'],
+    generate: ['/js/modules/license-generator.js'],
+    validate: ['/js/modules/license-validator.js'],
+    admin: ['/js/modules/module-admin.js', '/js/modules/license-types-admin.js'],
+    control: ['/js/modules/control-panel.js']
+};
+
 class NavigationManager {
     constructor() {
-        this.currentTab = 'dashboard';
+        // Ninguna pestaña cargada hasta restoreLastTab()
+        this.currentTab = null;
         this.tabs = ['dashboard', 'generate', 'validate', 'admin', 'control'];
         this.tabLoaders = new Map();
         this.init();
@@ -11,7 +23,6 @@ class NavigationManager {
     
     init() {
         this.bindEvents();
-        this.loadTabContent();
         this.restoreLastTab();
     }
     
@@ -44,7 +55,9 @@ this.showTab(tabName);
         
         // Guardar pestaña actual en localStorage
         window.addEventListener('beforeunload', () => {
-            Utils.storage.set(CONFIG.STORAGE.KEYS.LAST_TAB, this.currentTab);
+            if (this.currentTab) {
+                Utils.storage.set(CONFIG.STORAGE.KEYS.LAST_TAB, this.currentTab);
+            }
         });
     }
     
@@ -489,7 +502,30 @@ this.showTab(tabName);
         }
     }
     
+    loadTabModules(tabName) {
+        // Una sola promesa por pestaña: clics repetidos no vuelven a importar
+        if (!this.tabLoaders.has(tabName)) {
+            const modules = TAB_MODULES[tabName] || [];
+            const loader = Promise.all(modules.map(path => import(path)))
+                .then(() => {
+                    Logger.debug(`Módulos de ${tabName} cargados`);
+                    if (window.SAPIENTIA && window.SAPIENTIA.events) {
+                        window.SAPIENTIA.events.emit('tabModulesLoaded', { tab: tabName });
+                    }
+                })
+                .catch(error => {
+                    // Permitir reintentar en el siguiente cambio de pestaña
+                    this.tabLoaders.delete(tabName);
+                    throw error;
+                });
+            this.tabLoaders.set(tabName, loader);
+        }
+        return this.tabLoaders.get(tabName);
+    }
+    
     async executeTabLoader(tabName) {
+        await this.loadTabModules(tabName);
+        
         switch (tabName) {
             case 'dashboard':
                 if (window.dashboardManager) {
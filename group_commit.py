@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Group Commit
+============
+Agrupa escrituras concurrentes (alta de licencias, renovaciones, cambios del
+panel) en una sola transacción para pagar un fsync por grupo y no uno por
+request. Opcional: ``SAPIENTIA_GROUP_COMMIT=1``.
+
+Cada escritura es una función ``fn(db) -> resultado`` que no hace commit. Un
+hilo del worker recoge las que llegan durante ``WINDOW_MS`` (o hasta
+``MAX_BATCH``) y las aplica en orden sobre la misma sesión, cada una dentro de
+su SAVEPOINT:
+
+- Si una falla (409, IntegrityError por clave duplicada...) se revierte solo su
+  SAVEPOINT y su excepción llega a su llamador; el resto del grupo sigue.
+- Tras el commit del grupo cada llamador recibe su resultado. Si falla el
+  commit, las escrituras del grupo se reintentan una a una en transacciones
+  propias, de modo que ninguna se pierde ni se aplica dos veces.
+
+Mientras un grupo hace commit se acumula el siguiente: con más concurrencia,
+grupos más grandes y el mismo número de fsyncs.
+
+Con el group commit desactivado ``run()`` ejecuta la función sobre la sesión
+del request y hace commit, igual que antes.
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from main import SessionLocal
+from invalidation import invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("SAPIENTIA_GROUP_COMMIT", "0") == "1"
+WINDOW_MS = float(os.getenv("SAPIENTIA_GROUP_COMMIT_WINDOW_MS", 2))
+MAX_BATCH = int(os.getenv("SAPIENTIA_GROUP_COMMIT_MAX_BATCH", 64))
+
+WriteFn = Callable[[Session], Any]
+
+
+class GroupCommitter:
+    """Cola de escrituras del worker y el hilo que las confirma por grupos"""
+
+    def __init__(self, session_factory=SessionLocal, window_ms: float = WINDOW_MS, max_batch: int = MAX_BATCH):
+        self.session_factory = session_factory
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Optional[Tuple[WriteFn, Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.stats = {"groups": 0, "writes": 0, "largest_group": 0, "failed_commits": 0}
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+
+    async def run(self, db: Session, fn: WriteFn) -> Any:
+        """Aplica fn(db) y confirma; devuelve su resultado o relanza su excepción"""
+        if not ENABLED:
+            try:
+                result = fn(db)
+                db.commit()
+                return result
+            except Exception:
+                db.rollback()
+                raise
+        return await asyncio.wrap_future(self.submit(fn))
+
+    def submit(self, fn: WriteFn) -> Future:
+        self.start()
+        future = Future()
+        self._queue.put((fn, future))
+        return future
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout=5)
+
+    # ------------------------------------------------------------------
+    # Hilo de commit
+    # ------------------------------------------------------------------
+
+    def _collect(self, first) -> List[Tuple[WriteFn, Future]]:
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            try:
+                # Lo que ya está en cola entra sin esperar; después, hasta agotar la ventana
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            try:
+                self._apply_group(batch)
+            except Exception as e:
+                logger.error(f"Error en group commit: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _apply_group(self, batch: List[Tuple[WriteFn, Future]]):
+        # Resultados y errores se entregan tras el commit: un 409 provocado por otra
+        # escritura del grupo no debe llegar al llamador si el grupo no se confirma
+        outcomes = []
+        db = self.session_factory()
+        try:
+            for fn, future in batch:
+                checkpoint = invalidation_bus.checkpoint(db)
+                try:
+                    with db.begin_nested():
+                        result = fn(db)
+                    # Tras el RELEASE: si falla, la escritura cuenta como fallida y no dos veces
+                    outcome = (future, result, None)
+                except Exception as e:
+                    invalidation_bus.discard_since(db, checkpoint)
+                    outcome = (future, None, e)
+                outcomes.append(outcome)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.stats["failed_commits"] += 1
+            logger.warning(f"Falló el commit de un grupo de {len(batch)} escrituras, reintentando una a una: {e}")
+            outcomes = None
+        finally:
+            db.close()
+
+        if outcomes is None:
+            for fn, future in batch:
+                self._apply_single(fn, future)
+            return
+
+        self.stats["groups"] += 1
+        self.stats["writes"] += len(batch)
+        self.stats["largest_group"] = max(self.stats["largest_group"], len(batch))
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def _apply_single(self, fn: WriteFn, future: Future):
+        db = self.session_factory()
+        try:
+            result = fn(db)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            db.close()
+
+
+# Instancia del proceso
+group_committer = GroupCommitter()
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Idempotency Keys
+================
+Reintentos seguros de las operaciones que modifican licencias. El cliente envía
+la cabecera ``Idempotency-Key`` y la operación se ejecuta una sola vez por clave:
+
+- La primera petición con una clave se ejecuta y su respuesta (estado,
+  cabeceras y cuerpo) se guarda ``TTL_SECONDS``. Las repeticiones reciben esa
+  respuesta con ``Idempotency-Replayed: true``, sin volver a validar, calcular
+  huellas ni escribir en la base de datos.
+- Las repeticiones concurrentes esperan a la ejecución en curso en vez de
+  competir con ella. Dentro del worker comparten un futuro y, con Redis, entre
+  workers y nodos se reserva la clave con SET NX.
+- La misma clave con otra petición (método, ruta o cuerpo distintos) se
+  rechaza con 422. De los cuerpos grandes (importaciones de archivos) solo se
+  leen por adelantado ``FINGERPRINT_BODY_BYTES``: la huella usa ese prefijo y
+  la longitud declarada, y el resto pasa a la app sin copiarse en memoria.
+- Los 5xx no se guardan y el siguiente reintento vuelve a ejecutar.
+
+Las respuestas se guardan en una LRU en memoria acotada
+(``SAPIENTIA_IDEMPOTENCY_MAX_ENTRIES``) y, si hay Redis, también en L2 (cache.py)
+para compartirlas entre workers. Sin Redis cada worker deduplica solo lo suyo.
+Las llamadas a Redis se hacen en el pool de hilos, fuera del event loop.
+
+Aplica a ``/license/request``, a la renovación y desactivación de licencias y a
+los endpoints de escritura de ``/admin``. Las peticiones sin cabecera no cambian.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from cache import cache, NS_IDEMPOTENCY, NS_IDEMPOTENCY_LOCK
+
+logger = logging.getLogger(__name__)
+
+TTL_SECONDS = float(os.getenv("SAPIENTIA_IDEMPOTENCY_TTL", 24 * 3600))
+MAX_ENTRIES = int(os.getenv("SAPIENTIA_IDEMPOTENCY_MAX_ENTRIES", 10000))
+# Respuestas mayores (informes de importación enormes) no se guardan
+MAX_RESPONSE_BYTES = 256 * 1024
+MAX_KEY_LENGTH = 255
+# Cuerpo que se lee antes de ejecutar para calcular la huella
+FINGERPRINT_BODY_BYTES = 64 * 1024
+# Duración de la reserva entre workers: tope de lo que tarda una ejecución
+IN_FLIGHT_SECONDS = 60
+POLL_SECONDS = 0.05
+
+HEADER = b"idempotency-key"
+REPLAYED_HEADER = (b"idempotency-replayed", b"true")
+METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+PATHS = ("/license/request", "/license/renew/", "/license/deactivate/", "/admin/")
+
+
+class IdempotencyStore:
+    """Respuestas por clave: LRU en memoria con TTL y copia en L2"""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl: float = TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"executed": 0, "replayed": 0, "waited": 0, "mismatched": 0}
+
+    def get_local(self, key: str) -> Optional[dict]:
+        """Respuesta de la LRU del worker (sin E/S)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, response = entry
+                if expires_at >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    return response
+                del self._entries[key]
+        return None
+
+    def get(self, key: str) -> Optional[dict]:
+        """Respuesta de la LRU o de L2 (bloqueante: llamar con asyncio.to_thread)"""
+        response = self.get_local(key)
+        if response is not None:
+            return response
+        return cache.get(NS_IDEMPOTENCY, key)
+
+    def set(self, key: str, response: dict):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        cache.set(NS_IDEMPOTENCY, key, response, self.ttl)
+
+
+# Instancia del proceso
+idempotency_store = IdempotencyStore()
+
+
+async def _buffer_prefix(receive, limit: int = FINGERPRINT_BODY_BYTES):
+    """Lee el cuerpo hasta pasar de limit bytes
+
+    Devuelve (lo leído, ¿cuerpo completo?, receive que lo vuelve a entregar a la
+    app seguido del resto del cuerpo).
+    """
+    chunks, size, more_body = [], 0, True
+    while more_body and size <= limit:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None, False, receive
+        chunk = message.get("body", b"")
+        chunks.append(chunk)
+        size += len(chunk)
+        more_body = message.get("more_body", False)
+    prefix = b"".join(chunks)
+    delivered = False
+
+    async def replay():
+        nonlocal delivered
+        if delivered:
+            return await receive()
+        delivered = True
+        return {"type": "http.request", "body": prefix, "more_body": more_body}
+
+    return prefix, not more_body, replay
+
+
+def _fingerprint(scope, prefix: bytes, complete: bool, limit: int = FINGERPRINT_BODY_BYTES) -> str:
+    """Huella de la petición; de un cuerpo de más de limit bytes, el prefijo y la longitud declarada"""
+    parts = [scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b"")]
+    if complete and len(prefix) <= limit:
+        parts.append(prefix)
+    else:
+        # El corte no depende de cómo llegaron los fragmentos
+        parts += [prefix[:limit], dict(scope["headers"]).get(b"content-length", b"")]
+    return hashlib.sha256(b"\0".join(parts)).hexdigest()
+
+
+async def _send_response(send, status: int, headers: list, body: bytes):
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send, status: int, content: dict):
+    body = json.dumps(content).encode()
+    await _send_response(send, status, [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode())
+    ], body)
+
+
+class IdempotencyMiddleware:
+    """Middleware ASGI: una ejecución por Idempotency-Key, repeticiones desde el almacén"""
+
+    def __init__(self, app, store: Optional[IdempotencyStore] = None):
+        self.app = app
+        self.store = store or idempotency_store
+        # Ejecuciones en curso en este worker: clave -> futuro con la respuesta
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["method"] not in METHODS
+                or not scope["path"].startswith(PATHS)):
+            return await self.app(scope, receive, send)
+        raw_key = dict(scope["headers"]).get(HEADER)
+        if raw_key is None:
+            return await self.app(scope, receive, send)
+
+        key = raw_key.decode("latin-1").strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return await _send_json(send, 400, {
+                "detail": f"Idempotency-Key debe tener entre 1 y {MAX_KEY_LENGTH} caracteres"
+            })
+
+        prefix, complete, receive = await _buffer_prefix(receive)
+        if prefix is None:
+            return
+        fingerprint = _fingerprint(scope, prefix, complete)
+
+        waited = False
+        while True:
+            response = self.store.get_local(key)
+            if response is None and key in self._in_flight:
+                waited = True
+                response = await asyncio.shield(self._in_flight[key])
+                if response is None:
+                    # La ejecución falló: volver a intentarlo
+                    continue
+            if response is None:
+                response, claimed = await self._reserve(key)
+                if claimed:
+                    return await self._execute(key, fingerprint, scope, receive, send)
+                if response is None:
+                    # Otro worker la está ejecutando: esperar su respuesta o a que libere la reserva
+                    waited = True
+                    await asyncio.sleep(POLL_SECONDS)
+                    continue
+            break
+
+        if waited:
+            self.store.stats["waited"] += 1
+        if response["fingerprint"] != fingerprint:
+            self.store.stats["mismatched"] += 1
+            return await _send_json(send, 422, {"detail": "Idempotency-Key ya usada con otra petición"})
+        self.store.stats["replayed"] += 1
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in response["headers"]]
+        await _send_response(send, response["status"], headers + [REPLAYED_HEADER],
+                             base64.b64decode(response["body"]))
+
+    async def _reserve(self, key: str):
+        """Reserva la clave para ejecutarla: (None, True), o (respuesta guardada o None, False)
+
+        El futuro se registra antes del primer await: las repeticiones de este
+        worker lo esperan en vez de consultar Redis. Si no se reserva, se
+        resuelve con la respuesta encontrada (o None) y se retira.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        response, claimed = None, False
+        try:
+            response = await asyncio.to_thread(self.store.get, key)
+            if response is None:
+                claim = await asyncio.to_thread(cache.claim, NS_IDEMPOTENCY_LOCK, key, IN_FLIGHT_SECONDS)
+                claimed = claim is not False
+                if claim:
+                    # Otro worker pudo guardar su respuesta y liberar la reserva entre las dos llamadas
+                    response = await asyncio.to_thread(self.store.get, key)
+                    if response is not None:
+                        claimed = False
+                        await asyncio.to_thread(cache.delete, NS_IDEMPOTENCY_LOCK, key)
+        except BaseException:
+            if claimed:
+                claimed = False
+                cache.delete(NS_IDEMPOTENCY_LOCK, key)
+            raise
+        finally:
+            if not claimed:
+                del self._in_flight[key]
+                future.set_result(response)
+        return response, claimed
+
+    async def _execute(self, key: str, fingerprint: str, scope, receive, send):
+        """Ejecuta la app con la clave ya reservada por _reserve"""
+        future = self._in_flight[key]
+        start = {}
+        chunks = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        response = None
+        try:
+            await self.app(scope, receive, capture)
+            body = b"".join(chunks)
+            response = {
+                "fingerprint": fingerprint,
+                "status": start.get("status", 500),
+                "headers": [
+                    [name.decode("latin-1"), value.decode("latin-1")]
+                    for name, value in start.get("headers", [])
+                ],
+                "body": base64.b64encode(body).decode("ascii")
+            }
+            self.store.stats["executed"] += 1
+            if response["status"] < 500 and len(body) <= MAX_RESPONSE_BYTES:
+                await asyncio.to_thread(self.store.set, key, response)
+        finally:
+            # Si la app falló, quien esperaba vuelve a intentarlo y ejecuta él mismo
+            del self._in_flight[key]
+            future.set_result(response)
+            await asyncio.to_thread(cache.delete, NS_IDEMPOTENCY_LOCK, key)
@@ -41,27 +41,33 @@ except ImportError as e:
     app = FastAPI(title="Sapientia License Server")
 
 # Imports necesarios para archivos estáticos y respuestas
-from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
+from static_assets import PrecompressedStaticFiles, ApiGZipMiddleware
+from build_assets import DEFAULT_OUT_DIR as build_dir
 
 # Montar archivos estáticos del frontend
 frontend_dir = Path("frontend")
 if frontend_dir.exists():
     # Montar CSS
     if (frontend_dir / "css").exists():
-        app.mount("/css", StaticFiles(directory="frontend/css"), name="css")
+        app.mount("/css", PrecompressedStaticFiles(directory="frontend/css"), name="css")
         print("✅ CSS montado")
     
     # Montar JS
     if (frontend_dir / "js").exists():
-        app.mount("/js", StaticFiles(directory="frontend/js"), name="js")
+        app.mount("/js", PrecompressedStaticFiles(directory="frontend/js"), name="js")
         print("✅ JS montado")
     
     # Montar Assets
     if (frontend_dir / "assets").exists():
-        app.mount("/assets", StaticFiles(directory="frontend/assets"), name="assets")
+        app.mount("/assets", PrecompressedStaticFiles(directory="frontend/assets"), name="assets")
         print("✅ Assets montado")
     
+    # Montar bundles con hash (python build_assets.py)
+    if (build_dir / "index.html").exists():
+        app.mount("/static", PrecompressedStaticFiles(directory=str(build_dir), immutable=True), name="static")
+        print("✅ Bundles precomprimidos montados")
+    
     print("✅ Archivos estáticos del frontend montados completamente")
 else:
     print("⚠️ Directorio frontend no encontrado")
@@ -70,9 +76,10 @@ else:
 @app.get("/")
 async def serve_frontend():
     """Servir la aplicación frontend modular"""
-    frontend_path = Path("frontend/index.html")
-    if frontend_path.exists():
-        return FileResponse(frontend_path)
+    # Preferir la página construida (bundles con hash); si no, la versión de desarrollo
+    for frontend_path in (build_dir / "index.html", Path("frontend/index.html")):
+        if frontend_path.exists():
+            return FileResponse(frontend_path, headers={"Cache-Control": "no-cache"})
     return {"message": "Sapientia funcionando - Puerto 5450 configurado", "frontend": "no encontrado"}
 
 # Health check endpoint
@@ -99,7 +106,6 @@ async def get_system_info():
 
 # Configuraciones adicionales para Docker
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
 from fastapi import Request
 import time
 
@@ -112,8 +118,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Compresión
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+# Compresión de la API; los estáticos se sirven precomprimidos
+app.add_middleware(ApiGZipMiddleware, minimum_size=1000)
 
 # Logging middleware
 @app.middleware("http")
@@ -123,7 +129,7 @@ async def log_requests(request: Request, call_next):
     process_time = time.time() - start_time
     
     # Log solo para requests importantes
-    if not request.url.path.startswith("/css") and not request.url.path.startswith("/js"):
+    if not request.url.path.startswith(("/css", "/js", "/static")):
         print(f"🌐 {request.method} {request.url.path} - {response.status_code} - {process_time:.3f}s")
     
     response.headers["X-Process-Time"] = str(process_time)
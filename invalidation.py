@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+Invalidation Bus
+================
+Bus de invalidación entre workers y nodos.
+
+Los endpoints que modifican licencias o el catálogo registran un cambio con
+``invalidation_bus.publish(db, scope, key, ...)`` dentro de su transacción:
+
+- En PostgreSQL se emite ``pg_notify`` en la misma transacción (solo se entrega
+  si hay commit) y cada worker lo recibe con ``LISTEN``.
+- En SQLite (u otros motores) se inserta una fila en ``cache_invalidations`` y
+  cada worker consulta periódicamente las filas con id mayor al último visto.
+
+Las operaciones en bloque publican un solo cambio para todas sus licencias con
+``publish_many``: llega con ``key=None`` y las claves en ``data["keys"]``; los
+handlers las obtienen con ``change_keys(change)``.
+
+El proceso que publica entrega el cambio a sus propios handlers al hacer commit;
+los demás lo reciben por el listener. Los handlers se ejecutan siempre en el
+event loop del worker.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import select
+import socket
+import threading
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Ámbitos de invalidación
+SCOPE_LICENSE = "license"   # key = license_key
+SCOPE_CATALOG = "catalog"   # módulos y tipos de licencia; key = nombre o None
+
+CHANNEL = "sapientia_invalidation"
+POLL_SECONDS = float(os.getenv("SAPIENTIA_INVALIDATION_POLL", 1.0))
+RETENTION = timedelta(hours=int(os.getenv("SAPIENTIA_INVALIDATION_RETENTION_HOURS", 1)))
+POLL_BATCH = 500
+PRUNE_EVERY_POLLS = 300
+RECONNECT_SECONDS = 5
+# pg_notify rechaza payloads de 8000 bytes o más
+MAX_PAYLOAD_BYTES = 7000
+
+Handler = Callable[[Dict[str, Any]], None]
+
+_PENDING_KEY = "pending_invalidations"
+
+
+class InvalidationBus:
+    """Publica cambios en la transacción del caller y los reparte a los handlers de cada worker"""
+
+    def __init__(self):
+        self.origin: Optional[str] = None
+        self._handlers: Dict[str, List[Handler]] = defaultdict(list)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Suscripción y publicación
+    # ------------------------------------------------------------------
+
+    def subscribe(self, scope: str, handler: Handler):
+        """Registra un handler(change) para un ámbito"""
+        self._handlers[scope].append(handler)
+
+    def publish(
+        self,
+        db: Session,
+        scope: str,
+        key: Optional[str] = None,
+        event_type: Optional[str] = None,
+        data: Optional[Dict[str, Any]] = None
+    ):
+        """Registra un cambio en la transacción de db; se entrega tras el commit"""
+        change = {
+            "scope": scope,
+            "key": key,
+            "event_type": event_type,
+            "data": data or {},
+            "origin": self._origin()
+        }
+
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": CHANNEL, "payload": json.dumps(change, default=str)}
+            )
+        else:
+            from main import CacheInvalidation
+            db.add(CacheInvalidation(
+                scope=scope,
+                key=key,
+                event_type=event_type,
+                payload=change["data"],
+                origin=change["origin"]
+            ))
+
+        db.info.setdefault(_PENDING_KEY, []).append(change)
+
+    def publish_many(
+        self,
+        db: Session,
+        scope: str,
+        keys: List[str],
+        event_type: Optional[str] = None,
+        data: Optional[Dict[str, Any]] = None
+    ):
+        """Un solo cambio para varias claves; se parte solo si no cabe en un payload"""
+        base = len(json.dumps(data or {}, default=str)) + 64
+        chunk, size = [], base
+        for key in keys:
+            entry = len(json.dumps(key)) + 2
+            if chunk and size + entry > MAX_PAYLOAD_BYTES:
+                self.publish(db, scope, None, event_type, {**(data or {}), "keys": chunk})
+                chunk, size = [], base
+            chunk.append(key)
+            size += entry
+        if chunk:
+            self.publish(db, scope, None, event_type, {**(data or {}), "keys": chunk})
+
+    def checkpoint(self, db: Session) -> int:
+        """Marca de los cambios pendientes de db (antes de un SAVEPOINT)"""
+        return len(db.info.get(_PENDING_KEY, ()))
+
+    def discard_since(self, db: Session, checkpoint: int):
+        """Descarta los cambios registrados tras la marca (SAVEPOINT revertido)"""
+        if _PENDING_KEY in db.info:
+            del db.info[_PENDING_KEY][checkpoint:]
+
+    def _origin(self) -> str:
+        # Se calcula en el worker (después del fork), no en el master
+        if self.origin is None:
+            self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        return self.origin
+
+    # ------------------------------------------------------------------
+    # Entrega
+    # ------------------------------------------------------------------
+
+    def _dispatch(self, change: Dict[str, Any]):
+        for handler in self._handlers.get(change["scope"], ()):
+            try:
+                handler(change)
+            except Exception as e:
+                logger.error(f"Error en handler de invalidación {change['scope']}: {e}")
+
+    def _schedule(self, change: Dict[str, Any]):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self._dispatch(change)
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._dispatch(change)
+        else:
+            loop.call_soon_threadsafe(self._dispatch, change)
+
+    def _receive(self, change: Dict[str, Any]):
+        """Cambio llegado de otro proceso"""
+        if change.get("origin") == self.origin:
+            return
+        self._schedule(change)
+
+    # ------------------------------------------------------------------
+    # Listener
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Arranca el listener del worker (llamar desde el startup de la app)"""
+        if self._thread is not None:
+            return
+        from main import engine
+
+        self._origin()
+        self._loop = asyncio.get_running_loop()
+        self._stop.clear()
+
+        target = self._listen_postgres if engine.dialect.name == "postgresql" else self._poll_table
+        self._thread = threading.Thread(target=target, args=(engine,), name="invalidation-bus", daemon=True)
+        self._thread.start()
+        logger.info(f"Bus de invalidación iniciado ({engine.dialect.name})")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=RECONNECT_SECONDS)
+            self._thread = None
+
+    def _listen_postgres(self, engine):
+        while not self._stop.is_set():
+            connection = None
+            try:
+                connection = engine.raw_connection()
+                dbapi_connection = connection.dbapi_connection
+                dbapi_connection.autocommit = True
+                cursor = dbapi_connection.cursor()
+                cursor.execute(f"LISTEN {CHANNEL}")
+
+                while not self._stop.is_set():
+                    if select.select([dbapi_connection], [], [], POLL_SECONDS) == ([], [], []):
+                        continue
+                    dbapi_connection.poll()
+                    while dbapi_connection.notifies:
+                        notify = dbapi_connection.notifies.pop(0)
+                        try:
+                            self._receive(json.loads(notify.payload))
+                        except ValueError:
+                            logger.warning(f"Notificación de invalidación inválida: {notify.payload!r}")
+            except Exception as e:
+                logger.error(f"Listener de invalidación desconectado: {e}")
+                self._stop.wait(RECONNECT_SECONDS)
+            finally:
+                if connection is not None:
+                    try:
+                        # Sin devolverla al pool: quedó en autocommit y con LISTEN activo
+                        connection.invalidate()
+                    except Exception:
+                        pass
+
+    def _poll_table(self, engine):
+        from main import SessionLocal, CacheInvalidation
+        from sqlalchemy import func
+
+        last_id = None
+        polls = 0
+        while not self._stop.is_set():
+            rows = []
+            db = SessionLocal()
+            try:
+                if last_id is None:
+                    last_id = db.query(func.max(CacheInvalidation.id)).scalar() or 0
+
+                rows = (
+                    db.query(CacheInvalidation)
+                    .filter(CacheInvalidation.id > last_id)
+                    .order_by(CacheInvalidation.id)
+                    .limit(POLL_BATCH)
+                    .all()
+                )
+                for row in rows:
+                    last_id = row.id
+                    self._receive({
+                        "scope": row.scope,
+                        "key": row.key,
+                        "event_type": row.event_type,
+                        "data": row.payload or {},
+                        "origin": row.origin
+                    })
+
+                polls += 1
+                if polls % PRUNE_EVERY_POLLS == 0:
+                    db.query(CacheInvalidation).filter(
+                        CacheInvalidation.created_at < datetime.utcnow() - RETENTION
+                    ).delete(synchronize_session=False)
+                    db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Error consultando invalidaciones: {e}")
+            finally:
+                db.close()
+
+            # Lote lleno: seguir leyendo sin esperar
+            if len(rows) < POLL_BATCH:
+                self._stop.wait(POLL_SECONDS)
+
+
+def change_keys(change: Dict[str, Any]) -> List[str]:
+    """Claves afectadas por un cambio (una, varias con publish_many o ninguna)"""
+    if change.get("key"):
+        return [change["key"]]
+    return list((change.get("data") or {}).get("keys") or ())
+
+
+@event.listens_for(Session, "after_commit")
+def _deliver_after_commit(session):
+    for change in session.info.pop(_PENDING_KEY, ()):
+        invalidation_bus._schedule(change)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+# Instancia del proceso
+invalidation_bus = InvalidationBus()
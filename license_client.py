@@ -0,0 +1,744 @@
+# -*- coding: utf-8 -*-
+"""
+Sapientia License Client SDK
+============================
+Cliente oficial (síncrono y asíncrono) para validar licencias desde módulos Odoo.
+
+- Conexiones HTTP persistentes (keep-alive) con pool configurable
+- Timeouts en todas las llamadas
+- Reintentos con backoff exponencial y jitter
+- Validación de varios módulos en una sola llamada (/license/validate/batch)
+- Caché en disco del último resultado válido con periodo de gracia offline
+- Huella de hardware recolectada una vez por arranque y persistida en disco
+- Respeta el 'next_check_after' del servidor: no revalida antes de tiempo
+- Escucha eventos push (/license/events) e invalida la caché al instante
+- Cada cliente es una sesión con puesto arrendado (session_id); release_seat() lo libera
+
+Uso en un módulo Odoo:
+
+    from license_client import SapientiaLicenseClient
+
+    client = SapientiaLicenseClient("http://license-server:8000")
+    results = client.validate_modules(license_key, ["medical_clinic", "medical_clinic_dashboard"], hardware_info)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import platform
+import random
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+try:
+    import fcntl  # opcional (POSIX)
+except ImportError:
+    fcntl = None
+
+try:
+    import msvcrt  # opcional (Windows)
+except ImportError:
+    msvcrt = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SERVER_URL = os.getenv("SAPIENTIA_LICENSE_SERVER", "http://localhost:8000")
+DEFAULT_CACHE_PATH = Path(os.getenv(
+    "SAPIENTIA_LICENSE_CACHE",
+    Path.home() / ".cache" / "sapientia" / "license_cache.json"
+))
+DEFAULT_HARDWARE_CACHE_PATH = Path(os.getenv(
+    "SAPIENTIA_HARDWARE_CACHE",
+    Path.home() / ".cache" / "sapientia" / "hardware_cache.json"
+))
+
+# Códigos HTTP que justifican un reintento
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+
+
+class LicenseServerUnavailable(Exception):
+    """El servidor de licencias no respondió y no hay resultado en caché utilizable"""
+
+
+def _atomic_write_json(path: Path, data: Any, prefix: str):
+    """Escritura atómica: archivo temporal + os.replace"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=prefix)
+    with os.fdopen(fd, "w", encoding="utf-8") as fh:
+        json.dump(data, fh)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """Bloqueo exclusivo entre procesos sobre '<path>.lock' (sin bloqueo si la plataforma no lo ofrece)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(f"{path}.lock", "a+b") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _read_json(path: Path) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+# ============================================================================
+# HUELLA DE HARDWARE
+# ============================================================================
+
+def _mac_address() -> str:
+    node = uuid.getnode()
+    return ':'.join(['{:02x}'.format((node >> i) & 0xff) for i in range(0, 8*6, 8)][::-1])
+
+
+def _boot_id() -> str:
+    """Identificador del arranque actual del sistema"""
+    try:
+        with open("/proc/sys/kernel/random/boot_id", "r") as fh:
+            return fh.read().strip()
+    except OSError:
+        pass
+    try:
+        import psutil
+        return str(int(psutil.boot_time()))
+    except Exception:
+        return "unknown"
+
+
+def _cheap_signals() -> Dict[str, str]:
+    """Señales baratas de obtener; si cambian, la caché de hardware se invalida"""
+    return {
+        "mac_address": _mac_address(),
+        "hostname": platform.node(),
+        "os_info": f"{platform.system()} {platform.release()} {platform.machine()}"
+    }
+
+
+def compute_hardware_fingerprint(hardware_info: Dict[str, Any]) -> str:
+    """Misma huella que SecurityManager.generate_hardware_fingerprint en el servidor"""
+    combined = (
+        hardware_info["mac_address"] +
+        hardware_info["processor_id"] +
+        (hardware_info.get("motherboard_serial") or "") +
+        (hardware_info.get("disk_serial") or "") +
+        hardware_info["os_info"] +
+        hardware_info["hostname"]
+    )
+    return hashlib.sha256(combined.encode()).hexdigest()
+
+
+def collect_hardware_info() -> Dict[str, Any]:
+    """Recolección completa (costosa): cpuinfo tarda ~1s y se enumeran las particiones"""
+    signals = _cheap_signals()
+
+    try:
+        import cpuinfo
+        processor_id = cpuinfo.get_cpu_info().get('brand_raw', 'Unknown CPU')
+    except ImportError:
+        processor_id = platform.processor() or 'Unknown CPU'
+
+    disk_serial = "Unknown"
+    try:
+        import psutil
+        partitions = psutil.disk_partitions()
+        if partitions:
+            disk_serial = hashlib.md5(partitions[0].device.encode()).hexdigest()[:16]
+    except Exception:
+        pass
+
+    return {
+        "mac_address": signals["mac_address"],
+        "processor_id": processor_id,
+        "motherboard_serial": "Unknown",  # Difícil de obtener multiplataforma
+        "disk_serial": disk_serial,
+        "os_info": signals["os_info"],
+        "hostname": signals["hostname"]
+    }
+
+
+class HardwareInfoCache:
+    """Caché de la información de hardware por boot ID, en memoria y en disco"""
+
+    def __init__(self, path: Path = DEFAULT_HARDWARE_CACHE_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._memo = None
+
+    def _is_fresh(self, entry: Dict[str, Any], boot_id: str, signals: Dict[str, str]) -> bool:
+        return (
+            entry.get("boot_id") == boot_id
+            and entry.get("signals") == signals
+            and "hardware_info" in entry
+            and "fingerprint" in entry
+        )
+
+    def get(self) -> Dict[str, Any]:
+        """Devuelve {'hardware_info': ..., 'fingerprint': ...} recolectando solo si es necesario"""
+        boot_id = _boot_id()
+        signals = _cheap_signals()
+
+        with self._lock:
+            if self._memo and self._is_fresh(self._memo, boot_id, signals):
+                return self._memo
+
+            entry = _read_json(self.path)
+            if not self._is_fresh(entry, boot_id, signals):
+                hardware_info = collect_hardware_info()
+                entry = {
+                    "boot_id": boot_id,
+                    "signals": signals,
+                    "hardware_info": hardware_info,
+                    "fingerprint": compute_hardware_fingerprint(hardware_info),
+                    "collected_at": time.time()
+                }
+                try:
+                    _atomic_write_json(self.path, entry, ".hardware_cache")
+                except OSError as e:
+                    logger.warning(f"No se pudo guardar la caché de hardware: {e}")
+
+            self._memo = entry
+            return entry
+
+    def hardware_info(self) -> Dict[str, Any]:
+        return dict(self.get()["hardware_info"])
+
+    def fingerprint(self) -> str:
+        return self.get()["fingerprint"]
+
+
+_default_hardware_cache = HardwareInfoCache()
+
+
+def get_hardware_info() -> Dict[str, Any]:
+    """Información de hardware del equipo actual usando la caché compartida"""
+    return _default_hardware_cache.hardware_info()
+
+
+# ============================================================================
+# CACHÉ EN DISCO
+# ============================================================================
+
+class LicenseResultCache:
+    """Caché en disco del último resultado válido por (license_key, module_name)
+
+    Varios procesos cliente (workers de Odoo) comparten el archivo: cada cambio
+    se aplica, con el archivo bloqueado, sobre lo que hay en disco y no sobre la
+    copia en memoria del proceso, así no se pierden las entradas de los demás.
+    Las lecturas recargan el archivo si cambió desde la última vez (otro proceso
+    guardó o descartó resultados, por ejemplo tras recibir una revocación).
+    """
+
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, grace_period_hours: float = 72):
+        self.path = Path(path)
+        self.grace_period = grace_period_hours * 3600
+        self._lock = threading.Lock()
+        self._stamp = self._stat()
+        self._entries = self._load()
+
+    @staticmethod
+    def _key(license_key: str, module_name: str) -> str:
+        return f"{license_key}:{module_name}"
+
+    def _load(self) -> Dict[str, Any]:
+        return _read_json(self.path)
+
+    def _stat(self) -> Optional[tuple]:
+        """Identifica la versión del archivo (os.replace cambia el inodo)"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _entry(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            stamp = self._stat()
+            if stamp != self._stamp:
+                self._stamp = stamp
+                self._entries = self._load()
+            return self._entries.get(key)
+
+    def _update(self, apply: Callable[[Dict[str, Any]], None]):
+        """Aplica apply(entradas) al archivo releído bajo bloqueo y recarga la copia en memoria"""
+        with self._lock:
+            try:
+                with _file_lock(self.path):
+                    entries = self._load()
+                    apply(entries)
+                    _atomic_write_json(self.path, entries, ".license_cache")
+                    self._stamp = self._stat()
+            except OSError as e:
+                logger.warning(f"No se pudo guardar la caché de licencias: {e}")
+                apply(self._entries)
+                return
+            self._entries = entries
+
+    def store(self, results: Iterable[Dict[str, Any]]):
+        """Guarda los resultados válidos y descarta los rechazados por el servidor"""
+        now = time.time()
+        changes = {}
+        for result in results:
+            key = self._key(result["license_key"], result["module_name"])
+            changes[key] = {
+                "validated_at": now,
+                "next_check_at": now + result.get("next_check_after", 0),
+                "result": result
+            } if result.get("valid") else None
+
+        def apply(entries: Dict[str, Any]):
+            for key, entry in changes.items():
+                if entry is None:
+                    entries.pop(key, None)
+                else:
+                    entries[key] = entry
+
+        self._update(apply)
+
+    def evict(self, license_key: str):
+        """Descarta todos los resultados de una licencia (revocación, cambios, renovación)"""
+        prefix = f"{license_key}:"
+
+        def apply(entries: Dict[str, Any]):
+            for key in [k for k in entries if k.startswith(prefix)]:
+                del entries[key]
+
+        self._update(apply)
+
+    def get_fresh(self, license_key: str, module_name: str) -> Optional[Dict[str, Any]]:
+        """Devuelve el resultado si el servidor indicó que aún no hace falta revalidar"""
+        entry = self._entry(self._key(license_key, module_name))
+        if not entry or time.time() >= entry.get("next_check_at", 0):
+            return None
+        return self.get(license_key, module_name)
+
+    def get(self, license_key: str, module_name: str) -> Optional[Dict[str, Any]]:
+        """Devuelve el último resultado válido si sigue dentro del periodo de gracia"""
+        entry = self._entry(self._key(license_key, module_name))
+        if not entry or time.time() - entry["validated_at"] > self.grace_period:
+            return None
+
+        result = entry["result"]
+        expires_at = result.get("expires_at")
+        if expires_at and datetime.fromisoformat(expires_at) < datetime.utcnow():
+            return None
+
+        return {**result, "cached": True, "validated_at": entry["validated_at"]}
+
+
+# ============================================================================
+# EVENTOS SSE
+# ============================================================================
+
+class _SSEParser:
+    """Parser incremental de text/event-stream (una línea a la vez)"""
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.event_id = None
+        self.event_type = "message"
+        self.data = []
+
+    def feed(self, line: str) -> Optional[Dict[str, Any]]:
+        """Devuelve un evento completo al recibir la línea en blanco que lo cierra"""
+        if line == "":
+            if not self.data:
+                self._reset()
+                return None
+            event = {
+                "id": self.event_id,
+                "event": self.event_type,
+                "data": json.loads("\n".join(self.data))
+            }
+            self._reset()
+            return event
+        if line.startswith(":"):
+            return None  # comentario / heartbeat
+        field, _, value = line.partition(":")
+        value = value[1:] if value.startswith(" ") else value
+        if field == "id":
+            self.event_id = value or None
+        elif field == "event":
+            self.event_type = value
+        elif field == "data":
+            self.data.append(value)
+        return None
+
+
+# ============================================================================
+# LÓGICA COMÚN
+# ============================================================================
+
+class _BaseLicenseClient:
+    """Configuración y utilidades compartidas por los clientes síncrono y asíncrono"""
+
+    def __init__(
+        self,
+        server_url: str = DEFAULT_SERVER_URL,
+        timeout: float = 5.0,
+        connect_timeout: float = 3.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        pool_size: int = 10,
+        cache_path: Optional[Path] = DEFAULT_CACHE_PATH,
+        grace_period_hours: float = 72,
+        honour_schedule: bool = True,
+        session_id: Optional[str] = None
+    ):
+        self.server_url = server_url.rstrip("/")
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self.cache = LicenseResultCache(cache_path, grace_period_hours) if cache_path else None
+        self.honour_schedule = honour_schedule
+        # Sesión que ocupa un puesto de la licencia mientras siga validando
+        self.session_id = session_id or uuid.uuid4().hex
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Backoff exponencial con 'full jitter' para no sincronizar reintentos"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _retry_delay(self, attempt: int, response=None) -> float:
+        """Backoff, o el Retry-After del servidor si es mayor (503 del control de admisión)"""
+        delay = self._backoff_delay(attempt)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), self.backoff_max))
+        return delay
+
+    def _batch_payload(self, license_key: str, module_names: List[str], hardware_info: Optional[Dict[str, Any]], user_count: int):
+        return {
+            "license_key": license_key,
+            "module_names": list(module_names),
+            "hardware_info": hardware_info or get_hardware_info(),
+            "user_count": user_count,
+            "session_id": self.session_id
+        }
+
+    def _release_payload(self, license_key: str) -> Dict[str, Any]:
+        return {"license_key": license_key, "session_id": self.session_id}
+
+    def _scheduled(self, license_key: str, module_names: List[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Resultados en caché si todos los módulos están dentro de su next_check_after"""
+        if not (self.cache and self.honour_schedule):
+            return None
+        results = {}
+        for module_name in module_names:
+            fresh = self.cache.get_fresh(license_key, module_name)
+            if fresh is None:
+                return None
+            results[module_name] = fresh
+        return results
+
+    def _from_cache(self, license_key: str, module_names: List[str], error: Exception) -> Dict[str, Dict[str, Any]]:
+        """Resuelve los módulos desde la caché cuando el servidor no está disponible"""
+        results = {}
+        for module_name in module_names:
+            cached = self.cache.get(license_key, module_name) if self.cache else None
+            if cached is None:
+                raise LicenseServerUnavailable(
+                    f"Servidor de licencias no disponible y sin caché para '{module_name}': {error}"
+                )
+            results[module_name] = cached
+        logger.warning(f"Servidor de licencias no disponible, usando caché local: {error}")
+        return results
+
+    @staticmethod
+    def _is_client_error(response) -> bool:
+        """Los errores 4xx son rechazos definitivos: no se sirven desde caché"""
+        return response is not None and 400 <= response.status_code < 500 and response.status_code != 429
+
+    def _remember(self, results: Dict[str, Dict[str, Any]]):
+        if self.cache:
+            self.cache.store(results.values())
+
+    def _apply_event(self, license_key: str, event: Dict[str, Any]):
+        """Cualquier evento de la licencia invalida la caché: la próxima validación irá al servidor"""
+        if self.cache and event["event"] != "connected":
+            self.cache.evict(license_key)
+
+
+# ============================================================================
+# CLIENTE SÍNCRONO
+# ============================================================================
+
+class SapientiaLicenseClient(_BaseLicenseClient):
+    """Cliente síncrono basado en requests.Session con pool de conexiones"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self._requests = requests
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = self.session.post(
+                    f"{self.server_url}{path}",
+                    json=payload,
+                    timeout=(self.connect_timeout, self.timeout)
+                )
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return response.json()
+                last_error = self._requests.HTTPError(f"HTTP {response.status_code}")
+            except (self._requests.ConnectionError, self._requests.Timeout) as e:
+                last_error = e
+            if attempt < self.max_retries:
+                time.sleep(self._retry_delay(attempt, response))
+        raise last_error
+
+    def validate_modules(
+        self,
+        license_key: str,
+        module_names: List[str],
+        hardware_info: Optional[Dict[str, Any]] = None,
+        user_count: int = 1
+    ) -> Dict[str, Dict[str, Any]]:
+        """Valida varios módulos en una sola llamada; devuelve {module_name: resultado}"""
+        scheduled = self._scheduled(license_key, module_names)
+        if scheduled is not None:
+            return scheduled
+        try:
+            data = self._post(
+                "/license/validate/batch",
+                self._batch_payload(license_key, module_names, hardware_info, user_count)
+            )
+        except (self._requests.ConnectionError, self._requests.Timeout, self._requests.HTTPError) as e:
+            if self._is_client_error(getattr(e, "response", None)):
+                raise
+            return self._from_cache(license_key, module_names, e)
+
+        results = data["results"]
+        self._remember(results)
+        return results
+
+    def validate(
+        self,
+        license_key: str,
+        module_name: str,
+        hardware_info: Optional[Dict[str, Any]] = None,
+        user_count: int = 1
+    ) -> Dict[str, Any]:
+        """Valida un único módulo"""
+        return self.validate_modules(license_key, [module_name], hardware_info, user_count)[module_name]
+
+    def release_seat(self, license_key: str) -> bool:
+        """Libera el puesto de esta sesión (al cerrar la aplicación cliente)"""
+        if self.cache:
+            self.cache.evict(license_key)
+        return self._post("/license/seat/release", self._release_payload(license_key))["released"]
+
+    def iter_events(self, license_key: str, last_event_id: Optional[str] = None):
+        """Escucha eventos push de la licencia; reconecta con Last-Event-ID si se corta"""
+        attempt = 0
+        while True:
+            headers = {"Accept": "text/event-stream"}
+            if last_event_id is not None:
+                headers["Last-Event-ID"] = str(last_event_id)
+            try:
+                with self.session.get(
+                    f"{self.server_url}/license/events/{license_key}",
+                    headers=headers,
+                    stream=True,
+                    timeout=(self.connect_timeout, None)
+                ) as response:
+                    response.raise_for_status()
+                    attempt = 0
+                    parser = _SSEParser()
+                    for line in response.iter_lines(decode_unicode=True):
+                        event = parser.feed(line)
+                        if event is None:
+                            continue
+                        if event["id"] is not None:
+                            last_event_id = event["id"]
+                        self._apply_event(license_key, event)
+                        yield event
+            except (self._requests.ConnectionError, self._requests.Timeout, self._requests.HTTPError) as e:
+                if self._is_client_error(getattr(e, "response", None)):
+                    raise
+                logger.warning(f"Canal de eventos interrumpido, reconectando: {e}")
+            time.sleep(self._backoff_delay(attempt))
+            attempt += 1
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ============================================================================
+# CLIENTE ASÍNCRONO
+# ============================================================================
+
+class AsyncSapientiaLicenseClient(_BaseLicenseClient):
+    """Cliente asíncrono basado en httpx.AsyncClient con pool de conexiones
+
+    La caché en disco (flock, lectura y reescritura del archivo) se usa desde el
+    pool de hilos para no bloquear el event loop.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        import httpx
+
+        self._httpx = httpx
+        self.client = httpx.AsyncClient(
+            base_url=self.server_url,
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size
+            )
+        )
+
+    async def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        import asyncio
+
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = await self.client.post(path, json=payload)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return response.json()
+                last_error = self._httpx.HTTPStatusError(
+                    f"HTTP {response.status_code}", request=response.request, response=response
+                )
+            except self._httpx.TransportError as e:
+                last_error = e
+            if attempt < self.max_retries:
+                await asyncio.sleep(self._retry_delay(attempt, response))
+        raise last_error
+
+    async def validate_modules(
+        self,
+        license_key: str,
+        module_names: List[str],
+        hardware_info: Optional[Dict[str, Any]] = None,
+        user_count: int = 1
+    ) -> Dict[str, Dict[str, Any]]:
+        """Valida varios módulos en una sola llamada; devuelve {module_name: resultado}"""
+        import asyncio
+
+        scheduled = await asyncio.to_thread(self._scheduled, license_key, module_names)
+        if scheduled is not None:
+            return scheduled
+        if hardware_info is None:
+            hardware_info = await asyncio.to_thread(get_hardware_info)
+        try:
+            data = await self._post(
+                "/license/validate/batch",
+                self._batch_payload(license_key, module_names, hardware_info, user_count)
+            )
+        except (self._httpx.TransportError, self._httpx.HTTPStatusError) as e:
+            if self._is_client_error(getattr(e, "response", None)):
+                raise
+            return await asyncio.to_thread(self._from_cache, license_key, module_names, e)
+
+        results = data["results"]
+        await asyncio.to_thread(self._remember, results)
+        return results
+
+    async def validate(
+        self,
+        license_key: str,
+        module_name: str,
+        hardware_info: Optional[Dict[str, Any]] = None,
+        user_count: int = 1
+    ) -> Dict[str, Any]:
+        """Valida un único módulo"""
+        results = await self.validate_modules(license_key, [module_name], hardware_info, user_count)
+        return results[module_name]
+
+    async def release_seat(self, license_key: str) -> bool:
+        """Libera el puesto de esta sesión (al cerrar la aplicación cliente)"""
+        import asyncio
+
+        if self.cache:
+            await asyncio.to_thread(self.cache.evict, license_key)
+        data = await self._post("/license/seat/release", self._release_payload(license_key))
+        return data["released"]
+
+    async def iter_events(self, license_key: str, last_event_id: Optional[str] = None):
+        """Escucha eventos push de la licencia; reconecta con Last-Event-ID si se corta"""
+        import asyncio
+
+        attempt = 0
+        while True:
+            headers = {"Accept": "text/event-stream"}
+            if last_event_id is not None:
+                headers["Last-Event-ID"] = str(last_event_id)
+            try:
+                async with self.client.stream(
+                    "GET",
+                    f"/license/events/{license_key}",
+                    headers=headers,
+                    timeout=self._httpx.Timeout(None, connect=self.connect_timeout)
+                ) as response:
+                    response.raise_for_status()
+                    attempt = 0
+                    parser = _SSEParser()
+                    async for line in response.aiter_lines():
+                        event = parser.feed(line)
+                        if event is None:
+                            continue
+                        if event["id"] is not None:
+                            last_event_id = event["id"]
+                        await asyncio.to_thread(self._apply_event, license_key, event)
+                        yield event
+            except (self._httpx.TransportError, self._httpx.HTTPStatusError) as e:
+                if self._is_client_error(getattr(e, "response", None)):
+                    raise
+                logger.warning(f"Canal de eventos interrumpido, reconectando: {e}")
+            await asyncio.sleep(self._backoff_delay(attempt))
+            attempt += 1
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
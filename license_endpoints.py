@@ -6,14 +6,26 @@ Endpoints para gestión completa de licencias médicas
 """
 
 from fastapi import APIRouter, HTTPException, Depends, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import func
+from types import SimpleNamespace
+from typing import List, Optional
 import logging
 from datetime import datetime, timedelta
 
-from main import get_db, License, LicenseType, MedicalModule, LicenseValidation
-from schemas import LicenseRequest, LicenseValidationRequest, LicenseResponse
-from utils import SecurityManager, HardwareInfo
+from main import get_db, SessionLocal, License, LicenseType, MedicalModule, LicenseValidation
+from license_events import stream_license_events, EVENT_RENEWED, EVENT_REVOKED
+from invalidation import invalidation_bus, SCOPE_LICENSE
+from cache import cache, MISSING, NS_LICENSE, NS_CATALOG
+from license_index import license_index
+from schemas import (
+    LicenseRequest, LicenseValidationRequest, LicenseBatchValidationRequest, LicenseResponse, SeatReleaseRequest
+)
+from seats import SeatLeases
+from group_commit import group_committer
+from single_flight import validation_flights, ENABLED as COALESCE_VALIDATIONS
+from utils import SecurityManager, HardwareInfo, RevalidationScheduler, LicenseRules
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -21,14 +33,15 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/license", tags=["License Management"])
 
+# TTL en la caché compartida (las invalidaciones llegan por el bus antes de que venzan)
+LICENSE_STATE_TTL = 60
+CATALOG_TTL = 300
+
 # ============================================================================
-# ENDPOINTS DE TIPOS DE LICENCIA
+# SNAPSHOTS DEL CATÁLOGO (CACHEADOS)
 # ============================================================================
 
-@router.get("/types", response_model=List[dict])
-async def get_license_types(db: Session = Depends(get_db)):
-    """Obtiene todos los tipos de licencia disponibles"""
-    license_types = db.query(LicenseType).all()
+def _load_license_types(db: Session) -> List[dict]:
     return [
         {
             "name": lt.name,
@@ -39,17 +52,10 @@ async def get_license_types(db: Session = Depends(get_db)):
             "max_modules": lt.max_modules,
             "features": lt.features
         }
-        for lt in license_types
+        for lt in db.query(LicenseType).all()
     ]
 
-# ============================================================================
-# ENDPOINTS DE MÓDULOS MÉDICOS  
-# ============================================================================
-
-@router.get("/modules", response_model=List[dict])
-async def get_medical_modules(db: Session = Depends(get_db)):
-    """Obtiene todos los módulos médicos disponibles"""
-    modules = db.query(MedicalModule).all()
+def _load_modules(db: Session) -> List[dict]:
     return [
         {
             "name": module.name,
@@ -59,9 +65,41 @@ async def get_medical_modules(db: Session = Depends(get_db)):
             "is_core": module.is_core,
             "min_license_level": module.min_license_level
         }
-        for module in modules
+        for module in db.query(MedicalModule).all()
     ]
 
+_CATALOG_LOADERS = {
+    "license_types": _load_license_types,
+    "modules": _load_modules
+}
+
+def catalog_snapshot(db: Session, *names: str) -> dict:
+    """Snapshots del catálogo {"license_types": [...], "modules": [...]} en un solo viaje a la caché"""
+    return cache.get_many(
+        NS_CATALOG,
+        names or tuple(_CATALOG_LOADERS),
+        lambda missing: {name: _CATALOG_LOADERS[name](db) for name in missing},
+        ttl=CATALOG_TTL
+    )
+
+# ============================================================================
+# ENDPOINTS DE TIPOS DE LICENCIA
+# ============================================================================
+
+@router.get("/types", response_model=List[dict])
+async def get_license_types(db: Session = Depends(get_db)):
+    """Obtiene todos los tipos de licencia disponibles"""
+    return catalog_snapshot(db, "license_types")["license_types"]
+
+# ============================================================================
+# ENDPOINTS DE MÓDULOS MÉDICOS  
+# ============================================================================
+
+@router.get("/modules", response_model=List[dict])
+async def get_medical_modules(db: Session = Depends(get_db)):
+    """Obtiene todos los módulos médicos disponibles"""
+    return catalog_snapshot(db, "modules")["modules"]
+
 # ============================================================================
 # SOLICITUD DE LICENCIA
 # ============================================================================
@@ -74,10 +112,14 @@ async def request_license(
 ):
     """Solicita una nueva licencia médica"""
     try:
+        # Tipos y módulos desde el snapshot del catálogo (una sola lectura de caché)
+        catalog = catalog_snapshot(db, "license_types", "modules")
+        
         # Validar tipo de licencia
-        license_type = db.query(LicenseType).filter(
-            LicenseType.name == license_req.license_type
-        ).first()
+        license_type = next(
+            (SimpleNamespace(**lt) for lt in catalog["license_types"] if lt["name"] == license_req.license_type),
+            None
+        )
         
         if not license_type:
             raise HTTPException(
@@ -87,11 +129,9 @@ async def request_license(
         
         # Validar módulos solicitados
         if license_req.requested_modules:
+            known_modules = {module["name"] for module in catalog["modules"]}
             for module_name in license_req.requested_modules:
-                module = db.query(MedicalModule).filter(
-                    MedicalModule.name == module_name
-                ).first()
-                if not module:
+                if module_name not in known_modules:
                     raise HTTPException(
                         status_code=400,
                         detail=f"Módulo '{module_name}' no existe"
@@ -102,23 +142,11 @@ async def request_license(
             license_req.hardware_info
         )
         
-        # Verificar si ya existe una licencia para este hardware
-        existing_license = db.query(License).filter(
-            License.hardware_fingerprint == hardware_fingerprint,
-            License.is_active == True
-        ).first()
-        
-        if existing_license:
-            raise HTTPException(
-                status_code=409,
-                detail="Ya existe una licencia activa para este hardware"
-            )
-        
         # Generar clave de licencia única
         license_key = SecurityManager.generate_license_key()
         
         # Determinar módulos permitidos basado en el tipo de licencia
-        allowed_modules = license_req.requested_modules or ["medical_clinic"]
+        allowed_modules = list(dict.fromkeys(license_req.requested_modules)) or ["medical_clinic"]
         
         # Verificar límite de módulos
         if license_type.max_modules > 0 and len(allowed_modules) > license_type.max_modules:
@@ -127,37 +155,47 @@ async def request_license(
                 detail=f"Excede el límite de módulos ({license_type.max_modules}) para licencia {license_type.name}"
             )
         
-        # Crear nueva licencia
-        expiry_date = datetime.utcnow() + timedelta(days=license_type.duration_days)
-        
-        new_license = License(
-            license_key=license_key,
-            client_name=license_req.client_name,
-            client_email=license_req.client_email,
-            license_type=license_req.license_type,
-            hardware_fingerprint=hardware_fingerprint,
-            expiry_date=expiry_date,
-            max_users=license_type.max_users,
-            allowed_modules=allowed_modules,
-            is_active=True
-        )
-        
-        db.add(new_license)
-        db.commit()
-        db.refresh(new_license)
+        def write(db: Session) -> dict:
+            # Verificar si ya existe una licencia para este hardware (dentro de la escritura:
+            # con group commit, dos altas del mismo hardware en un grupo se ven entre sí)
+            existing_license = License.active_for_hardware(db, hardware_fingerprint).first()
+            
+            if existing_license:
+                raise HTTPException(
+                    status_code=409,
+                    detail="Ya existe una licencia activa para este hardware"
+                )
+            
+            # Crear nueva licencia
+            expiry_date = datetime.utcnow() + timedelta(days=license_type.duration_days)
+            
+            db.add(License(
+                license_key=license_key,
+                client_name=license_req.client_name,
+                client_email=license_req.client_email,
+                license_type=license_req.license_type,
+                hardware_fingerprint=hardware_fingerprint,
+                expiry_date=expiry_date,
+                max_users=license_type.max_users,
+                allowed_modules=allowed_modules,
+                is_active=True
+            ))
+            invalidation_bus.publish(db, SCOPE_LICENSE, license_key)
+            
+            return {
+                "success": True,
+                "license_key": license_key,
+                "client_name": license_req.client_name,
+                "license_type": license_req.license_type,
+                "expires_at": expiry_date.isoformat(),
+                "max_users": license_type.max_users,
+                "allowed_modules": allowed_modules,
+                "message": "Licencia generada exitosamente"
+            }
         
+        result = await group_committer.run(db, write)
         logger.info(f"Nueva licencia creada: {license_key} para {license_req.client_name}")
-        
-        return {
-            "success": True,
-            "license_key": license_key,
-            "client_name": license_req.client_name,
-            "license_type": license_req.license_type,
-            "expires_at": expiry_date.isoformat(),
-            "max_users": license_type.max_users,
-            "allowed_modules": allowed_modules,
-            "message": "Licencia generada exitosamente"
-        }
+        return result
         
     except HTTPException:
         raise
@@ -172,6 +210,162 @@ async def request_license(
 # VALIDACIÓN DE LICENCIA
 # ============================================================================
 
+def _license_state(db: Session, license_key: str):
+    """Estado de validación de una licencia activa o None
+    
+    Orden: índice en memoria compartida del host (si está activo; solo responde aciertos),
+    caché L1/L2 y BD.
+    """
+    def load():
+        record = License.validatable_by_key(db, license_key).first()
+        if not record:
+            return MISSING
+        return {
+            "client_name": record.client_name,
+            "license_type": record.license_type,
+            "hardware_fingerprint": record.hardware_fingerprint,
+            "expiry_date": record.expiry_date.isoformat(),
+            "max_users": record.max_users,
+            "current_users": record.current_users or 0,
+            "allowed_modules": list(record.allowed_modules)
+        }
+    
+    state = license_index.lookup(license_key)
+    if state is None:
+        state = cache.get(NS_LICENSE, license_key, load, ttl=LICENSE_STATE_TTL)
+    if state == MISSING:
+        return None
+    return SimpleNamespace(**{**state, "expiry_date": datetime.fromisoformat(state["expiry_date"])})
+
+def _check_license(db: Session, license_key: str, module_names: List[str], current_fingerprint: str):
+    """Estado de la licencia y comprobaciones por módulo salvo el límite de usuarios
+    
+    No depende de la sesión ni del cliente: se comparte entre peticiones idénticas.
+    """
+    license_record = _license_state(db, license_key)
+    return license_record, [
+        (module_name, LicenseRules.check(license_record, module_name, current_fingerprint, 0))
+        for module_name in module_names
+    ]
+
+def _run_validations(
+    db: Session,
+    license_key: str,
+    module_names: List[str],
+    hardware_info: HardwareInfo,
+    user_count: int,
+    client_ip: str,
+    user_agent: str,
+    session_id: Optional[str] = None,
+    checked: Optional[tuple] = None
+) -> List[dict]:
+    """Valida varios módulos de una licencia con el estado cacheado y un solo commit
+    
+    Si algún módulo es válido, la sesión renueva u ocupa un puesto de la licencia
+    (seats.py); sin puestos libres la validación falla. ``checked`` es el resultado
+    de _check_license si ya se obtuvo (agrupado con otras peticiones en _validate).
+    """
+    current_fingerprint = SecurityManager.generate_hardware_fingerprint(hardware_info)
+    license_record, checks = checked or _check_license(db, license_key, module_names, current_fingerprint)
+    checks = [
+        (module_name, error_message or LicenseRules.check_users(license_record, user_count))
+        for module_name, error_message in checks
+    ]
+    
+    seat = None
+    if any(error_message is None for _, error_message in checks) and license_record.max_users > 0:
+        seat = SeatLeases.acquire(
+            db, license_key, session_id or current_fingerprint, license_record.max_users,
+            RevalidationScheduler.next_check_after(license_key) + SeatLeases.GRACE_SECONDS
+        )
+        if seat is None:
+            seats_error = f"Sin puestos libres ({license_record.max_users} sesiones activas)"
+            checks = [(module_name, error_message or seats_error) for module_name, error_message in checks]
+    
+    results = []
+    for module_name, error_message in checks:
+        db.add(LicenseValidation(
+            license_key=license_key,
+            module_name=module_name,
+            hardware_fingerprint=current_fingerprint,
+            ip_address=client_ip,
+            user_agent=user_agent,
+            validation_result="success" if error_message is None else "failed",
+            error_message=error_message
+        ))
+        results.append(LicenseRules.response(license_key, module_name, license_record, error_message))
+    
+    valid_count = sum(1 for result in results if result["valid"])
+    if valid_count:
+        # Actualizar contadores con un UPDATE directo (sin leer la fila)
+        counters = {
+            License.last_validation: datetime.utcnow(),
+            License.validation_count: func.coalesce(License.validation_count, 0) + valid_count
+        }
+        if seat is not None:
+            # Puestos ocupados en este momento (informativo: el límite lo imponen los arrendamientos)
+            counters[License.current_users] = seat.in_use
+        db.query(License).filter(License.license_key == license_key).update(counters, synchronize_session=False)
+        for result in results:
+            if result["valid"] and seat is not None:
+                result["current_users"] = seat.in_use
+                result["seat"] = {
+                    "slot": seat.slot,
+                    "session_id": seat.session_id,
+                    "lease_expires_at": seat.expires_at.isoformat()
+                }
+    
+    db.commit()
+    return results
+
+async def _validate(
+    db: Session,
+    license_key: str,
+    module_names: List[str],
+    hardware_info: HardwareInfo,
+    user_count: int,
+    client_ip: str,
+    user_agent: str,
+    session_id: Optional[str] = None
+) -> List[dict]:
+    """_run_validations con la carga del estado agrupada entre peticiones idénticas (single_flight.py)
+    
+    Idénticas: misma licencia, módulos y huella. Cada petición hace después su
+    parte propia (límite de usuarios, puesto de su sesión, contadores y log).
+    """
+    checked = None
+    if COALESCE_VALIDATIONS:
+        fingerprint = SecurityManager.generate_hardware_fingerprint(hardware_info)
+        
+        def lead():
+            # Sesión propia: se ejecuta en el pool de hilos y puede sobrevivir a la request
+            own_db = SessionLocal()
+            try:
+                return _check_license(own_db, license_key, module_names, fingerprint)
+            finally:
+                own_db.close()
+        
+        checked, _ = await validation_flights.do((license_key, tuple(module_names), fingerprint), lead)
+    
+    return _run_validations(
+        db, license_key, module_names, hardware_info, user_count, client_ip, user_agent, session_id, checked
+    )
+
+def _log_validation_error(db: Session, request: Request, license_key: str, module_names: List[str], error: Exception):
+    """Registra en el log de validaciones un error interno"""
+    db.rollback()
+    for module_name in module_names:
+        db.add(LicenseValidation(
+            license_key=license_key,
+            module_name=module_name,
+            hardware_fingerprint="error",
+            ip_address=request.client.host,
+            user_agent=request.headers.get("user-agent", "Unknown"),
+            validation_result="error",
+            error_message=str(error)
+        ))
+    db.commit()
+
 @router.post("/validate", response_model=dict)
 async def validate_license(
     validation_req: LicenseValidationRequest,
@@ -180,108 +374,62 @@ async def validate_license(
 ):
     """Valida una licencia para un módulo específico"""
     try:
-        client_ip = request.client.host
-        user_agent = request.headers.get("user-agent", "Unknown")
-        
-        # Buscar licencia
-        license_record = db.query(License).filter(
-            License.license_key == validation_req.license_key,
-            License.is_active == True
-        ).first()
-        
-        validation_result = "failed"
-        error_message = None
-        
-        if not license_record:
-            error_message = "Licencia no encontrada o inactiva"
-        elif datetime.utcnow() > license_record.expiry_date:
-            error_message = "Licencia expirada"
-        else:
-            # Validar hardware
-            current_fingerprint = SecurityManager.generate_hardware_fingerprint(
-                validation_req.hardware_info
-            )
-            
-            if not SecurityManager.validate_hardware_match(
-                license_record.hardware_fingerprint, current_fingerprint
-            ):
-                error_message = "Hardware no coincide con la licencia"
-            elif validation_req.module_name not in license_record.allowed_modules:
-                error_message = f"Módulo '{validation_req.module_name}' no permitido en esta licencia"
-            elif (license_record.max_users > 0 and 
-                  validation_req.user_count > license_record.max_users):
-                error_message = f"Excede límite de usuarios ({license_record.max_users})"
-            else:
-                validation_result = "success"
-                
-                # Actualizar contadores
-                license_record.last_validation = datetime.utcnow()
-                license_record.validation_count += 1
-                license_record.current_users = max(
-                    license_record.current_users, validation_req.user_count
-                )
-                db.commit()
-        
-        # Registrar validación
-        validation_log = LicenseValidation(
-            license_key=validation_req.license_key,
-            module_name=validation_req.module_name,
-            hardware_fingerprint=SecurityManager.generate_hardware_fingerprint(
-                validation_req.hardware_info
-            ),
-            ip_address=client_ip,
-            user_agent=user_agent,
-            validation_result=validation_result,
-            error_message=error_message
-        )
-        db.add(validation_log)
-        db.commit()
-        
-        if validation_result == "success":
-            return {
-                "valid": True,
-                "license_key": validation_req.license_key,
-                "module_name": validation_req.module_name,
-                "client_name": license_record.client_name,
-                "license_type": license_record.license_type,
-                "expires_at": license_record.expiry_date.isoformat(),
-                "max_users": license_record.max_users,
-                "current_users": license_record.current_users,
-                "allowed_modules": license_record.allowed_modules,
-                "message": "Licencia válida"
-            }
-        else:
-            return {
-                "valid": False,
-                "license_key": validation_req.license_key,
-                "module_name": validation_req.module_name,
-                "error": error_message,
-                "message": "Validación de licencia fallida"
-            }
+        return (await _validate(
+            db,
+            validation_req.license_key,
+            [validation_req.module_name],
+            validation_req.hardware_info,
+            validation_req.user_count,
+            request.client.host,
+            request.headers.get("user-agent", "Unknown"),
+            validation_req.session_id
+        ))[0]
             
     except Exception as e:
         logger.error(f"Error validando licencia: {str(e)}")
-        
-        # Registrar error en log
-        validation_log = LicenseValidation(
-            license_key=validation_req.license_key,
-            module_name=validation_req.module_name,
-            hardware_fingerprint="error",
-            ip_address=request.client.host,
-            user_agent=request.headers.get("user-agent", "Unknown"),
-            validation_result="error",
-            error_message=str(e)
+        _log_validation_error(db, request, validation_req.license_key, [validation_req.module_name], e)
+        return LicenseRules.error_response(validation_req.license_key, validation_req.module_name)
+
+@router.post("/validate/batch", response_model=dict)
+async def validate_license_batch(
+    batch_req: LicenseBatchValidationRequest,
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """Valida varios módulos de una misma licencia en una sola llamada"""
+    module_names = list(dict.fromkeys(batch_req.module_names))
+    if not module_names:
+        raise HTTPException(status_code=400, detail="Debe indicar al menos un módulo")
+    
+    try:
+        results = await _validate(
+            db,
+            batch_req.license_key,
+            module_names,
+            batch_req.hardware_info,
+            batch_req.user_count,
+            request.client.host,
+            request.headers.get("user-agent", "Unknown"),
+            batch_req.session_id
         )
-        db.add(validation_log)
-        db.commit()
-        
-        return {
-            "valid": False,
-            "license_key": validation_req.license_key,
-            "module_name": validation_req.module_name,
-            "error": "Error interno del servidor",
-            "message": "Error al validar licencia"
-        }
+    except Exception as e:
+        logger.error(f"Error validando lote de licencia: {str(e)}")
+        _log_validation_error(db, request, batch_req.license_key, module_names, e)
+        results = [LicenseRules.error_response(batch_req.license_key, name) for name in module_names]
+    
+    return {
+        "license_key": batch_req.license_key,
+        "next_check_after": RevalidationScheduler.next_check_after(batch_req.license_key),
+        "results": {result["module_name"]: result for result in results},
+        "all_valid": all(result["valid"] for result in results)
+    }
+
+@router.post("/seat/release", response_model=dict)
+async def release_seat(release_req: SeatReleaseRequest, db: Session = Depends(get_db)):
+    """Libera el puesto de una sesión cliente al cerrarse (si no, vence solo)"""
+    released = SeatLeases.release(db, release_req.license_key, release_req.session_id)
+    db.commit()
+    return {"license_key": release_req.license_key, "session_id": release_req.session_id, "released": released}
 
 # ============================================================================
 # INFORMACIÓN DE LICENCIA
@@ -298,13 +446,9 @@ async def get_license_info(license_key: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Licencia no encontrada")
     
     # Obtener estadísticas de validación
-    validation_count = db.query(LicenseValidation).filter(
-        LicenseValidation.license_key == license_key
-    ).count()
-    
-    recent_validations = db.query(LicenseValidation).filter(
-        LicenseValidation.license_key == license_key,
-        LicenseValidation.validation_time >= datetime.utcnow() - timedelta(days=7)
+    validation_count = LicenseValidation.for_license(db, license_key).count()
+    recent_validations = LicenseValidation.for_license(
+        db, license_key, since=datetime.utcnow() - timedelta(days=7)
     ).count()
     
     return {
@@ -316,8 +460,8 @@ async def get_license_info(license_key: str, db: Session = Depends(get_db)):
         "expiry_date": license_record.expiry_date.isoformat(),
         "is_active": license_record.is_active,
         "max_users": license_record.max_users,
-        "current_users": license_record.current_users,
-        "allowed_modules": license_record.allowed_modules,
+        "current_users": SeatLeases.in_use(db, license_key, license_record.max_users or 0),
+        "allowed_modules": list(license_record.allowed_modules),
         "last_validation": license_record.last_validation.isoformat() if license_record.last_validation else None,
         "total_validations": validation_count,
         "recent_validations": recent_validations,
@@ -336,29 +480,33 @@ async def renew_license(
     db: Session = Depends(get_db)
 ):
     """Renueva una licencia existente"""
-    license_record = db.query(License).filter(
-        License.license_key == license_key
-    ).first()
-    
-    if not license_record:
-        raise HTTPException(status_code=404, detail="Licencia no encontrada")
-    
-    # Extender fecha de expiración
-    new_expiry = max(datetime.utcnow(), license_record.expiry_date) + timedelta(days=renewal_days)
-    license_record.expiry_date = new_expiry
-    license_record.is_active = True
-    
-    db.commit()
-    
-    logger.info(f"Licencia renovada: {license_key} hasta {new_expiry}")
+    def write(db: Session) -> dict:
+        license_record = db.query(License).filter(
+            License.license_key == license_key
+        ).first()
+        
+        if not license_record:
+            raise HTTPException(status_code=404, detail="Licencia no encontrada")
+        
+        # Extender fecha de expiración
+        new_expiry = max(datetime.utcnow(), license_record.expiry_date) + timedelta(days=renewal_days)
+        license_record.expiry_date = new_expiry
+        license_record.is_active = True
+        license_record.expired_at = None
+        
+        invalidation_bus.publish(db, SCOPE_LICENSE, license_key, EVENT_RENEWED, {"expires_at": new_expiry.isoformat()})
+        
+        return {
+            "success": True,
+            "license_key": license_key,
+            "new_expiry_date": new_expiry.isoformat(),
+            "days_added": renewal_days,
+            "message": "Licencia renovada exitosamente"
+        }
     
-    return {
-        "success": True,
-        "license_key": license_key,
-        "new_expiry_date": new_expiry.isoformat(),
-        "days_added": renewal_days,
-        "message": "Licencia renovada exitosamente"
-    }
+    result = await group_committer.run(db, write)
+    logger.info(f"Licencia renovada: {license_key} hasta {result['new_expiry_date']}")
+    return result
 
 # ============================================================================
 # DESACTIVACIÓN DE LICENCIA
@@ -367,20 +515,54 @@ async def renew_license(
 @router.post("/deactivate/{license_key}", response_model=dict)
 async def deactivate_license(license_key: str, db: Session = Depends(get_db)):
     """Desactiva una licencia"""
-    license_record = db.query(License).filter(
-        License.license_key == license_key
-    ).first()
+    def write(db: Session) -> dict:
+        license_record = db.query(License).filter(
+            License.license_key == license_key
+        ).first()
+        
+        if not license_record:
+            raise HTTPException(status_code=404, detail="Licencia no encontrada")
+        
+        license_record.is_active = False
+        license_record.expired_at = None  # desactivación explícita, no por vencimiento
+        invalidation_bus.publish(db, SCOPE_LICENSE, license_key, EVENT_REVOKED, {"reason": "deactivated"})
+        
+        return {
+            "success": True,
+            "license_key": license_key,
+            "message": "Licencia desactivada exitosamente"
+        }
     
-    if not license_record:
-        raise HTTPException(status_code=404, detail="Licencia no encontrada")
+    result = await group_committer.run(db, write)
+    logger.info(f"Licencia desactivada: {license_key}")
+    return result
+
+# ============================================================================
+# EVENTOS EN TIEMPO REAL (SSE)
+# ============================================================================
+
+@router.get("/events/{license_key}")
+async def license_events(license_key: str, request: Request, since: Optional[str] = None):
+    """Canal SSE de revocaciones, renovaciones y cambios de módulos de una licencia
     
-    license_record.is_active = False
-    db.commit()
+    Para reanudar tras una desconexión se usa la cabecera estándar 'Last-Event-ID'
+    (o el parámetro 'since') con el último id recibido. Un id de otro worker
+    recibe un evento 'resync'.
+    """
+    # Sesión corta: no retener una conexión del pool durante todo el stream
+    db = SessionLocal()
+    try:
+        exists = db.query(License.id).filter(License.license_key == license_key).first()
+    finally:
+        db.close()
     
-    logger.info(f"Licencia desactivada: {license_key}")
+    if not exists:
+        raise HTTPException(status_code=404, detail="Licencia no encontrada")
     
-    return {
-        "success": True,
-        "license_key": license_key,
-        "message": "Licencia desactivada exitosamente"
-    }
\ No newline at end of file
+    last_event_id = request.headers.get("last-event-id") or since
+    
+    return StreamingResponse(
+        stream_license_events(license_key, last_event_id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
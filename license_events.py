@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+License Events
+==============
+Canal push de eventos de licencia (revocación, renovación, cambios de módulos)
+para clientes conectados por Server-Sent Events.
+
+Cada evento recibe un número de secuencia creciente; el servidor guarda los
+últimos eventos de cada licencia para que un cliente que se reconecta pueda
+reanudar desde su último 'Last-Event-ID' sin perder cambios.
+
+La secuencia y el historial son de cada worker. El id de evento lleva delante
+la época del broker (``<época>-<secuencia>``): si el cliente se reconecta a
+otro worker, o al mismo tras un reinicio, su 'Last-Event-ID' no es de esta
+época y recibe un 'resync' en vez de una reanudación con números ajenos.
+
+El evento 'connected' también lleva id, así un cliente que se corta antes del
+primer evento real reanuda desde el momento de la suscripción.
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+from invalidation import invalidation_bus, change_keys, SCOPE_LICENSE
+
+logger = logging.getLogger(__name__)
+
+# Tipos de evento publicados
+EVENT_REVOKED = "revoked"
+EVENT_REACTIVATED = "reactivated"
+EVENT_RENEWED = "renewed"
+EVENT_MODULES_CHANGED = "modules_changed"
+EVENT_EXPIRED = "expired"
+EVENT_RESYNC = "resync"
+
+HEARTBEAT_SECONDS = 15
+HISTORY_PER_LICENSE = 50
+
+
+class LicenseEventBroker:
+    """Broker en memoria: historial acotado por licencia y colas por suscriptor"""
+
+    def __init__(self, history_size: int = HISTORY_PER_LICENSE):
+        self.sequence = 0
+        self._epoch: Optional[str] = None
+        self.history_size = history_size
+        self._history: Dict[str, Deque[Tuple[int, Dict[str, Any]]]] = defaultdict(
+            lambda: deque(maxlen=self.history_size)
+        )
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        # Secuencia del último evento descartado del historial de cada licencia
+        self._evicted: Dict[str, int] = {}
+
+    @property
+    def epoch(self) -> str:
+        # Se calcula en el worker (después del fork), no en el master
+        if self._epoch is None:
+            self._epoch = uuid.uuid4().hex[:12]
+        return self._epoch
+
+    def event_id(self, sequence: int) -> str:
+        return f"{self.epoch}-{sequence}"
+
+    def parse_event_id(self, event_id: str) -> Optional[int]:
+        """Secuencia local de un 'Last-Event-ID' o None si es de otro worker o de antes de un reinicio"""
+        epoch, _, sequence = event_id.rpartition("-")
+        if epoch != self.epoch or not sequence.isdigit() or int(sequence) > self.sequence:
+            return None
+        return int(sequence)
+
+    def publish(self, license_key: str, event_type: str, data: Optional[Dict[str, Any]] = None) -> int:
+        """Publica un evento para una licencia y lo entrega a sus suscriptores"""
+        self.sequence += 1
+        event = {
+            "type": event_type,
+            "license_key": license_key,
+            "timestamp": datetime.utcnow().isoformat(),
+            "data": data or {}
+        }
+        history = self._history[license_key]
+        if len(history) == history.maxlen:
+            self._evicted[license_key] = history[0][0]
+        history.append((self.sequence, event))
+
+        for queue in list(self._subscribers.get(license_key, ())):
+            queue.put_nowait((self.sequence, event))
+
+        logger.info(f"Evento de licencia {event_type} #{self.sequence}: {license_key}")
+        return self.sequence
+
+    def replay(self, license_key: str, last_event_id: str) -> List[Tuple[int, Dict[str, Any]]]:
+        """Eventos posteriores a last_event_id; un 'resync' si este worker no puede cubrir el hueco"""
+        sequence = self.parse_event_id(last_event_id)
+        history = self._history.get(license_key)
+        if sequence is not None and not history:
+            return []
+
+        if sequence is None or sequence < self._evicted.get(license_key, 0):
+            return [(history[-1][0] if history else self.sequence, {
+                "type": EVENT_RESYNC,
+                "license_key": license_key,
+                "timestamp": datetime.utcnow().isoformat(),
+                "data": {"reason": "historial insuficiente, revalidar licencia"}
+            })]
+        return [(seq, event) for seq, event in history if seq > sequence]
+
+    def subscribe(self, license_key: str) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        self._subscribers[license_key].add(queue)
+        return queue
+
+    def unsubscribe(self, license_key: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(license_key)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[license_key]
+
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+
+def format_sse(event_id: Optional[str], event_type: str, data: Dict[str, Any]) -> str:
+    """Serializa un evento en formato text/event-stream"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream_license_events(
+    license_key: str,
+    last_event_id: Optional[str],
+    is_disconnected,
+    heartbeat_seconds: float = HEARTBEAT_SECONDS
+) -> AsyncIterator[str]:
+    """Generador SSE: reanuda desde last_event_id, luego eventos en vivo y heartbeats"""
+    queue = broker.subscribe(license_key)
+    try:
+        # Sin await desde la suscripción: lo posterior a subscribed_at llega por la cola
+        subscribed_at = broker.sequence
+        replay = broker.replay(license_key, last_event_id) if last_event_id else []
+
+        # El 'connected' lleva id: quien se desconecta antes del primer evento reanuda
+        # desde aquí. Si hay eventos por reenviar, el id sigue siendo el recibido, para
+        # que un corte durante la reanudación no los salte.
+        connected_id = last_event_id or broker.event_id(subscribed_at)
+        last_sent = (broker.parse_event_id(last_event_id) or 0) if last_event_id else subscribed_at
+        yield format_sse(connected_id, "connected", {"license_key": license_key, "last_event_id": connected_id})
+
+        for seq, event in replay:
+            last_sent = seq
+            yield format_sse(broker.event_id(seq), event["type"], event)
+
+        while not await is_disconnected():
+            try:
+                seq, event = await asyncio.wait_for(queue.get(), timeout=heartbeat_seconds)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            if seq <= last_sent:
+                continue
+            last_sent = seq
+            yield format_sse(broker.event_id(seq), event["type"], event)
+    finally:
+        broker.unsubscribe(license_key, queue)
+
+
+# Instancia del proceso
+broker = LicenseEventBroker()
+
+
+def _forward_license_change(change: Dict[str, Any]):
+    """Los cambios de licencia publicados en cualquier worker llegan a los streams de este"""
+    if not change.get("event_type"):
+        return
+    data = change.get("data") or {}
+    if not change.get("key"):
+        # Cambio en bloque: un evento por licencia, sin la lista de claves
+        data = {k: v for k, v in data.items() if k != "keys"}
+    for license_key in change_keys(change):
+        broker.publish(license_key, change["event_type"], data)
+
+
+invalidation_bus.subscribe(SCOPE_LICENSE, _forward_license_change)
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+License Import
+==============
+Alta masiva de licencias desde CSV o XLSX (redes de hospitales, migraciones).
+
+- Lectura en streaming: ``csv`` sobre el archivo o ``openpyxl`` en modo
+  read-only; nunca se carga el archivo entero en memoria.
+- Cada fila se valida contra el catálogo (tipos de licencia y módulos) leído
+  una vez al empezar, sin consultas por fila.
+- Las huellas de hardware se deduplican dentro del archivo y contra las
+  licencias activas con una sola consulta por lote (índice parcial
+  ``ix_licenses_fingerprint_active``).
+- Inserción por lotes de ``CHUNK_ROWS``: ``COPY ... FROM STDIN`` en
+  PostgreSQL (psycopg2) y ``executemany`` en el resto. Un commit por lote.
+- Devuelve un informe por fila (creada, válida en simulación o error).
+
+Columnas (cabecera en la primera fila, sin distinguir mayúsculas):
+``client_name``, ``client_email``, ``license_type``, ``modules`` (separados
+por ``;`` o ``|``; por defecto ``medical_clinic``) y la huella: o bien
+``hardware_fingerprint`` (sha256 en hex) o bien los campos de hardware
+(``mac_address``, ``processor_id``, ``motherboard_serial``, ``disk_serial``,
+``os_info``, ``hostname``).
+
+Uso:
+    python license_import.py hospitales.xlsx
+    python license_import.py hospitales.csv --dry-run --report informe.csv
+"""
+
+import argparse
+import csv
+import io
+import logging
+import os
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+try:
+    import openpyxl  # opcional, solo para XLSX
+except ImportError:
+    openpyxl = None
+
+from schemas import HardwareInfo
+from utils import SecurityManager
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = int(os.getenv("SAPIENTIA_IMPORT_CHUNK_ROWS", 1000))
+MAX_ROWS = int(os.getenv("SAPIENTIA_IMPORT_MAX_ROWS", 50000))
+DEFAULT_MODULES = ["medical_clinic"]
+
+HARDWARE_FIELDS = ("mac_address", "processor_id", "motherboard_serial", "disk_serial", "os_info", "hostname")
+FINGERPRINT_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+MODULE_SEPARATORS = re.compile(r"[;|]")
+
+STATUS_CREATED = "created"
+STATUS_VALID = "valid"  # simulación (dry run)
+STATUS_FAILED = "failed"
+
+
+class ImportFormatError(Exception):
+    """Archivo ilegible, formato no soportado o sin las columnas necesarias"""
+
+
+# ============================================================================
+# LECTURA EN STREAMING
+# ============================================================================
+
+def _normalize_header(header: Iterable[Any]) -> List[str]:
+    return [str(name or "").strip().lower() for name in header]
+
+
+def iter_rows(stream, filename: str) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """(número de fila del archivo, {columna: valor}) sin cargar el archivo entero"""
+    if filename.lower().endswith((".xlsx", ".xlsm")):
+        if openpyxl is None:
+            raise ImportFormatError("openpyxl no está instalado: no se pueden leer archivos XLSX")
+        try:
+            workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+        except Exception as e:
+            raise ImportFormatError(f"XLSX ilegible: {e}")
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = _normalize_header(next(rows, ()))
+            _check_header(header)
+            for line, values in enumerate(rows, start=2):
+                if values and any(value not in (None, "") for value in values):
+                    yield line, {
+                        name: "" if value is None else str(value).strip()
+                        for name, value in zip(header, values) if name
+                    }
+        finally:
+            workbook.close()
+        return
+
+    if not filename.lower().endswith((".csv", ".txt")):
+        raise ImportFormatError(f"Formato no soportado: {filename} (CSV o XLSX)")
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text)
+    header = _normalize_header(next(reader, ()))
+    _check_header(header)
+    for values in reader:
+        if any(value.strip() for value in values):
+            yield reader.line_num, {name: value.strip() for name, value in zip(header, values) if name}
+
+
+def _check_header(header: List[str]):
+    missing = [name for name in ("client_name", "client_email", "license_type") if name not in header]
+    if "hardware_fingerprint" not in header and not {"mac_address", "processor_id", "os_info", "hostname"} <= set(header):
+        missing.append("hardware_fingerprint (o mac_address, processor_id, os_info, hostname)")
+    if missing:
+        raise ImportFormatError(f"Faltan columnas: {', '.join(missing)}")
+
+
+# ============================================================================
+# VALIDACIÓN CONTRA EL CATÁLOGO
+# ============================================================================
+
+class ImportCatalog:
+    """Tipos de licencia y módulos leídos una vez por importación"""
+
+    def __init__(self, db):
+        from pydantic import EmailStr, TypeAdapter
+        from main import LicenseType, MedicalModule
+
+        self.license_types = {license_type.name: license_type for license_type in db.query(LicenseType).all()}
+        self.modules = {name for (name,) in db.query(MedicalModule.name)}
+        self._email = TypeAdapter(EmailStr)
+
+    def prepare(self, raw: Dict[str, str], now: datetime) -> Dict[str, Any]:
+        """Fila lista para insertar; ValueError con el motivo si no es válida"""
+        client_name = raw.get("client_name", "")
+        if not client_name:
+            raise ValueError("client_name vacío")
+        try:
+            client_email = str(self._email.validate_python(raw.get("client_email", "")))
+        except Exception:
+            raise ValueError(f"Email no válido: '{raw.get('client_email', '')}'")
+
+        license_type = self.license_types.get(raw.get("license_type", ""))
+        if license_type is None:
+            raise ValueError(f"Tipo de licencia '{raw.get('license_type', '')}' no válido")
+
+        modules = list(dict.fromkeys(
+            name.strip() for name in MODULE_SEPARATORS.split(raw.get("modules", "")) if name.strip()
+        )) or DEFAULT_MODULES
+        unknown = [name for name in modules if name not in self.modules]
+        if unknown:
+            raise ValueError(f"Módulo '{unknown[0]}' no existe")
+        if license_type.max_modules > 0 and len(modules) > license_type.max_modules:
+            raise ValueError(
+                f"Excede el límite de módulos ({license_type.max_modules}) para licencia {license_type.name}"
+            )
+
+        fingerprint = raw.get("hardware_fingerprint", "").lower()
+        if fingerprint:
+            if not FINGERPRINT_PATTERN.match(fingerprint):
+                raise ValueError("hardware_fingerprint debe ser un sha256 en hexadecimal")
+        else:
+            try:
+                hardware_info = HardwareInfo(**{
+                    field: raw[field] for field in HARDWARE_FIELDS if raw.get(field)
+                })
+            except Exception:
+                raise ValueError("Faltan datos de hardware (mac_address, processor_id, os_info, hostname)")
+            fingerprint = SecurityManager.generate_hardware_fingerprint(hardware_info)
+
+        return {
+            "license": {
+                "license_key": SecurityManager.generate_license_key(),
+                "client_name": client_name,
+                "client_email": client_email,
+                "license_type": license_type.name,
+                "hardware_fingerprint": fingerprint,
+                "issued_date": now,
+                "expiry_date": now + timedelta(days=license_type.duration_days),
+                "max_users": license_type.max_users,
+                "current_users": 0,
+                "is_active": True,
+                "validation_count": 0,
+                "created_at": now
+            },
+            "modules": modules
+        }
+
+
+# ============================================================================
+# INSERCIÓN POR LOTES
+# ============================================================================
+
+def _insert_rows(db, table, rows: List[Dict[str, Any]]):
+    """COPY en PostgreSQL con psycopg2; executemany en el resto"""
+    if not rows:
+        return
+    connection = db.connection()
+    if connection.dialect.name == "postgresql":
+        cursor = connection.connection.driver_connection.cursor()
+        if hasattr(cursor, "copy_expert"):
+            columns = list(rows[0])
+            buffer = io.StringIO()
+            # Cadenas entre comillas: "" es una cadena vacía (las filas no llevan NULL)
+            writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+            for row in rows:
+                writer.writerow([
+                    value.isoformat() if isinstance(value, datetime) else value
+                    for value in (row[column] for column in columns)
+                ])
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+            cursor.close()
+            return
+    from sqlalchemy import insert
+    connection.execute(insert(table), rows)
+
+
+def _active_fingerprints(db, fingerprints: List[str]) -> set:
+    from main import License
+
+    if not fingerprints:
+        return set()
+    return {
+        fingerprint for (fingerprint,) in db.query(License.hardware_fingerprint).filter(
+            License.hardware_fingerprint.in_(fingerprints),
+            License.is_active == True
+        )
+    }
+
+
+def import_licenses(db, rows: Iterable[Tuple[int, Dict[str, str]]], dry_run: bool = False) -> Dict[str, Any]:
+    """Valida e inserta las filas por lotes; devuelve el resumen y el informe por fila"""
+    from main import License, LicenseModule
+    from invalidation import invalidation_bus, SCOPE_LICENSE
+    from sync_endpoints import lock_change_log, record_license_changes
+
+    started = time.perf_counter()
+    catalog = ImportCatalog(db)
+    seen_fingerprints: Dict[str, int] = {}
+    results: List[Dict[str, Any]] = []
+    rows = iter(rows)
+
+    while len(results) < MAX_ROWS:
+        chunk = list(islice(rows, min(CHUNK_ROWS, MAX_ROWS - len(results))))
+        if not chunk:
+            break
+
+        now = datetime.utcnow()
+        prepared = []
+        for line, raw in chunk:
+            result = {"row": line, "client_name": raw.get("client_name", ""), "license_key": None, "error": None}
+            results.append(result)
+            try:
+                entry = catalog.prepare(raw, now)
+            except ValueError as e:
+                result.update(status=STATUS_FAILED, error=str(e))
+                continue
+            fingerprint = entry["license"]["hardware_fingerprint"]
+            if fingerprint in seen_fingerprints:
+                result.update(status=STATUS_FAILED,
+                              error=f"Huella de hardware repetida en el archivo (fila {seen_fingerprints[fingerprint]})")
+                continue
+            seen_fingerprints[fingerprint] = line
+            prepared.append((result, entry))
+
+        # Una consulta por lote contra las licencias activas
+        existing = _active_fingerprints(db, [entry["license"]["hardware_fingerprint"] for _, entry in prepared])
+        accepted = []
+        for result, entry in prepared:
+            if entry["license"]["hardware_fingerprint"] in existing:
+                result.update(status=STATUS_FAILED, error="Ya existe una licencia activa para este hardware")
+            else:
+                accepted.append((result, entry))
+
+        if dry_run:
+            for result, _ in accepted:
+                result["status"] = STATUS_VALID
+            continue
+
+        try:
+            lock_change_log(db)
+            _insert_rows(db, License.__table__, [entry["license"] for _, entry in accepted])
+            _insert_rows(db, LicenseModule.__table__, [
+                {"license_key": entry["license"]["license_key"], "module_name": name, "granted_at": now}
+                for _, entry in accepted for name in entry["modules"]
+            ])
+            keys = [entry["license"]["license_key"] for _, entry in accepted]
+            if keys:
+                record_license_changes(db, keys)
+                # Con las claves: cada worker descarta lo que tuviera de ellas (índice, caché, panel)
+                invalidation_bus.publish_many(db, SCOPE_LICENSE, keys)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error insertando lote de importación: {e}")
+            for result, _ in accepted:
+                result.update(status=STATUS_FAILED, error=f"Error de base de datos: {e}")
+            continue
+
+        for result, entry in accepted:
+            result.update(status=STATUS_CREATED, license_key=entry["license"]["license_key"])
+
+    # Filas por encima de MAX_ROWS: no se procesan (el informe lo indica)
+    truncated = next(rows, None) is not None
+    elapsed = time.perf_counter() - started
+    succeeded = sum(1 for result in results if result["status"] != STATUS_FAILED)
+    return {
+        "dry_run": dry_run,
+        "total": len(results),
+        "created": 0 if dry_run else succeeded,
+        "valid": succeeded,
+        "failed": len(results) - succeeded,
+        "truncated": truncated,
+        "elapsed_seconds": round(elapsed, 3),
+        "licenses_per_second": round(succeeded / elapsed, 1) if elapsed > 0 else None,
+        "results": results
+    }
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def write_report(report: Dict[str, Any], path: str):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["row", "status", "license_key", "client_name", "error"])
+        writer.writeheader()
+        writer.writerows(report["results"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa licencias en bloque desde CSV o XLSX")
+    parser.add_argument("file", help="Archivo .csv o .xlsx")
+    parser.add_argument("--dry-run", action="store_true", help="Solo validar, sin crear licencias")
+    parser.add_argument("--report", help="Escribir el informe por fila en este CSV")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    logging.basicConfig(level=logging.INFO)
+    from main import SessionLocal
+
+    db = SessionLocal()
+    try:
+        with open(args.file, "rb") as stream:
+            report = import_licenses(db, iter_rows(stream, args.file), dry_run=args.dry_run)
+    except ImportFormatError as e:
+        print(f"❌ {e}")
+        return 1
+    finally:
+        db.close()
+
+    if args.report:
+        write_report(report, args.report)
+    for result in report["results"]:
+        if result["status"] == STATUS_FAILED:
+            print(f"  fila {result['row']}: {result['error']}")
+    if report["truncated"]:
+        print(f"⚠️ Solo se procesaron las primeras {MAX_ROWS} filas (SAPIENTIA_IMPORT_MAX_ROWS)")
+    action = "válidas" if args.dry_run else "creadas"
+    print(f"{'✅' if not report['failed'] else '⚠️'} {report['valid']}/{report['total']} licencias {action}, "
+          f"{report['failed']} con error ({report['elapsed_seconds']}s, "
+          f"{report['licenses_per_second']} licencias/s)")
+    return 0 if not report["failed"] else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
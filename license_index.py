@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+"""
+License Index
+=============
+Índice en memoria compartida (``multiprocessing.shared_memory``) de las
+licencias activas, para que los workers de un mismo host validen sin ir a la
+base de datos ni a Redis y sin duplicar el índice en cada proceso.
+
+Estructura:
+
+- Segmento de control: magic, generación y buffer activo (0 o 1)
+- Dos segmentos de datos (doble buffer). Cada uno lleva una cabecera
+  (capacidad, número de licencias, instante de construcción, diccionarios de
+  módulos y tipos en JSON) y una tabla hash de direccionamiento abierto
+  (sondeo lineal) con slots de ancho fijo:
+  flags, clave, huella de hardware (32 bytes), expiración, máscara de bits de
+  módulos, usuarios y nombre del cliente.
+
+Un solo worker por host (el que obtiene el flock) reconstruye el buffer
+inactivo y después publica la nueva generación. Los lectores no toman locks:
+leen la generación, consultan el slot y vuelven a comprobar la generación; si
+cambió durante la lectura, reintentan.
+
+Las licencias modificadas después de construir el índice (avisadas por el bus
+de invalidación) no se responden desde el índice hasta la siguiente
+reconstrucción.
+
+El índice solo responde aciertos: una clave que no está puede ser una licencia
+emitida después de construirlo (en otro worker, antes de que el bus avise a
+este) y sigue la ruta normal (caché y base de datos).
+
+Se activa con ``SAPIENTIA_SHM_INDEX=1``.
+"""
+
+import calendar
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, Optional
+
+from invalidation import invalidation_bus, change_keys, SCOPE_LICENSE
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("SAPIENTIA_SHM_INDEX", "0") == "1"
+SEGMENT_PREFIX = os.getenv("SAPIENTIA_SHM_INDEX_NAME", "sapientia_license_index")
+CAPACITY = int(os.getenv("SAPIENTIA_SHM_INDEX_CAPACITY", 1 << 17))  # slots, potencia de 2
+LOCK_PATH = os.getenv("SAPIENTIA_SHM_INDEX_LOCK", "/tmp/sapientia_license_index.lock")
+REFRESH_SECONDS = float(os.getenv("SAPIENTIA_SHM_INDEX_REFRESH", 60))
+DIRTY_CHECK_SECONDS = 1.0
+MAX_LOAD_FACTOR = 0.7
+
+MAGIC = b"SLIX"
+KEY_BYTES = 40
+NAME_BYTES = 64
+MAX_MODULES = 64
+MAX_TYPES = 255
+DICT_BYTES = 32 * 1024
+
+FLAG_OCCUPIED = 0x01
+FLAG_FALLBACK = 0x02  # no representable en el slot (módulos fuera del diccionario, huella no hex...): ruta normal
+
+CONTROL = struct.Struct("<4sQB")
+DATA_HEADER = struct.Struct("<IIdI")
+# flags, key_len, type_idx, pad, max_users, key, fingerprint, expiry, modules, current_users, client_name
+SLOT = struct.Struct(f"<BBBxi{KEY_BYTES}s32sqQi{NAME_BYTES}s")
+SLOTS_OFFSET = DATA_HEADER.size + DICT_BYTES
+
+
+def _hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def _to_epoch(value: datetime) -> int:
+    return calendar.timegm(value.utctimetuple())
+
+
+class SharedLicenseIndex:
+    """Tabla hash de licencias activas compartida por los workers del host"""
+
+    def __init__(self, prefix: str = SEGMENT_PREFIX, capacity: int = CAPACITY):
+        self.prefix = prefix
+        self.capacity = 1 << max(capacity - 1, 1).bit_length()  # potencia de 2
+        self._control: Optional[shared_memory.SharedMemory] = None
+        self._data = [None, None]
+        self._dictionaries: Dict[int, tuple] = {}
+        # license_key -> instante del último cambio avisado por el bus
+        self._changed: Dict[str, float] = {}
+        self._changed_lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_file = None
+        self._last_build = 0.0
+
+    # ------------------------------------------------------------------
+    # Segmentos
+    # ------------------------------------------------------------------
+
+    def _segment_size(self) -> int:
+        return SLOTS_OFFSET + self.capacity * SLOT.size
+
+    def _open(self, name: str, size: int, create: bool) -> shared_memory.SharedMemory:
+        try:
+            return shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            if not create:
+                raise
+        segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+        # El índice debe sobrevivir al worker que lo creó (reciclado de workers)
+        try:
+            resource_tracker.unregister(segment._name, "shared_memory")
+        except Exception:
+            pass
+        return segment
+
+    def _attach(self, create: bool = False) -> bool:
+        if self._control is not None:
+            return True
+        try:
+            control = self._open(f"{self.prefix}_ctl", CONTROL.size, create)
+            data = [self._open(f"{self.prefix}_{i}", self._segment_size(), create) for i in (0, 1)]
+        except FileNotFoundError:
+            return False
+        self._control, self._data = control, data
+        # La capacidad real es la de los segmentos existentes
+        self.capacity = (data[0].size - SLOTS_OFFSET) // SLOT.size
+        return True
+
+    def unlink(self):
+        """Elimina los segmentos del host (al parar el servidor)"""
+        for suffix in ("ctl", "0", "1"):
+            try:
+                segment = shared_memory.SharedMemory(name=f"{self.prefix}_{suffix}")
+                segment.close()
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+
+    # ------------------------------------------------------------------
+    # Lectura (sin locks)
+    # ------------------------------------------------------------------
+
+    def _dictionary(self, generation: int, buf, dict_len: int) -> tuple:
+        cached = self._dictionaries.get(generation)
+        if cached is None:
+            data = json.loads(bytes(buf[DATA_HEADER.size:DATA_HEADER.size + dict_len]))
+            cached = (data["modules"], data["types"])
+            self._dictionaries = {generation: cached}
+        return cached
+
+    def lookup(self, license_key: str) -> Optional[Dict[str, Any]]:
+        """Estado de la licencia o None si el índice no la tiene o no puede responder"""
+        if not ENABLED or not self._attach():
+            return None
+        key = license_key.encode()
+        if len(key) > KEY_BYTES:
+            return None
+
+        control = self._control.buf
+        for _ in range(3):
+            magic, generation, active = CONTROL.unpack_from(control, 0)
+            if magic != MAGIC or generation == 0:
+                return None
+
+            buf = self._data[active].buf
+            capacity, count, built_at, dict_len = DATA_HEADER.unpack_from(buf, 0)
+            if self._changed and self._changed.get(license_key, 0) >= built_at:
+                return None
+
+            try:
+                result = self._probe(buf, capacity, key, generation, dict_len)
+            except (struct.error, ValueError, KeyError, IndexError):
+                result = None  # lectura a medio escribir: se reintenta
+
+            if CONTROL.unpack_from(control, 0)[1] == generation:
+                return result
+        return None
+
+    def _probe(self, buf, capacity: int, key: bytes, generation: int, dict_len: int):
+        mask = capacity - 1
+        index = _hash(key) & mask
+        for _ in range(capacity):
+            (flags, key_len, type_idx, max_users, slot_key, fingerprint,
+             expiry, modules, current_users, client_name) = SLOT.unpack_from(buf, SLOTS_OFFSET + index * SLOT.size)
+            if not flags & FLAG_OCCUPIED:
+                return None
+            if key_len == len(key) and slot_key[:key_len] == key:
+                if flags & FLAG_FALLBACK:
+                    return None
+                module_names, type_names = self._dictionary(generation, buf, dict_len)
+                return {
+                    "client_name": client_name.rstrip(b"\0").decode("utf-8", "ignore"),
+                    "license_type": type_names[type_idx],
+                    "hardware_fingerprint": fingerprint.hex(),
+                    "expiry_date": datetime.utcfromtimestamp(expiry).isoformat(),
+                    "max_users": max_users,
+                    "current_users": current_users,
+                    "allowed_modules": [name for bit, name in enumerate(module_names) if modules >> bit & 1]
+                }
+            index = (index + 1) & mask
+        return None
+
+    # ------------------------------------------------------------------
+    # Escritura (un solo worker por host)
+    # ------------------------------------------------------------------
+
+    def rebuild(self) -> bool:
+        """Lee las licencias activas y publica un índice nuevo"""
+        from main import SessionLocal, License
+
+        # Tomado ANTES de leer: un cambio que llegue durante la lectura queda marcado como posterior
+        built_at = time.time()
+        db = SessionLocal()
+        try:
+            rows = License.validation_rows(db)
+        finally:
+            db.close()
+        return self.publish(rows, built_at)
+
+    def publish(self, rows, built_at: float) -> bool:
+        """Escribe las filas en el buffer inactivo y lo activa"""
+        if not self._attach(create=True):
+            return False
+
+        if len(rows) > self.capacity * MAX_LOAD_FACTOR:
+            logger.error(f"Índice compartido lleno ({len(rows)} licencias, capacidad {self.capacity}); "
+                         f"aumentar SAPIENTIA_SHM_INDEX_CAPACITY")
+            return False
+
+        module_names = sorted({name for row in rows for name in (row.allowed_modules or [])})[:MAX_MODULES]
+        type_names = sorted({row.license_type for row in rows})[:MAX_TYPES]
+        module_bits = {name: bit for bit, name in enumerate(module_names)}
+        type_index = {name: i for i, name in enumerate(type_names)}
+        dictionary = json.dumps({"modules": module_names, "types": type_names}).encode()
+        if len(dictionary) > DICT_BYTES:
+            logger.error("Diccionario de módulos/tipos demasiado grande para el índice compartido")
+            return False
+
+        magic, generation, active = CONTROL.unpack_from(self._control.buf, 0)
+        if magic != MAGIC:
+            generation, active = 0, 1
+        target = 1 - active
+        buf = self._data[target].buf
+        mask = self.capacity - 1
+
+        buf[SLOTS_OFFSET:SLOTS_OFFSET + self.capacity * SLOT.size] = bytes(self.capacity * SLOT.size)
+        for row in rows:
+            key = row.license_key.encode()
+            try:
+                fingerprint = bytes.fromhex(row.hardware_fingerprint)
+            except (TypeError, ValueError):
+                fingerprint = b""
+            if len(key) > KEY_BYTES:
+                continue  # lookup() no consulta el índice para claves largas
+
+            flags = FLAG_OCCUPIED
+            if len(fingerprint) != 32 or row.license_type not in type_index:
+                flags |= FLAG_FALLBACK
+                fingerprint = b""
+            modules = 0
+            for name in row.allowed_modules or []:
+                if name in module_bits:
+                    modules |= 1 << module_bits[name]
+                else:
+                    flags |= FLAG_FALLBACK
+
+            index = _hash(key) & mask
+            while buf[SLOTS_OFFSET + index * SLOT.size] & FLAG_OCCUPIED:
+                index = (index + 1) & mask
+            SLOT.pack_into(
+                buf, SLOTS_OFFSET + index * SLOT.size,
+                flags, len(key), type_index.get(row.license_type, 0), row.max_users or 0,
+                key, fingerprint, _to_epoch(row.expiry_date), modules,
+                row.current_users or 0, (row.client_name or "").encode()[:NAME_BYTES]
+            )
+
+        DATA_HEADER.pack_into(buf, 0, self.capacity, len(rows), built_at, len(dictionary))
+        buf[DATA_HEADER.size:DATA_HEADER.size + len(dictionary)] = dictionary
+
+        # Publicar: a partir de aquí los lectores usan el buffer nuevo
+        CONTROL.pack_into(self._control.buf, 0, MAGIC, generation + 1, target)
+        self._last_build = built_at
+        self._forget_changes(built_at)
+        logger.info(f"Índice compartido generación {generation + 1}: {len(rows)} licencias "
+                    f"en {(time.time() - built_at) * 1000:.0f}ms")
+        return True
+
+    def _is_writer(self) -> bool:
+        """Elección del escritor del host con flock; si el worker muere, otro lo toma"""
+        if self._lock_file is not None:
+            return True
+        lock_file = open(LOCK_PATH, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info(f"Worker {os.getpid()} es el escritor del índice compartido")
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self._is_writer():
+                    due = time.time() - self._last_build >= REFRESH_SECONDS
+                    if due or self._dirty.is_set():
+                        self._dirty.clear()
+                        self.rebuild()
+                else:
+                    # Lectores: olvidar cambios ya incluidos en el índice publicado
+                    self._prune_changed()
+            except Exception as e:
+                logger.error(f"Error actualizando índice compartido: {e}")
+            self._stop.wait(DIRTY_CHECK_SECONDS)
+
+    def _prune_changed(self):
+        if not self._changed or not self._attach():
+            return
+        _, generation, active = CONTROL.unpack_from(self._control.buf, 0)
+        if generation:
+            self._forget_changes(DATA_HEADER.unpack_from(self._data[active].buf, 0)[2])
+
+    def _forget_changes(self, built_at: float):
+        with self._changed_lock:
+            self._changed = {k: t for k, t in self._changed.items() if t >= built_at}
+
+    def mark_changed(self, change: Dict[str, Any]):
+        keys = change_keys(change)
+        if keys:
+            now = time.time()
+            with self._changed_lock:
+                for key in keys:
+                    self._changed[key] = now
+        self._dirty.set()
+
+    def start(self):
+        if not ENABLED or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="license-index", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+# Instancia del proceso
+license_index = SharedLicenseIndex()
+invalidation_bus.subscribe(SCOPE_LICENSE, license_index.mark_changed)
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+License Snapshot
+================
+Snapshot binario y versionado de las licencias activas, pensado para leerse
+con ``mmap`` desde el validador de borde (edge_validator.py) sin base de datos.
+
+Formato (little endian):
+
+- Cabecera: magic ``SLSN``, versión de formato, id del snapshot, instante de
+  exportación, número de registros, ancho de clave, palabras de la máscara de
+  módulos, tamaño de registro, offsets/longitudes de las secciones y un
+  checksum blake2b del cuerpo.
+- Diccionario JSON: nombres de módulos (posición = bit de la máscara) y de
+  tipos de licencia.
+- Registros de ancho fijo ordenados por clave (búsqueda binaria):
+  clave, huella de hardware, expiración, usuarios, tipo, nombre del cliente
+  (offset en la tabla de cadenas) y máscara de módulos.
+- Tabla de cadenas UTF-8 con los nombres de cliente.
+
+El exportador escribe en un archivo temporal del mismo directorio y lo
+renombra con ``os.replace``: los lectores ven el snapshot anterior o el nuevo,
+nunca uno a medio escribir.
+
+Uso:
+    python license_snapshot.py --output data/licenses.snap
+    python license_snapshot.py --output data/licenses.snap --interval 60
+"""
+
+import argparse
+import calendar
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SLSN"
+FORMAT_VERSION = 1
+FINGERPRINT_BYTES = 64  # sha256 en hex
+
+# magic, versión, ancho de clave, snapshot_id, exportado, registros, palabras de módulos,
+# tamaño de registro, dict (offset, len), registros (offset), cadenas (offset, len), checksum
+HEADER = struct.Struct("<4sHHQdIIIQIQQQ32s")
+
+DEFAULT_PATH = os.getenv("SAPIENTIA_SNAPSHOT_PATH", "data/licenses.snap")
+
+
+def _to_epoch(value: datetime) -> int:
+    return calendar.timegm(value.utctimetuple())
+
+
+def _record_struct(key_bytes: int, module_words: int) -> struct.Struct:
+    # clave, huella, expiración, max_users, current_users, tipo, len nombre, offset nombre, máscara
+    return struct.Struct(f"<{key_bytes}s{FINGERPRINT_BYTES}sqiiHHI{module_words}Q")
+
+
+# ============================================================================
+# EXPORTACIÓN
+# ============================================================================
+
+def build_snapshot(rows: Iterable[Any], exported_at: Optional[float] = None) -> bytes:
+    """Serializa filas de licencias (atributos como el modelo License) al formato binario"""
+    rows = sorted(rows, key=lambda row: row.license_key.encode())
+    exported_at = time.time() if exported_at is None else exported_at
+
+    module_names = sorted({name for row in rows for name in (row.allowed_modules or [])})
+    type_names = sorted({row.license_type for row in rows})
+    module_bits = {name: bit for bit, name in enumerate(module_names)}
+    type_index = {name: i for i, name in enumerate(type_names)}
+    module_words = max(1, (len(module_names) + 63) // 64)
+    key_bytes = max([len(row.license_key.encode()) for row in rows] or [1])
+
+    record = _record_struct(key_bytes, module_words)
+    dictionary = json.dumps({"modules": module_names, "types": type_names}).encode()
+    records = bytearray(record.size * len(rows))
+    strings = bytearray()
+
+    for i, row in enumerate(rows):
+        mask = 0
+        for name in row.allowed_modules or []:
+            mask |= 1 << module_bits[name]
+        words = [(mask >> (64 * w)) & 0xFFFFFFFFFFFFFFFF for w in range(module_words)]
+        name = (row.client_name or "").encode()[:0xFFFF]
+        record.pack_into(
+            records, i * record.size,
+            row.license_key.encode(), (row.hardware_fingerprint or "").encode()[:FINGERPRINT_BYTES],
+            _to_epoch(row.expiry_date), row.max_users or 0, row.current_users or 0,
+            type_index[row.license_type], len(name), len(strings), *words
+        )
+        strings += name
+
+    dict_offset = HEADER.size
+    records_offset = dict_offset + len(dictionary)
+    strings_offset = records_offset + len(records)
+    body = dictionary + records + strings
+    checksum = hashlib.blake2b(body, digest_size=32).digest()
+
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, key_bytes, int(exported_at * 1000), exported_at, len(rows),
+        module_words, record.size, dict_offset, len(dictionary), records_offset,
+        strings_offset, len(strings), checksum
+    )
+    return header + body
+
+
+def write_snapshot(data: bytes, path: str):
+    """Escritura atómica: archivo temporal + fsync + os.replace"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".licenses-", suffix=".snap", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def export_snapshot(path: str = DEFAULT_PATH) -> int:
+    """Exporta las licencias activas de la BD; devuelve el número de licencias"""
+    from main import SessionLocal, License
+
+    exported_at = time.time()
+    db = SessionLocal()
+    try:
+        rows = License.validation_rows(db)
+    finally:
+        db.close()
+
+    write_snapshot(build_snapshot(rows, exported_at), path)
+    return len(rows)
+
+
+# ============================================================================
+# LECTURA (MMAP)
+# ============================================================================
+
+class SnapshotError(Exception):
+    """Snapshot inexistente, de otra versión o corrupto"""
+
+
+class LicenseSnapshot:
+    """Snapshot abierto con mmap; las búsquedas no copian el archivo a memoria"""
+
+    def __init__(self, path: str, verify: bool = True):
+        self.path = path
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if stat.st_size < HEADER.size:
+                raise SnapshotError(f"Snapshot truncado: {path}")
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, self.key_bytes, self.snapshot_id, self.exported_at, self.count,
+         module_words, record_size, dict_offset, dict_len, self._records_offset,
+         self._strings_offset, strings_len, checksum) = HEADER.unpack_from(self._mm, 0)
+
+        if magic != MAGIC:
+            raise SnapshotError(f"No es un snapshot de licencias: {path}")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"Versión de snapshot no soportada: {version}")
+        self._record = _record_struct(self.key_bytes, module_words)
+        if self._record.size != record_size or self._strings_offset + strings_len != len(self._mm):
+            raise SnapshotError(f"Snapshot inconsistente: {path}")
+        if verify and hashlib.blake2b(self._mm[HEADER.size:], digest_size=32).digest() != checksum:
+            raise SnapshotError(f"Checksum incorrecto: {path}")
+
+        dictionary = json.loads(self._mm[dict_offset:dict_offset + dict_len])
+        self.module_names = dictionary["modules"]
+        self.type_names = dictionary["types"]
+
+    def _key_at(self, index: int) -> bytes:
+        offset = self._records_offset + index * self._record.size
+        return self._mm[offset:offset + self.key_bytes]
+
+    def lookup(self, license_key: str) -> Optional[Dict[str, Any]]:
+        """Estado de la licencia (mismo formato que la caché del servidor) o None si no está activa"""
+        key = license_key.encode()
+        if len(key) > self.key_bytes:
+            return None
+        key = key.ljust(self.key_bytes, b"\0")
+
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.count or self._key_at(low) != key:
+            return None
+
+        (_, fingerprint, expiry, max_users, current_users, type_idx,
+         name_len, name_offset, *words) = self._record.unpack_from(
+            self._mm, self._records_offset + low * self._record.size
+        )
+        mask = sum(word << (64 * w) for w, word in enumerate(words))
+        name_start = self._strings_offset + name_offset
+        return {
+            "client_name": self._mm[name_start:name_start + name_len].decode("utf-8", "ignore"),
+            "license_type": self.type_names[type_idx],
+            "hardware_fingerprint": fingerprint.rstrip(b"\0").decode(),
+            "expiry_date": datetime.utcfromtimestamp(expiry).isoformat(),
+            "max_users": max_users,
+            "current_users": current_users,
+            "allowed_modules": [name for bit, name in enumerate(self.module_names) if mask >> bit & 1]
+        }
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "snapshot_id": self.snapshot_id,
+            "exported_at": datetime.utcfromtimestamp(self.exported_at).isoformat(),
+            "age_seconds": round(time.time() - self.exported_at, 1),
+            "licenses": self.count
+        }
+
+    def close(self):
+        self._mm.close()
+
+
+class SnapshotStore:
+    """Snapshot vigente con recarga en caliente cuando el archivo se reemplaza"""
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self.current: Optional[LicenseSnapshot] = None
+
+    def reload_if_changed(self) -> bool:
+        """Abre el archivo si cambió; ante un snapshot inválido se conserva el anterior"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if self.current is not None and self.current.identity == identity:
+            return False
+
+        try:
+            snapshot = LicenseSnapshot(self.path)
+        except (OSError, ValueError, SnapshotError) as e:
+            logger.error(f"Snapshot de licencias descartado: {e}")
+            return False
+
+        # Cambio atómico de referencia: las búsquedas en curso terminan sobre el mmap anterior,
+        # que se libera cuando deja de estar referenciado
+        self.current = snapshot
+        logger.info(f"Snapshot de licencias {snapshot.snapshot_id} cargado ({snapshot.count} licencias)")
+        return True
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta las licencias activas a un snapshot binario")
+    parser.add_argument("--output", default=DEFAULT_PATH, help="Ruta del snapshot (SAPIENTIA_SNAPSHOT_PATH)")
+    parser.add_argument("--interval", type=float, default=0,
+                        help="Reexportar cada N segundos (0 = una sola vez)")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    logging.basicConfig(level=logging.INFO)
+
+    while True:
+        started = time.time()
+        try:
+            count = export_snapshot(args.output)
+            print(f"✅ Snapshot {args.output}: {count} licencias en {(time.time() - started) * 1000:.0f}ms")
+        except Exception as e:
+            print(f"❌ Error exportando snapshot: {e}")
+            if not args.interval:
+                return 1
+        if not args.interval:
+            return 0
+        time.sleep(max(0.0, args.interval - (time.time() - started)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Entorno de Alembic: usa el engine y los modelos de main.py"""
+
+from logging.config import fileConfig
+
+from alembic import context
+
+from main import Base, engine
+
+config = context.config
+# Desde la CLI de alembic; desde el servidor (utils.run_migrations) se respeta su logging
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline():
+    context.configure(
+        url=str(engine.url),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"}
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,61 @@
+"""Índices compuestos y parciales para las consultas frecuentes
+
+- license_validations(license_key, validation_time): historial e info de licencia
+- license_validations(validation_time): validaciones de las últimas 24 h (dashboard)
+- licenses(hardware_fingerprint) WHERE is_active: licencia activa por hardware (/license/request)
+- licenses(expiry_date): expiradas y filtro de estado del panel
+- licenses(issued_date, id): orden del panel paginado
+
+En PostgreSQL se crean con CONCURRENTLY (sin bloquear escrituras). IF NOT EXISTS
+porque en instalaciones nuevas create_all ya los crea desde los modelos.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Condición del índice parcial por motor: SQLite solo usa el índice si coincide
+# literalmente con la de la consulta (SQLAlchemy genera "is_active = 1")
+ACTIVE = {"postgresql": "is_active", "sqlite": "is_active = 1"}
+
+# nombre -> (tabla, columnas, condición parcial)
+INDEXES = {
+    "ix_license_validations_key_time": ("license_validations", "license_key, validation_time", None),
+    "ix_license_validations_time": ("license_validations", "validation_time", None),
+    "ix_licenses_fingerprint_active": ("licenses", "hardware_fingerprint", ACTIVE),
+    "ix_licenses_expiry_date": ("licenses", "expiry_date", None),
+    "ix_licenses_issued_date_id": ("licenses", "issued_date, id", None),
+}
+
+
+def _statements(create: bool):
+    dialect = op.get_bind().dialect.name
+    concurrently = " CONCURRENTLY" if dialect == "postgresql" else ""
+    for name, (table, columns, where) in INDEXES.items():
+        if create:
+            condition = f" WHERE {where.get(dialect, where['postgresql'])}" if where else ""
+            yield f"CREATE INDEX{concurrently} IF NOT EXISTS {name} ON {table} ({columns}){condition}"
+        else:
+            yield f"DROP INDEX{concurrently} IF EXISTS {name}"
+
+
+def upgrade():
+    # CONCURRENTLY no puede ejecutarse dentro de una transacción
+    with op.get_context().autocommit_block():
+        for statement in _statements(create=True):
+            op.execute(statement)
+    op.execute("ANALYZE licenses")
+    op.execute("ANALYZE license_validations")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for statement in _statements(create=False):
+            op.execute(statement)
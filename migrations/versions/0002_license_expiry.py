@@ -0,0 +1,42 @@
+"""Vencimiento de licencias: columna expired_at e índice de próximos vencimientos
+
+- licenses.expired_at: instante en que el barrido (expiry.py) desactivó la licencia
+- licenses(expiry_date) WHERE is_active: "vencen en los próximos N días" por rango
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+ACTIVE = {"postgresql": "is_active", "sqlite": "is_active = 1"}
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    # Instalaciones nuevas: create_all ya creó la columna desde el modelo
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("licenses")}
+    if "expired_at" not in columns:
+        op.add_column("licenses", sa.Column("expired_at", sa.DateTime(), nullable=True))
+
+    concurrently = " CONCURRENTLY" if dialect == "postgresql" else ""
+    with op.get_context().autocommit_block():
+        op.execute(
+            f"CREATE INDEX{concurrently} IF NOT EXISTS ix_licenses_active_expiry "
+            f"ON licenses (expiry_date) WHERE {ACTIVE.get(dialect, ACTIVE['postgresql'])}"
+        )
+
+
+def downgrade():
+    concurrently = " CONCURRENTLY" if op.get_bind().dialect.name == "postgresql" else ""
+    with op.get_context().autocommit_block():
+        op.execute(f"DROP INDEX{concurrently} IF EXISTS ix_licenses_active_expiry")
+    with op.batch_alter_table("licenses") as batch:
+        batch.drop_column("expired_at")
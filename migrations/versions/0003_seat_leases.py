@@ -0,0 +1,38 @@
+"""Puestos arrendados por licencia (seats.py)
+
+- seat_leases: una fila por puesto (license_key, slot) con la sesión que lo
+  ocupa y el vencimiento del arrendamiento
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Instalaciones nuevas: create_all ya creó la tabla desde el modelo
+    if sa.inspect(op.get_bind()).has_table("seat_leases"):
+        return
+    op.create_table(
+        "seat_leases",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("license_key", sa.String(200), nullable=False),
+        sa.Column("slot", sa.Integer(), nullable=False),
+        sa.Column("session_id", sa.String(100)),
+        sa.Column("acquired_at", sa.DateTime()),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("license_key", "slot", name="uq_seat_leases_key_slot"),
+    )
+    op.create_index("ix_seat_leases_key_session", "seat_leases", ["license_key", "session_id"])
+
+
+def downgrade():
+    op.drop_table("seat_leases")
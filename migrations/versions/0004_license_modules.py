@@ -0,0 +1,68 @@
+"""Módulos por licencia normalizados: tabla license_modules
+
+- license_modules(license_key, module_name): clave primaria para el sentido
+  licencia -> módulos e índice (module_name, license_key) para el inverso
+- Copia el contenido de la columna JSON licenses.allowed_modules y la elimina
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+BATCH_ROWS = 1000
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    # Instalaciones nuevas: create_all ya creó la tabla desde el modelo
+    if not inspector.has_table("license_modules"):
+        op.create_table(
+            "license_modules",
+            sa.Column("license_key", sa.String(200),
+                      sa.ForeignKey("licenses.license_key", ondelete="CASCADE"), primary_key=True),
+            sa.Column("module_name", sa.String(100), primary_key=True),
+            sa.Column("granted_at", sa.DateTime()),
+        )
+        op.create_index("ix_license_modules_module_key", "license_modules", ["module_name", "license_key"])
+
+    if "allowed_modules" not in {column["name"] for column in inspector.get_columns("licenses")}:
+        return
+
+    licenses = sa.table("licenses", sa.column("license_key"), sa.column("allowed_modules", sa.JSON))
+    license_modules = sa.table("license_modules", sa.column("license_key"), sa.column("module_name"))
+    existing = set(bind.execute(sa.select(license_modules.c.license_key, license_modules.c.module_name)))
+    rows = [
+        {"license_key": license_key, "module_name": module_name}
+        for license_key, modules in bind.execute(sa.select(licenses.c.license_key, licenses.c.allowed_modules))
+        for module_name in dict.fromkeys(modules or [])
+        if (license_key, module_name) not in existing
+    ]
+    for start in range(0, len(rows), BATCH_ROWS):
+        op.bulk_insert(license_modules, rows[start:start + BATCH_ROWS])
+
+    op.drop_column("licenses", "allowed_modules")
+
+
+def downgrade():
+    op.add_column("licenses", sa.Column("allowed_modules", sa.JSON()))
+    bind = op.get_bind()
+    licenses = sa.table("licenses", sa.column("license_key"), sa.column("allowed_modules", sa.JSON))
+    modules = {}
+    for license_key, module_name in bind.execute(sa.text(
+        "SELECT license_key, module_name FROM license_modules ORDER BY license_key, module_name"
+    )):
+        modules.setdefault(license_key, []).append(module_name)
+    for license_key, names in modules.items():
+        bind.execute(
+            licenses.update().where(licenses.c.license_key == license_key).values(allowed_modules=names)
+        )
+    op.drop_table("license_modules")
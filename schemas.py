@@ -43,6 +43,18 @@ class LicenseValidationRequest(BaseModel):
     module_name: str
     hardware_info: HardwareInfo
     user_count: int = 1
+    session_id: Optional[str] = None  # sesión que ocupa el puesto (por defecto, el hardware)
+
+class LicenseBatchValidationRequest(BaseModel):
+    license_key: str
+    module_names: List[str]
+    hardware_info: HardwareInfo
+    user_count: int = 1
+    session_id: Optional[str] = None
+
+class SeatReleaseRequest(BaseModel):
+    license_key: str
+    session_id: str
 
 # ============================================================================
 # ESQUEMAS DE MÓDULOS
@@ -81,6 +93,24 @@ class DashboardStats(BaseModel):
     expired_licenses: int
     recent_validations_24h: int
 
+class ModuleEntitlementRequest(BaseModel):
+    license_keys: List[str]
+    module_names: List[str]
+
+class BulkLicenseRequest(BaseModel):
+    """Licencias de una operación en bloque: claves explícitas y/o filtros (se combinan con AND)"""
+    license_keys: Optional[List[str]] = None
+    license_type: Optional[str] = None
+    client: Optional[str] = None  # subcadena de nombre o email del cliente
+    expiring_before: Optional[datetime] = None
+
+class BulkRenewRequest(BulkLicenseRequest):
+    renewal_days: int = 365
+
+class BulkStatusRequest(BulkLicenseRequest):
+    # None invierte el estado de cada licencia, como el toggle individual
+    is_active: Optional[bool] = None
+
 class LicenseControlResponse(BaseModel):
     id: int
     license_key: str
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Seat Leases
+===========
+Puestos concurrentes por licencia con arrendamientos renovables.
+
+Cada licencia con ``max_users > 0`` tiene ``max_users`` filas en
+``seat_leases`` (una por puesto). Una sesión cliente ocupa un puesto hasta
+``expires_at``; al validar de nuevo lo renueva y, si deja de validar, el puesto
+queda libre al vencer sin ningún proceso de limpieza.
+
+- Renovación: un UPDATE condicional sobre el puesto de la sesión.
+- Adquisición: un UPDATE condicional de un puesto vencido, elegido con
+  ``FOR UPDATE SKIP LOCKED`` en PostgreSQL (en SQLite las escrituras ya están
+  serializadas por sqlite_mode.py). Como solo existen ``max_users`` filas, dos
+  validadores concurrentes nunca pueden ocupar más puestos que los contratados.
+- Las filas de puestos se crean la primera vez que hacen falta
+  (INSERT ... ON CONFLICT DO NOTHING) y al ampliar ``max_users``; si se reduce,
+  los puestos sobrantes (slot >= max_users) dejan de contar.
+
+Sustituye al antiguo ``current_users = max(current_users, user_count)``, que
+solo crecía y confiaba en el número enviado por el cliente.
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from main import SeatLease
+
+
+class SeatGrant(NamedTuple):
+    slot: int
+    session_id: str
+    expires_at: datetime
+    in_use: int
+
+
+class SeatLeases:
+    """Adquisición, renovación y liberación atómicas de puestos"""
+
+    # Margen sobre next_check_after antes de liberar el puesto de una sesión que no renueva
+    GRACE_SECONDS = int(os.getenv("SAPIENTIA_SEAT_GRACE_SECONDS", 900))
+
+    @staticmethod
+    def _insert(db: Session):
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        return insert(SeatLease)
+
+    @classmethod
+    def _provision(cls, db: Session, license_key: str, max_users: int) -> bool:
+        """Crea las filas de puestos que falten; False si ya existían todas"""
+        existing = db.execute(
+            select(func.count(SeatLease.id)).where(
+                SeatLease.license_key == license_key,
+                SeatLease.slot < max_users
+            )
+        ).scalar()
+        if existing >= max_users:
+            return False
+        db.execute(
+            cls._insert(db)
+            .values([{"license_key": license_key, "slot": slot} for slot in range(max_users)])
+            .on_conflict_do_nothing(index_elements=["license_key", "slot"])
+        )
+        return True
+
+    @staticmethod
+    def in_use(db: Session, license_key: str, max_users: int, now: Optional[datetime] = None) -> int:
+        """Puestos con arrendamiento vigente"""
+        return db.execute(
+            select(func.count(SeatLease.id)).where(
+                SeatLease.license_key == license_key,
+                SeatLease.slot < max_users,
+                SeatLease.expires_at > (now or datetime.utcnow())
+            )
+        ).scalar()
+
+    @classmethod
+    def acquire(
+        cls,
+        db: Session,
+        license_key: str,
+        session_id: str,
+        max_users: int,
+        lease_seconds: int
+    ) -> Optional[SeatGrant]:
+        """Renueva el puesto de la sesión u ocupa uno libre; None si no quedan puestos
+
+        No hace commit: el puesto queda bloqueado hasta que termine la transacción del llamador.
+        """
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=lease_seconds)
+
+        # Renovación (también de un arrendamiento vencido que nadie ha ocupado)
+        slot = db.execute(
+            update(SeatLease)
+            .where(
+                SeatLease.license_key == license_key,
+                SeatLease.session_id == session_id,
+                SeatLease.slot < max_users
+            )
+            .values(expires_at=expires_at)
+            .returning(SeatLease.slot)
+        ).scalar()
+
+        for attempt in range(2):
+            if slot is not None:
+                break
+            candidate = (
+                select(SeatLease.id)
+                .where(
+                    SeatLease.license_key == license_key,
+                    SeatLease.slot < max_users,
+                    SeatLease.expires_at <= now
+                )
+                .order_by(SeatLease.expires_at)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            # La condición se repite fuera: el puesto sigue libre al escribirlo
+            slot = db.execute(
+                update(SeatLease)
+                .where(SeatLease.id == candidate, SeatLease.expires_at <= now)
+                .values(session_id=session_id, acquired_at=now, expires_at=expires_at)
+                .returning(SeatLease.slot)
+            ).scalar()
+            if slot is None and (attempt or not cls._provision(db, license_key, max_users)):
+                return None
+
+        return SeatGrant(slot, session_id, expires_at, cls.in_use(db, license_key, max_users, now))
+
+    @staticmethod
+    def release(db: Session, license_key: str, session_id: str) -> bool:
+        """Libera el puesto de la sesión (cierre ordenado del cliente); no hace commit"""
+        now = datetime.utcnow()
+        released = db.execute(
+            update(SeatLease)
+            .where(
+                SeatLease.license_key == license_key,
+                SeatLease.session_id == session_id,
+                SeatLease.expires_at > now
+            )
+            .values(expires_at=now)
+        ).rowcount
+        return released > 0
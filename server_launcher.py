@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# server_launcher.py - LANZADOR MULTI-WORKER PARA PRODUCCIÓN
+# ============================================================================
+#
+# Gunicorn como master con workers uvicorn:
+#   - La app se importa UNA vez en el master (preload) y los workers se crean
+#     con fork, compartiendo su memoria copy-on-write.
+#   - El GC se desactiva durante la carga y gc.freeze() mueve todos los objetos
+#     del master a la generación permanente antes de cada fork, así el GC de
+#     los workers no toca (ni copia) esas páginas.
+#   - La carga inicial de datos (populate_initial_data) se ejecuta una sola vez
+#     en el master; los workers no la repiten.
+#   - Cada worker se recicla tras SAPIENTIA_MAX_REQUESTS requests (con jitter
+#     para que no se reinicien todos a la vez).
+#
+# Recarga sin cortes:
+#   kill -HUP <master>    workers nuevos (config, conexiones) y cierre ordenado de los viejos
+#   kill -USR2 <master>   nuevo master con el código actualizado; luego
+#   kill -QUIT <viejo>    cierra el master anterior cuando el nuevo está listo
+#
+# Uso:  python server_launcher.py [--workers 16] [--bind 0.0.0.0:8000]
+
+import argparse
+import gc
+import logging
+import os
+import sys
+from pathlib import Path
+
+# Sin GC durante la carga de la app: evita huecos en las páginas del master
+gc.disable()
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+logger = logging.getLogger("sapientia.launcher")
+
+
+def default_workers() -> int:
+    return int(os.getenv("SAPIENTIA_WORKERS", os.cpu_count() or 1))
+
+
+def build_options(args) -> dict:
+    return {
+        "bind": args.bind,
+        "workers": args.workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "max_requests": args.max_requests,
+        "max_requests_jitter": args.max_requests_jitter,
+        # Tiempo para terminar requests en curso (y cerrar streams SSE) al recargar/reciclar
+        "graceful_timeout": args.graceful_timeout,
+        "timeout": args.timeout,
+        "keepalive": int(os.getenv("SAPIENTIA_KEEPALIVE", 5)),
+        "accesslog": None,
+        "errorlog": "-",
+        "loglevel": os.getenv("SAPIENTIA_LOG_LEVEL", "info"),
+        "proc_name": "sapientia-license-server",
+        "when_ready": when_ready,
+        "pre_fork": pre_fork,
+        "post_fork": post_fork,
+        "on_exit": on_exit,
+    }
+
+
+# ============================================================================
+# HOOKS DEL MASTER / WORKERS
+# ============================================================================
+
+def seed_initial_data():
+    """Migraciones y carga inicial en el master, antes de crear workers"""
+    from main import SessionLocal, engine
+    from utils import populate_initial_data, run_migrations
+
+    run_migrations()
+    db = SessionLocal()
+    try:
+        populate_initial_data(db)
+    finally:
+        db.close()
+    # Las conexiones del master no deben heredarse por los workers
+    engine.dispose()
+    os.environ["SAPIENTIA_SEEDED_BY_MASTER"] = "1"
+
+
+def when_ready(server):
+    try:
+        seed_initial_data()
+        server.log.info("✅ Datos iniciales verificados en el master")
+    except Exception as e:
+        server.log.error(f"❌ Error en carga inicial (los workers la reintentarán): {e}")
+    gc.freeze()
+    server.log.info(f"🧊 gc.freeze(): {gc.get_freeze_count()} objetos compartidos con los workers")
+
+
+def pre_fork(server, worker):
+    # Objetos creados en el master desde el último fork (p.ej. tras reciclar un worker)
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from main import engine
+
+    # El pool de conexiones pertenece al master: el worker abre las suyas
+    engine.dispose(close=False)
+    gc.enable()
+
+
+def on_exit(server):
+    # Los segmentos del índice compartido sobreviven a los workers; se borran al parar el master
+    from license_index import license_index
+    license_index.unlink()
+
+
+# ============================================================================
+# APLICACIÓN GUNICORN
+# ============================================================================
+
+def run(options: dict):
+    from gunicorn.app.base import BaseApplication
+
+    class SapientiaServer(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            from integration_server import app
+            return app
+
+    SapientiaServer(options).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sapientia License Server multi-worker")
+    parser.add_argument("--workers", type=int, default=default_workers(),
+                        help="Número de workers (SAPIENTIA_WORKERS, por defecto núcleos de CPU)")
+    parser.add_argument("--bind", default=f"{os.getenv('SAPIENTIA_HOST', '0.0.0.0')}:{os.getenv('SAPIENTIA_PORT', '8000')}")
+    parser.add_argument("--max-requests", type=int, default=int(os.getenv("SAPIENTIA_MAX_REQUESTS", 10000)),
+                        help="Reciclar cada worker tras N requests (0 = nunca)")
+    parser.add_argument("--max-requests-jitter", type=int,
+                        default=int(os.getenv("SAPIENTIA_MAX_REQUESTS_JITTER", 1000)))
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("SAPIENTIA_GRACEFUL_TIMEOUT", 30)))
+    parser.add_argument("--timeout", type=int, default=int(os.getenv("SAPIENTIA_WORKER_TIMEOUT", 60)))
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🚀 Sapientia License Server - modo multi-worker")
+    print(f"🌐 {args.bind} | 👷 {args.workers} workers | ♻️ reciclado cada {args.max_requests} requests")
+    print("=" * 60)
+
+    run(build_options(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Single Flight
+=============
+Agrupa peticiones idénticas concurrentes en una sola ejecución.
+
+En un arranque masivo decenas de puestos de una clínica validan la misma
+``(license_key, módulos, huella)`` en pocos milisegundos. La primera petición
+carga el estado de la licencia y hace las comprobaciones en el pool de hilos,
+fuera del event loop, y las idénticas que llegan mientras está en curso esperan
+ese resultado en vez de repetir la consulta. El puesto de cada sesión, los
+contadores y el log de validaciones siguen siendo por petición: ver
+``_validate`` en license_endpoints.py.
+
+Activo por defecto; ``SAPIENTIA_COALESCE_VALIDATIONS=0`` vuelve a cargar el
+estado en cada petición, en el event loop, como antes.
+"""
+
+import asyncio
+import os
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+ENABLED = os.getenv("SAPIENTIA_COALESCE_VALIDATIONS", "1") == "1"
+
+
+class SingleFlight:
+    """Una ejecución en curso por clave; las llamadas concurrentes comparten su resultado"""
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.stats = {"executed": 0, "coalesced": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Resultado de fn() y si se tomó de otra ejecución en curso (entonces fn no se ejecuta)"""
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(future), True
+
+        # El futuro es el del hilo, no el de esta request: si el cliente se desconecta
+        # la ejecución sigue y quienes esperan reciben el resultado igualmente
+        future = asyncio.get_running_loop().run_in_executor(None, fn)
+        self._in_flight[key] = future
+        future.add_done_callback(lambda _: self._forget(key, future))
+        self.stats["executed"] += 1
+        return await asyncio.shield(future), False
+
+    def _forget(self, key: Hashable, future: asyncio.Future):
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+
+    def __len__(self) -> int:
+        return len(self._in_flight)
+
+
+# Instancia del proceso
+validation_flights = SingleFlight()
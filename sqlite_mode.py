@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite Production Mode
+======================
+Engine de SQLite para despliegues de un solo nodo (``sqlite:///...``):
+
+- PRAGMAs en cada conexión: WAL, ``synchronous=NORMAL``, ``busy_timeout``,
+  ``mmap_size``, ``cache_size`` y temporales en memoria.
+- Lecturas sin transacción explícita (autocommit del driver): en WAL un lector
+  nunca espera a un escritor ni lo bloquea.
+- Un solo escritor a la vez: la primera sentencia de escritura de una
+  transacción toma el lock de escritura (conexiones del proceso + flock entre
+  workers) y abre ``BEGIN IMMEDIATE``; el lock se libera en commit/rollback.
+  Las escrituras hacen cola aquí en vez de competir dentro de SQLite, que es lo
+  que producía "database is locked" (sobre todo al promover una transacción de
+  lectura a escritura con un snapshot ya obsoleto).
+
+El lock pertenece a la conexión, no al hilo. Una segunda sesión del mismo hilo
+(típicamente otro request en el hilo del event loop mientras el primero espera
+un ``await`` con la transacción abierta) no puede esperar a la primera sin
+bloquear el loop para siempre, así que falla al momento con "database is
+locked" en vez de colgarse en ``BEGIN IMMEDIATE``. La espera entre procesos es
+un flock bloqueante en un hilo propio, sin sondeo.
+"""
+
+import fcntl
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+BUSY_TIMEOUT_MS = int(os.getenv("SAPIENTIA_SQLITE_BUSY_TIMEOUT_MS", 10000))
+MMAP_SIZE = int(os.getenv("SAPIENTIA_SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+CACHE_SIZE_KIB = int(os.getenv("SAPIENTIA_SQLITE_CACHE_KIB", 64 * 1024))
+POOL_SIZE = int(os.getenv("SAPIENTIA_SQLITE_POOL_SIZE", 20))
+
+# SAVEPOINT incluido: fuera de una transacción abriría un BEGIN diferido (group_commit.py los usa)
+WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "REPLACE", "CREATE", "DROP", "ALTER", "SAVEPOINT")
+
+
+class WriterLock:
+    """Exclusión de escritores: Lock por conexión dentro del proceso y flock entre procesos del host"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._owner = None  # (id de la conexión, hilo que la usa)
+        self._fd = None
+        self._pid = None
+        self._flocker = None
+
+    def _file(self):
+        # Tras un fork el descriptor heredado comparte el flock con el padre y el
+        # hilo del flock no existe en el hijo: reabrir ambos
+        if self._fd is None or self._pid != os.getpid():
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            self._flocker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-flock")
+            self._pid = os.getpid()
+        return self._fd
+
+    def acquire(self, connection, timeout: float):
+        deadline = time.monotonic() + timeout
+        owner = self._owner
+        if owner is not None and owner[1] == threading.get_ident():
+            # Solo este hilo puede liberarlo: esperar sería un interbloqueo
+            raise sqlite3.OperationalError("database is locked (otra sesión de este hilo está escribiendo)")
+        if not self._lock.acquire(timeout=timeout):
+            raise sqlite3.OperationalError("database is locked (cola de escritura)")
+        try:
+            self._flock(max(0.0, deadline - time.monotonic()))
+        except BaseException:
+            self._lock.release()
+            raise
+        self._owner = (id(connection), threading.get_ident())
+
+    def _flock(self, timeout: float):
+        fd = self._file()
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return
+        except BlockingIOError:
+            pass
+        # Otro worker escribe: flock bloqueante en el hilo del flock (solo lo usa
+        # quien tiene self._lock, así que nunca hay dos esperas a la vez)
+        future = self._flocker.submit(fcntl.flock, fd, fcntl.LOCK_EX)
+        try:
+            future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Un flock en curso no se cancela: si se concede tarde se suelta en
+            # ese mismo hilo, antes de atender la siguiente espera
+            future.add_done_callback(lambda done: done.exception() is None and fcntl.flock(fd, fcntl.LOCK_UN))
+            raise sqlite3.OperationalError("database is locked (cola de escritura)")
+
+    def release(self):
+        self._owner = None
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._lock.release()
+
+
+class SQLiteConnection(sqlite3.Connection):
+    """Conexión que abre BEGIN IMMEDIATE en la primera escritura y libera el lock al terminar"""
+
+    writer_lock: WriterLock = None
+
+    def begin_write(self):
+        if getattr(self, "_holds_writer", False):
+            return
+        self.writer_lock.acquire(self, BUSY_TIMEOUT_MS / 1000)
+        self._holds_writer = True
+        try:
+            if self.in_transaction:
+                # Lecturas previas ya dentro de una transacción (no debería ocurrir en autocommit)
+                super().commit()
+            self.execute("BEGIN IMMEDIATE")
+        except Exception:
+            self._release_writer()
+            raise
+
+    def _release_writer(self):
+        if getattr(self, "_holds_writer", False):
+            self._holds_writer = False
+            self.writer_lock.release()
+
+    def commit(self):
+        try:
+            super().commit()
+        finally:
+            self._release_writer()
+
+    def rollback(self):
+        try:
+            super().rollback()
+        finally:
+            self._release_writer()
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._release_writer()
+
+
+def _apply_pragmas(dbapi_connection, connection_record):
+    # Sin BEGIN implícito del driver: las lecturas no abren transacción
+    dbapi_connection.isolation_level = None
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KIB}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def _begin_write_if_needed(conn, cursor, statement, parameters, context, executemany):
+    keyword = statement.lstrip().split(None, 1)[:1]
+    if keyword and keyword[0].upper() in WRITE_PREFIXES:
+        dbapi_connection = conn.connection.dbapi_connection
+        if isinstance(dbapi_connection, SQLiteConnection):
+            dbapi_connection.begin_write()
+
+
+def create_sqlite_engine(url: str, **kwargs):
+    """Engine SQLite con WAL, PRAGMAs de producción y un solo escritor"""
+    database = make_url(url).database
+    in_memory = not database or database == ":memory:"
+
+    # Una clase de conexión por engine, con su propio lock de escritura
+    connection_class = type("SQLiteConnection", (SQLiteConnection,), {
+        "writer_lock": WriterLock(f"{database}.writer.lock" if not in_memory else os.devnull)
+    })
+
+    options = {
+        "connect_args": {
+            "factory": connection_class,
+            "check_same_thread": False,
+            "timeout": BUSY_TIMEOUT_MS / 1000
+        }
+    }
+    if not in_memory:
+        options.update(pool_size=POOL_SIZE, max_overflow=POOL_SIZE)
+    options.update(kwargs)
+
+    engine = create_engine(url, **options)
+    event.listen(engine, "connect", _apply_pragmas)
+    event.listen(engine, "before_cursor_execute", _begin_write_if_needed)
+    logger.info(f"SQLite en modo producción: {database} (WAL, synchronous=NORMAL, un escritor)")
+    return engine
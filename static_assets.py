@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Static Assets
+=============
+StaticFiles que sirve variantes precomprimidas (.br / .gz) generadas por
+build_assets.py y añade cabeceras de caché adecuadas:
+
+- Bundles con hash en el nombre: 'Cache-Control: public, max-age=31536000, immutable'
+- Archivos sin hash: 'Cache-Control: no-cache' (se revalidan con ETag / 304)
+
+``ApiGZipMiddleware`` comprime solo las respuestas de la API: los montajes
+estáticos ya sirven sus variantes precomprimidas.
+"""
+
+import mimetypes
+import stat
+
+import anyio
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Preferencia de codificación: brotli primero, luego gzip
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# Montajes de PrecompressedStaticFiles (integration_server.py)
+STATIC_PREFIXES = ("/static/", "/js/", "/css/", "/assets/")
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles con soporte de archivos precomprimidos y caché inmutable"""
+
+    def __init__(self, *args, immutable: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+
+    async def get_response(self, path: str, scope) -> Response:
+        request_headers = Headers(scope=scope)
+        accept_encoding = request_headers.get("accept-encoding", "")
+
+        response = None
+        for encoding, suffix in ENCODINGS:
+            if encoding not in accept_encoding:
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+            if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+                continue
+
+            media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            response = FileResponse(
+                full_path,
+                stat_result=stat_result,
+                media_type=media_type,
+                headers={"Content-Encoding": encoding}
+            )
+            if self.is_not_modified(response.headers, request_headers):
+                response = Response(status_code=304, headers={
+                    name: value for name, value in response.headers.items()
+                    if name in ("etag", "last-modified", "content-encoding")
+                })
+            break
+
+        if response is None:
+            response = await super().get_response(path, scope)
+
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = self.cache_control
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+
+class ApiGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware que no toca los montajes estáticos (ni recomprime ni comprime en el event loop)"""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(STATIC_PREFIXES):
+            return await self.app(scope, receive, send)
+        return await super().__call__(scope, receive, send)
@@ -0,0 +1,295 @@
+# sync_endpoints.py - FEED INCREMENTAL DE CAMBIOS
+# -*- coding: utf-8 -*-
+"""
+Change Feed
+===========
+Cada flush que inserta, modifica o borra un ``License``, ``MedicalModule`` o
+``LicenseType`` escribe una entrada en ``change_log`` en la MISMA transacción
+(outbox): si la transacción hace rollback, el cambio tampoco aparece en el feed.
+
+``GET /sync/changes?since=<seq>`` devuelve en orden de secuencia las entradas
+posteriores a ``since``, compactadas: de cada entidad solo la última entrada
+(upsert con el estado completo o delete). Un consumidor guarda ``next_since`` y
+se sincroniza en O(cambios) en vez de releer las tablas.
+
+Los cambios hechos con sentencias en bloque (p. ej. concesión masiva de
+módulos) no pasan por el flush y registran sus entradas con
+``record_license_changes()``.
+
+Los contadores de validación (last_validation, validation_count,
+current_users) no generan entradas: cambian en cada validación y se actualizan
+con UPDATE directo, fuera del ORM.
+
+En PostgreSQL las entradas se escriben con un advisory lock de transacción para
+que las secuencias se confirmen en orden. Ese lock se toma antes del primer lock
+de fila de la transacción (si no, dos transacciones con varios flush se
+interbloquean): el ``before_flush`` que toca entidades registradas lo toma, y
+las sentencias en bloque y los ``SELECT ... FOR UPDATE`` previos a un cambio
+registrado llaman antes a ``lock_change_log()``.
+"""
+
+import asyncio
+import logging
+import os
+from collections.abc import MutableSequence
+from itertools import chain
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import event, func, insert, inspect, text
+from sqlalchemy.orm import Session, aliased
+
+from main import get_db, SessionLocal, License, MedicalModule, LicenseType, ChangeLog
+
+logger = logging.getLogger(__name__)
+
+sync_router = APIRouter(prefix="/sync", tags=["Sync"])
+
+ENTITY_LICENSE = "license"
+ENTITY_MODULE = "module"
+ENTITY_LICENSE_TYPE = "license_type"
+
+OP_UPSERT = "upsert"
+OP_DELETE = "delete"
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+COMPACT_SECONDS = int(os.getenv("SAPIENTIA_CHANGE_LOG_COMPACT_SECONDS", 3600))
+
+# Serializa la escritura del change_log en Postgres: las secuencias se confirman en orden
+CHANGE_LOG_ADVISORY_LOCK_KEY = 0x5A91E8
+
+# modelo -> (entidad, atributo clave, campos publicados)
+TRACKED = {
+    License: (ENTITY_LICENSE, "license_key", (
+        "license_key", "client_name", "client_email", "license_type", "hardware_fingerprint",
+        "issued_date", "expiry_date", "max_users", "allowed_modules", "is_active"
+    )),
+    MedicalModule: (ENTITY_MODULE, "name", (
+        "name", "display_name", "description", "version", "category", "is_core",
+        "min_license_level", "author", "license_prefix"
+    )),
+    LicenseType: (ENTITY_LICENSE_TYPE, "name", (
+        "name", "description", "max_users", "max_modules", "duration_days", "price", "features"
+    )),
+}
+
+# Campos publicados que no son columnas: atributo del que se toma el historial
+HISTORY_ATTRS = {"allowed_modules": "modules"}
+
+_LOCKED_KEY = "change_log_locked"
+
+# ============================================================================
+# CAPTURA (OUTBOX)
+# ============================================================================
+
+def _serialize(obj, fields) -> Dict[str, Any]:
+    data = {}
+    for field in fields:
+        value = getattr(obj, field)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, MutableSequence):
+            value = list(value)  # allowed_modules (association proxy)
+        data[field] = value
+    return data
+
+def _has_published_changes(obj, fields) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[HISTORY_ATTRS.get(field, field)].history.has_changes() for field in fields)
+
+def _collect_changes(session: Session) -> List[Dict[str, Any]]:
+    entries = []
+    for obj in session.new:
+        tracked = TRACKED.get(type(obj))
+        if tracked:
+            entity, key_attr, fields = tracked
+            entries.append({"entity": entity, "entity_key": getattr(obj, key_attr), "op": OP_UPSERT,
+                            "payload": _serialize(obj, fields)})
+
+    for obj in session.dirty:
+        tracked = TRACKED.get(type(obj))
+        if not tracked or not _has_published_changes(obj, tracked[2]):
+            continue
+        entity, key_attr, fields = tracked
+        # Cambio de clave (p.ej. renombrar un módulo): la clave anterior desaparece
+        for old_key in inspect(obj).attrs[key_attr].history.deleted or ():
+            if old_key is not None and old_key != getattr(obj, key_attr):
+                entries.append({"entity": entity, "entity_key": old_key, "op": OP_DELETE, "payload": None})
+        entries.append({"entity": entity, "entity_key": getattr(obj, key_attr), "op": OP_UPSERT,
+                        "payload": _serialize(obj, fields)})
+
+    for obj in session.deleted:
+        tracked = TRACKED.get(type(obj))
+        if tracked:
+            entity, key_attr, _ = tracked
+            key_history = inspect(obj).attrs[key_attr].history
+            key = (key_history.deleted or key_history.unchanged or [getattr(obj, key_attr)])[0]
+            entries.append({"entity": entity, "entity_key": key, "op": OP_DELETE, "payload": None})
+    return entries
+
+def lock_change_log(session: Session):
+    """Advisory lock del change_log (PostgreSQL), una vez por transacción
+    
+    Llamar antes de bloquear filas (UPDATE/DELETE en bloque, FOR UPDATE) en una
+    transacción que después registre cambios.
+    """
+    connection = session.connection()
+    if connection.dialect.name != "postgresql":
+        return
+    transaction = session.get_transaction()
+    if session.info.get(_LOCKED_KEY) is not transaction:
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CHANGE_LOG_ADVISORY_LOCK_KEY})
+        session.info[_LOCKED_KEY] = transaction
+
+def _touches_tracked(session: Session) -> bool:
+    for obj in chain(session.new, session.deleted):
+        if type(obj) in TRACKED:
+            return True
+    return any(type(obj) in TRACKED and _has_published_changes(obj, TRACKED[type(obj)][2]) for obj in session.dirty)
+
+def _insert_entries(session: Session, entries: List[Dict[str, Any]]):
+    # Normalmente ya tomado (before_flush o el llamador); aquí solo por si acaso
+    lock_change_log(session)
+    session.connection().execute(insert(ChangeLog), entries)
+
+@event.listens_for(Session, "before_flush")
+def _lock_before_flush(session, flush_context, instances):
+    # Antes de los INSERT/UPDATE/DELETE del flush, que bloquean filas
+    if _touches_tracked(session):
+        lock_change_log(session)
+
+@event.listens_for(Session, "after_flush")
+def _write_change_log(session, flush_context):
+    # En after_flush los defaults ya están aplicados y new/dirty/deleted aún reflejan el flush
+    entries = _collect_changes(session)
+    if entries:
+        _insert_entries(session, entries)
+
+def record_license_changes(db: Session, license_keys: List[str]) -> int:
+    """Entradas upsert de licencias modificadas con sentencias en bloque (fuera del ORM)
+    
+    Se llama antes del commit, en la misma transacción que el cambio.
+    """
+    entity, key_attr, fields = TRACKED[License]
+    licenses = (
+        db.query(License)
+        .filter(License.license_key.in_(license_keys))
+        .execution_options(populate_existing=True)
+        .all()
+    )
+    entries = [
+        {"entity": entity, "entity_key": getattr(obj, key_attr), "op": OP_UPSERT, "payload": _serialize(obj, fields)}
+        for obj in licenses
+    ]
+    if entries:
+        _insert_entries(db, entries)
+    return len(entries)
+
+# ============================================================================
+# CONSULTA Y COMPACTACIÓN
+# ============================================================================
+
+def changes_since(db: Session, since: int, limit: int, entities: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Entradas posteriores a since, solo la última de cada entidad, en orden de secuencia"""
+    newer = aliased(ChangeLog)
+    superseded = (
+        db.query(newer.id)
+        .filter(
+            newer.entity == ChangeLog.entity,
+            newer.entity_key == ChangeLog.entity_key,
+            newer.id > ChangeLog.id
+        )
+        .exists()
+    )
+    # Tope leído antes que las filas: lo confirmado después entra en la siguiente consulta
+    latest_seq = db.query(func.max(ChangeLog.id)).scalar() or 0
+    query = db.query(ChangeLog).filter(ChangeLog.id > since, ChangeLog.id <= latest_seq, ~superseded)
+    if entities:
+        query = query.filter(ChangeLog.entity.in_(entities))
+    rows = query.order_by(ChangeLog.id).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "since": since,
+        "next_since": rows[-1].id if has_more else max(since, latest_seq),
+        "latest_seq": latest_seq,
+        "has_more": has_more,
+        # since posterior a la última secuencia: la BD se restauró, el consumidor debe resincronizar desde 0
+        "reset_required": since > latest_seq,
+        "changes": [
+            {
+                "seq": row.id,
+                "entity": row.entity,
+                "key": row.entity_key,
+                "op": row.op,
+                "data": row.payload,
+                "changed_at": row.created_at.isoformat() if row.created_at else None
+            }
+            for row in rows
+        ]
+    }
+
+def compact_change_log(db: Session) -> int:
+    """Borra entradas reemplazadas por otra posterior de la misma entidad; devuelve cuántas"""
+    latest = (
+        db.query(func.max(ChangeLog.id))
+        .group_by(ChangeLog.entity, ChangeLog.entity_key)
+        .scalar_subquery()
+    )
+    deleted = db.query(ChangeLog).filter(ChangeLog.id.notin_(latest)).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def ensure_change_log_baseline(db: Session):
+    """Con el change_log vacío, registra el estado actual (datos anteriores al feed)"""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CHANGE_LOG_ADVISORY_LOCK_KEY})
+    if db.query(ChangeLog.id).first() is not None:
+        db.rollback()  # libera el advisory lock
+        return
+    entries = []
+    for model, (entity, key_attr, fields) in TRACKED.items():
+        for obj in db.query(model).all():
+            entries.append({"entity": entity, "entity_key": getattr(obj, key_attr), "op": OP_UPSERT,
+                            "payload": _serialize(obj, fields)})
+    if entries:
+        db.execute(insert(ChangeLog), entries)
+    db.commit()
+    logger.info(f"Change log inicializado con {len(entries)} entidades")
+
+async def compact_periodically():
+    """Tarea de fondo del worker: compacta el change_log cada COMPACT_SECONDS"""
+    loop = asyncio.get_running_loop()
+
+    def run():
+        db = SessionLocal()
+        try:
+            return compact_change_log(db)
+        finally:
+            db.close()
+
+    while True:
+        await asyncio.sleep(COMPACT_SECONDS)
+        try:
+            deleted = await loop.run_in_executor(None, run)
+            if deleted:
+                logger.info(f"Change log compactado: {deleted} entradas reemplazadas")
+        except Exception as e:
+            logger.error(f"Error compactando change log: {e}")
+
+# ============================================================================
+# ENDPOINTS
+# ============================================================================
+
+@sync_router.get("/changes", response_model=dict)
+def get_changes(
+    since: int = Query(0, ge=0, description="Última secuencia aplicada por el consumidor"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1),
+    entity: Optional[List[str]] = Query(None, description="license, module y/o license_type"),
+    db: Session = Depends(get_db)
+):
+    """Cambios de licencias y catálogo posteriores a since (compactados)"""
+    return changes_since(db, since, min(limit, MAX_PAGE_SIZE), entity)
@@ -8,53 +8,24 @@ Simula validaciones desde módulos Odoo
 
 import requests
 import json
-import platform
-import uuid
-import psutil
-import hashlib
-from datetime import datetime
 from typing import Dict, Any
 
+from license_client import HardwareInfoCache
+
 class MedicalLicenseClient:
     """Cliente para interactuar con el servidor de licencias médicas"""
     
-    def __init__(self, server_url: str = "http://localhost:8000"):
+    def __init__(self, server_url: str = "http://localhost:8000", timeout: float = 10.0):
         self.server_url = server_url.rstrip('/')
+        self.timeout = timeout
         self.session = requests.Session()
+        self.hardware_cache = HardwareInfoCache()
         
     def get_hardware_info(self) -> Dict[str, Any]:
         """Obtiene información del hardware actual"""
         try:
-            # MAC Address (primera interfaz de red)
-            mac_address = ':'.join(['{:02x}'.format((uuid.getnode() >> i) & 0xff) 
-                                   for i in range(0, 8*6, 8)][::-1])
-            
-            # Información del procesador
-            import cpuinfo
-            cpu_info = cpuinfo.get_cpu_info()
-            processor_id = cpu_info.get('brand_raw', 'Unknown CPU')
-            
-            # Información del sistema
-            os_info = f"{platform.system()} {platform.release()} {platform.machine()}"
-            hostname = platform.node()
-            
-            # Información de discos (primer disco)
-            disk_serial = "Unknown"
-            try:
-                partitions = psutil.disk_partitions()
-                if partitions:
-                    disk_serial = hashlib.md5(partitions[0].device.encode()).hexdigest()[:16]
-            except:
-                pass
-            
-            return {
-                "mac_address": mac_address,
-                "processor_id": processor_id,
-                "motherboard_serial": "Unknown",  # Difícil de obtener multiplataforma
-                "disk_serial": disk_serial,
-                "os_info": os_info,
-                "hostname": hostname
-            }
+            # Recolectada una vez por arranque y persistida en disco (ver license_client)
+            return self.hardware_cache.hardware_info()
         except Exception as e:
             print(f"Error obteniendo información de hardware: {e}")
             # Hardware de fallback para testing
@@ -70,7 +41,7 @@ class MedicalLicenseClient:
     def get_server_status(self) -> Dict[str, Any]:
         """Verifica el estado del servidor"""
         try:
-            response = self.session.get(f"{self.server_url}/health")
+            response = self.session.get(f"{self.server_url}/health", timeout=self.timeout)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -79,7 +50,7 @@ class MedicalLicenseClient:
     def get_license_types(self) -> Dict[str, Any]:
         """Obtiene tipos de licencia disponibles"""
         try:
-            response = self.session.get(f"{self.server_url}/license/types")
+            response = self.session.get(f"{self.server_url}/license/types", timeout=self.timeout)
             response.raise_for_status()
             return {"success": True, "data": response.json()}
         except requests.exceptions.RequestException as e:
@@ -88,7 +59,7 @@ class MedicalLicenseClient:
     def get_medical_modules(self) -> Dict[str, Any]:
         """Obtiene módulos médicos disponibles"""
         try:
-            response = self.session.get(f"{self.server_url}/license/modules")
+            response = self.session.get(f"{self.server_url}/license/modules", timeout=self.timeout)
             response.raise_for_status()
             return {"success": True, "data": response.json()}
         except requests.exceptions.RequestException as e:
@@ -116,7 +87,8 @@ class MedicalLicenseClient:
         try:
             response = self.session.post(
                 f"{self.server_url}/license/request",
-                json=license_request
+                json=license_request,
+                timeout=self.timeout
             )
             response.raise_for_status()
             return {"success": True, "data": response.json()}
@@ -146,7 +118,8 @@ class MedicalLicenseClient:
         try:
             response = self.session.post(
                 f"{self.server_url}/license/validate",
-                json=validation_request
+                json=validation_request,
+                timeout=self.timeout
             )
             response.raise_for_status()
             return {"success": True, "data": response.json()}
@@ -156,7 +129,7 @@ class MedicalLicenseClient:
     def get_license_info(self, license_key: str) -> Dict[str, Any]:
         """Obtiene información detallada de una licencia"""
         try:
-            response = self.session.get(f"{self.server_url}/license/info/{license_key}")
+            response = self.session.get(f"{self.server_url}/license/info/{license_key}", timeout=self.timeout)
             response.raise_for_status()
             return {"success": True, "data": response.json()}
         except requests.exceptions.RequestException as e:
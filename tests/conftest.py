@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Configuración común de los tests
+================================
+Base de datos SQLite temporal: se fija antes de que ningún test importe main.
+Con ``DATABASE_URL`` definida se usa esa (por ejemplo un PostgreSQL de pruebas);
+los datos sembrados llevan prefijo propio y se borran al terminar.
+
+``SAPIENTIA_TEST_LICENSES`` fija el tamaño de la siembra de ``seeded_licenses``
+(los planes de consulta se parecen más a los de producción con más filas).
+"""
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='sapientia-tests-')}/tests.db")
+
+SEED_PREFIX = "SEED-"
+SEED_LICENSES = int(os.getenv("SAPIENTIA_TEST_LICENSES", 5000))
+SEED_VALIDATIONS_PER_LICENSE = 5
+
+
+def seed_licenses(db, prefix: str, count: int, validations_per_license: int = 0):
+    """Licencias con módulos (una de cada 50 también medical_pharmacy) y validaciones"""
+    from sqlalchemy import insert
+    from main import License, LicenseModule, LicenseValidation
+
+    now = datetime.utcnow()
+    db.execute(insert(License), [
+        {
+            "license_key": f"{prefix}{i:06d}",
+            "client_name": f"Clínica {i}",
+            "client_email": f"seed{i}@example.com",
+            "license_type": "professional",
+            "hardware_fingerprint": f"{i:064x}",
+            "issued_date": now - timedelta(minutes=i),
+            "expiry_date": now + timedelta(days=(i % 730) - 60),
+            "max_users": 50,
+            "is_active": i % 10 != 0
+        }
+        for i in range(count)
+    ])
+    db.execute(insert(LicenseModule), [
+        {"license_key": f"{prefix}{i:06d}", "module_name": name}
+        for i in range(count)
+        for name in (("medical_base", "medical_pharmacy") if i % 50 == 0 else ("medical_base",))
+    ])
+    if validations_per_license:
+        db.execute(insert(LicenseValidation), [
+            {
+                "license_key": f"{prefix}{i % count:06d}",
+                "module_name": "medical_base",
+                "hardware_fingerprint": "x",
+                "validation_time": now - timedelta(minutes=i),
+                "validation_result": "success"
+            }
+            for i in range(count * validations_per_license)
+        ])
+    db.commit()
+    return [f"{prefix}{i:06d}" for i in range(count)]
+
+
+def cleanup_licenses(db, prefix: str):
+    from main import License, LicenseModule, LicenseValidation, SeatLease
+
+    pattern = f"{prefix}%"
+    db.query(LicenseValidation).filter(LicenseValidation.license_key.like(pattern)).delete(synchronize_session=False)
+    db.query(SeatLease).filter(SeatLease.license_key.like(pattern)).delete(synchronize_session=False)
+    db.query(LicenseModule).filter(LicenseModule.license_key.like(pattern)).delete(synchronize_session=False)
+    db.query(License).filter(License.license_key.like(pattern)).delete(synchronize_session=False)
+    db.commit()
+
+
+@pytest.fixture(scope="session")
+def database():
+    """Engine de main con las tablas creadas"""
+    from main import Base, engine
+
+    Base.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def db(database):
+    from main import SessionLocal
+
+    session = SessionLocal()
+    yield session
+    session.rollback()
+    session.close()
+
+
+@pytest.fixture(scope="session")
+def seeded_licenses(database):
+    """Claves de SEED_LICENSES licencias sembradas con validaciones, con estadísticas actualizadas"""
+    from sqlalchemy import text
+    from main import SessionLocal
+
+    db = SessionLocal()
+    try:
+        cleanup_licenses(db, SEED_PREFIX)
+        keys = seed_licenses(db, SEED_PREFIX, SEED_LICENSES, SEED_VALIDATIONS_PER_LICENSE)
+        if database.dialect.name == "postgresql":
+            db.execute(text("ANALYZE licenses"))
+            db.execute(text("ANALYZE license_validations"))
+        else:
+            db.execute(text("ANALYZE"))
+        db.commit()
+        yield keys
+    finally:
+        db.rollback()
+        cleanup_licenses(db, SEED_PREFIX)
+        db.close()
+
+
+@pytest.fixture
+def license_factory(database):
+    """Crea licencias con un prefijo dado y las borra al terminar el test"""
+    from main import SessionLocal
+
+    prefixes = []
+
+    def create(prefix: str, count: int = 1):
+        prefixes.append(prefix)
+        db = SessionLocal()
+        try:
+            cleanup_licenses(db, prefix)
+            return seed_licenses(db, prefix, count)
+        finally:
+            db.close()
+
+    yield create
+    db = SessionLocal()
+    try:
+        for prefix in prefixes:
+            cleanup_licenses(db, prefix)
+    finally:
+        db.close()
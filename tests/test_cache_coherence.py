@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Coherencia de la caché de dos niveles entre workers
+===================================================
+Dos ``TwoTierCache`` (cache.py) que comparten L2 reproducen las carreras entre
+invalidación y recarga:
+
+- el aviso del bus llega a un worker antes de que el proceso de origen borre
+  L2: ese worker no debe recargar el valor viejo desde L2;
+- una invalidación llega mientras un loader lee la base de datos: el valor
+  leído antes del cambio no debe quedar en L1 ni en L2 (tampoco en get_many);
+- con Redis caído la caché sigue funcionando solo con L1.
+
+Usa fakeredis, o un redis-server real con ``SAPIENTIA_TEST_REDIS_URL``.
+"""
+
+import os
+import uuid
+
+import pytest
+
+from cache import TwoTierCache
+
+NS = "coherence"
+REDIS_URL = os.getenv("SAPIENTIA_TEST_REDIS_URL")
+
+
+@pytest.fixture
+def workers():
+    """Dos cachés con el mismo L2 y un prefijo propio del test"""
+    prefix = f"sapientia:test-{uuid.uuid4().hex[:8]}:"
+    if REDIS_URL:
+        return [TwoTierCache(redis_url=REDIS_URL, prefix=prefix) for _ in range(2)]
+
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    workers = []
+    for _ in range(2):
+        worker = TwoTierCache(redis_url="redis://fakeredis", prefix=prefix)
+        worker._client = fakeredis.FakeStrictRedis(server=server)
+        workers.append(worker)
+    return workers
+
+
+def test_shared_l2(workers):
+    a, b = workers
+    a.set(NS, "shared", {"v": 1})
+    assert b.get(NS, "shared", lambda: {"v": "loader"}) == {"v": 1}
+
+
+def test_notice_before_l2_delete(workers):
+    """El worker B recibe el cambio antes de que A (origen) borre L2"""
+    a, b = workers
+    a.set(NS, "k1", {"v": "old"})
+    b.get(NS, "k1")
+    # Commit en la base de datos y aviso en B; A aún no ha borrado L2
+    b.invalidate(NS, "k1")
+    assert b.get(NS, "k1", lambda: {"v": "new"}) == {"v": "new"}
+    # Llega el borrado del origen: nadie debe ver el valor viejo
+    a.invalidate(NS, "k1", shared=True)
+    assert a.get(NS, "k1", lambda: {"v": "new"}) == {"v": "new"}
+
+
+def test_invalidation_during_load(workers):
+    """El loader lee antes del commit y la invalidación llega antes de que guarde"""
+    a, b = workers
+    calls = []
+
+    def loader():
+        calls.append(1)
+        if len(calls) == 1:
+            # Lectura anterior al commit; el cambio se confirma y se avisa durante la carga
+            a.invalidate(NS, "k2", shared=True)
+            b.invalidate(NS, "k2")
+            return {"v": "old"}
+        return {"v": "new"}
+
+    assert a.get(NS, "k2", loader) == {"v": "new"}
+    assert len(calls) == 2
+    assert b.get(NS, "k2", lambda: {"v": "loader"}) != {"v": "old"}
+
+
+def test_invalidation_during_every_load(workers):
+    a, b = workers
+
+    def always_invalidated():
+        a.invalidate(NS, "k3", shared=True)
+        return {"v": "racing"}
+
+    a.get(NS, "k3", always_invalidated)
+    assert a.get(NS, "k3") is None
+    assert b.get(NS, "k3") is None
+
+
+def test_invalidation_during_get_many(workers):
+    a, b = workers
+    loads = []
+
+    def many_loader(keys):
+        loads.append(list(keys))
+        if len(loads) == 1:
+            a.invalidate(NS, "m2", shared=True)
+            return {key: {"v": "old"} for key in keys}
+        return {key: {"v": "new"} for key in keys}
+
+    assert a.get_many(NS, ["m1", "m2"], many_loader) == {"m1": {"v": "new"}, "m2": {"v": "new"}}
+    assert b.get(NS, "m2") != {"v": "old"}
+
+
+def test_degraded_without_redis(workers):
+    class BrokenRedis:
+        def __getattr__(self, name):
+            def fail(*args, **kwargs):
+                raise ConnectionError("Redis caído")
+            return fail
+
+    a = workers[0]
+    a._client = BrokenRedis()
+    assert a.get(NS, "k4", lambda: {"v": "l1"}) == {"v": "l1"}
+    assert a.get(NS, "k4") == {"v": "l1"}
+    assert not a.l2_available
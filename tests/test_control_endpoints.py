@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""Avisos de invalidación de los cambios de módulos en bloque"""
+
+import invalidation
+from control_endpoints import _publish_module_changes
+from invalidation import change_keys
+from license_events import EVENT_MODULES_CHANGED
+
+
+def test_module_changes_publish_one_notice(license_factory, db):
+    keys = license_factory("MODS-", 3)
+    _publish_module_changes(db, keys, {"granted_modules": ["medical_pharmacy"]})
+
+    pending = db.info[invalidation._PENDING_KEY]
+    assert len(pending) == 1
+    assert pending[0]["event_type"] == EVENT_MODULES_CHANGED
+    assert change_keys(pending[0]) == keys
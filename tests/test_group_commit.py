@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Group commit
+============
+Escrituras concurrentes por ``GroupCommitter.run`` (group_commit.py), una de
+ellas con una clave de licencia duplicada:
+
+- las escrituras correctas quedan confirmadas y cada llamador recibe su resultado;
+- solo el llamador de la escritura fallida recibe la excepción;
+- las invalidaciones de la escritura fallida se descartan.
+"""
+
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pytest
+
+import group_commit
+from group_commit import GroupCommitter
+from invalidation import invalidation_bus, SCOPE_LICENSE
+from main import License, SessionLocal
+from tests.conftest import cleanup_licenses
+
+GC_PREFIX = "GC-"
+
+
+def new_license(license_key: str) -> License:
+    return License(
+        license_key=license_key,
+        client_name="Prueba de group commit",
+        client_email="gc@example.com",
+        license_type="professional",
+        hardware_fingerprint="0" * 64,
+        expiry_date=datetime.utcnow() + timedelta(days=30),
+        max_users=1,
+        allowed_modules=["medical_base"]
+    )
+
+
+@pytest.fixture
+def committer(database, monkeypatch):
+    monkeypatch.setattr(group_commit, "ENABLED", True)
+    monkeypatch.setattr(invalidation_bus, "_handlers", defaultdict(list))
+    committer = GroupCommitter(SessionLocal)
+    yield committer
+    committer.stop()
+    db = SessionLocal()
+    try:
+        cleanup_licenses(db, GC_PREFIX)
+    finally:
+        db.close()
+
+
+def test_savepoint_outside_transaction(db, committer):
+    # Forma de _apply_group: SAVEPOINT sin transacción abierta y escritura dentro
+    with db.begin_nested():
+        db.add(new_license(f"{GC_PREFIX}SAVEPOINT"))
+    db.commit()
+    assert db.query(License).filter(License.license_key == f"{GC_PREFIX}SAVEPOINT").count() == 1
+
+
+@pytest.mark.parametrize("writes", [1, 20, 100])
+async def test_failed_write_only_fails_its_caller(committer, writes):
+    delivered = []
+    invalidation_bus.subscribe(SCOPE_LICENSE, lambda change: delivered.append(change["key"]))
+
+    keys = [f"{GC_PREFIX}{n:04d}" for n in range(writes)]
+    duplicate = keys[writes // 2]
+
+    def write_for(license_key: str):
+        def write(db):
+            db.add(new_license(license_key))
+            invalidation_bus.publish(db, SCOPE_LICENSE, license_key)
+            db.flush()
+            return license_key
+        return write
+
+    sessions = [SessionLocal() for _ in range(writes + 1)]
+    try:
+        calls = [committer.run(db, write_for(key)) for db, key in zip(sessions, keys)]
+        calls.append(committer.run(sessions[-1], write_for(duplicate)))
+        results = await asyncio.gather(*calls, return_exceptions=True)
+    finally:
+        for db in sessions:
+            db.close()
+    # Entregas pendientes del event loop
+    await asyncio.sleep(0)
+
+    assert results[:-1] == keys
+    assert isinstance(results[-1], Exception)
+
+    db = SessionLocal()
+    try:
+        stored = {key for (key,) in db.query(License.license_key).filter(License.license_key.in_(keys))}
+    finally:
+        db.close()
+    assert stored == set(keys)
+    assert sorted(delivered) == sorted(keys)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Caché de resultados del cliente SDK (license_client.py)"""
+
+import json
+import threading
+
+import httpx
+
+from license_client import AsyncSapientiaLicenseClient, LicenseResultCache
+
+LICENSE_KEY = "CLIENT-TEST"
+HARDWARE = {"mac_address": "00:11:22:33:44:55", "processor_id": "p", "os_info": "linux", "hostname": "h"}
+
+
+class ThreadRecordingCache(LicenseResultCache):
+    """Anota el hilo desde el que se usa la caché"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = []
+
+    def _update(self, apply):
+        self.threads.append(threading.current_thread())
+        super()._update(apply)
+
+
+def validation_server(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/license/seat/release":
+        return httpx.Response(200, json={"released": True})
+    modules = json.loads(request.read())["module_names"]
+    return httpx.Response(200, json={"results": {
+        name: {"license_key": LICENSE_KEY, "module_name": name, "valid": True, "next_check_after": 600}
+        for name in modules
+    }})
+
+
+async def test_async_client_keeps_cache_writes_off_the_event_loop(tmp_path):
+    client = AsyncSapientiaLicenseClient("http://licenses", cache_path=None)
+    client.cache = ThreadRecordingCache(tmp_path / "cache.json")
+    client.client = httpx.AsyncClient(base_url="http://licenses", transport=httpx.MockTransport(validation_server))
+    try:
+        results = await client.validate_modules(LICENSE_KEY, ["medical_clinic"], HARDWARE)
+        assert results["medical_clinic"]["valid"]
+        assert await client.release_seat(LICENSE_KEY)
+    finally:
+        await client.aclose()
+
+    assert len(client.cache.threads) == 2
+    assert threading.main_thread() not in client.cache.threads
+
+
+def valid_result(module_name: str) -> dict:
+    return {"license_key": LICENSE_KEY, "module_name": module_name, "valid": True, "next_check_after": 600}
+
+
+def test_eviction_in_another_process_is_seen(tmp_path):
+    # Dos procesos cliente con el mismo archivo
+    worker_a = LicenseResultCache(tmp_path / "cache.json")
+    worker_b = LicenseResultCache(tmp_path / "cache.json")
+    worker_a.store([valid_result("medical_clinic")])
+    assert worker_b.get_fresh(LICENSE_KEY, "medical_clinic") is not None
+
+    # A recibe la revocación por SSE; B no debe seguir sirviendo el resultado
+    worker_a.evict(LICENSE_KEY)
+    assert worker_b.get_fresh(LICENSE_KEY, "medical_clinic") is None
+    assert worker_b.get(LICENSE_KEY, "medical_clinic") is None
+
+
+def test_concurrent_writers_keep_each_others_entries(tmp_path):
+    worker_a = LicenseResultCache(tmp_path / "cache.json")
+    worker_b = LicenseResultCache(tmp_path / "cache.json")
+    worker_a.store([valid_result("medical_clinic")])
+    worker_b.store([valid_result("medical_clinic_dashboard")])
+
+    reader = LicenseResultCache(tmp_path / "cache.json")
+    assert reader.get(LICENSE_KEY, "medical_clinic") is not None
+    assert reader.get(LICENSE_KEY, "medical_clinic_dashboard") is not None
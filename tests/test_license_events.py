@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Reanudación del canal SSE de eventos de licencia (license_events.py)"""
+
+from license_client import _SSEParser
+from license_events import EVENT_REVOKED, broker, stream_license_events
+
+LICENSE_KEY = "EVENTS-TEST"
+
+
+def parse(frame: str) -> dict:
+    parser = _SSEParser()
+    for line in frame.split("\n"):
+        event = parser.feed(line)
+        if event is not None:
+            return event
+    raise AssertionError(f"Trama SSE incompleta: {frame!r}")
+
+
+def disconnected_after(frames: int):
+    """is_disconnected que corta el stream tras emitir 'frames' tramas"""
+    state = {"sent": 0}
+
+    async def is_disconnected():
+        state["sent"] += 1
+        return state["sent"] > frames
+
+    return is_disconnected
+
+
+async def collect(last_event_id, frames: int) -> list:
+    stream = stream_license_events(LICENSE_KEY, last_event_id, disconnected_after(frames), heartbeat_seconds=0.01)
+    return [parse(frame) async for frame in stream if not frame.startswith(":")]
+
+
+async def test_connected_frame_carries_an_id():
+    events = await collect(None, 0)
+    assert events[0]["event"] == "connected"
+    assert events[0]["id"] == broker.event_id(broker.sequence)
+
+
+async def test_revoke_while_disconnected_is_replayed_after_reconnect():
+    # El cliente se desconecta sin haber recibido ningún evento real
+    first = await collect(None, 0)
+    last_event_id = first[0]["id"]
+
+    broker.publish(LICENSE_KEY, EVENT_REVOKED, {"reason": "deactivated"})
+
+    events = await collect(last_event_id, 0)
+    assert [event["event"] for event in events] == ["connected", EVENT_REVOKED]
+    assert events[1]["id"] == broker.event_id(broker.sequence)
+
+
+async def test_connected_keeps_the_received_id_while_replaying():
+    first = await collect(None, 0)
+    broker.publish(LICENSE_KEY, EVENT_REVOKED)
+
+    events = await collect(first[0]["id"], 0)
+    # Un corte justo después del 'connected' vuelve a reanudar desde el mismo punto
+    assert events[0]["id"] == first[0]["id"]
+
+
+async def test_foreign_event_id_gets_a_resync():
+    broker.publish(LICENSE_KEY, EVENT_REVOKED)
+    events = await collect("otro-worker-3", 0)
+    assert [event["event"] for event in events] == ["connected", "resync"]
+    assert broker.parse_event_id(events[1]["id"]) is not None
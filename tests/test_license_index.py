@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Índice compartido de licencias (license_index.py)"""
+
+import time
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import license_index
+from license_index import SharedLicenseIndex
+
+
+def row(license_key: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        license_key=license_key,
+        client_name="Clínica índice",
+        license_type="standard",
+        hardware_fingerprint="ab" * 32,
+        expiry_date=datetime.utcnow() + timedelta(days=30),
+        max_users=5,
+        current_users=0,
+        allowed_modules=["medical_clinic"]
+    )
+
+
+@pytest.fixture
+def index(monkeypatch):
+    monkeypatch.setattr(license_index, "ENABLED", True)
+    index = SharedLicenseIndex(prefix=f"sapientia_test_{uuid.uuid4().hex[:8]}", capacity=64)
+    assert index.publish([row("IDX-0001")], time.time())
+    yield index
+    index.unlink()
+
+
+def test_indexed_license_is_answered(index):
+    state = index.lookup("IDX-0001")
+    assert state["allowed_modules"] == ["medical_clinic"]
+    assert state["hardware_fingerprint"] == "ab" * 32
+
+
+def test_license_issued_after_the_build_falls_through(index):
+    # Emitida en otro worker: el índice no la tiene y no debe responder "no existe"
+    assert index.lookup("IDX-0002") is None
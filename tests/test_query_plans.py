@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Regresiones de planes de consulta
+=================================
+EXPLAIN de las consultas frecuentes de los routers (métodos de los modelos)
+sobre la base de datos sembrada: ninguna debe recorrer secuencialmente una tabla
+grande (Seq Scan en PostgreSQL, ``SCAN <tabla>`` sin índice en SQLite).
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func
+
+from tests.conftest import SEED_PREFIX
+from expiry import BATCH_SIZE
+from main import License, LicenseModule, LicenseValidation
+
+# Tablas que no deben recorrerse enteras
+LARGE_TABLES = {"licenses", "license_validations"}
+
+KEY = f"{SEED_PREFIX}000042"
+
+
+def count(db, query):
+    # Forma de Query.count(): SELECT count(*) FROM (consulta)
+    return db.query(func.count()).select_from(query.subquery())
+
+
+# nombre -> consulta(db, now) tal como la construye el endpoint
+HOT_QUERIES = {
+    "license_endpoints.request_license: License.active_for_hardware":
+        lambda db, now: License.active_for_hardware(db, "f" * 64).limit(1),
+    "license_endpoints._license_state: License.validatable_by_key":
+        lambda db, now: License.validatable_by_key(db, KEY).limit(1),
+    "license_endpoints.get_license_info: LicenseValidation.for_license":
+        lambda db, now: count(db, LicenseValidation.for_license(db, KEY)),
+    "license_endpoints.get_license_info: LicenseValidation.for_license (7 días)":
+        lambda db, now: count(db, LicenseValidation.for_license(db, KEY, since=now - timedelta(days=7))),
+    "control_endpoints.compute_dashboard_stats: License.expired_before":
+        lambda db, now: count(db, License.expired_before(db, now)),
+    "control_endpoints.compute_dashboard_stats: LicenseValidation.after (24 h)":
+        lambda db, now: count(db, LicenseValidation.after(db, now - timedelta(hours=24))),
+    "control_endpoints.get_expiring_licenses: License.expiring (30 días)":
+        lambda db, now: License.expiring(db, now, now + timedelta(days=30)).order_by(License.expiry_date).limit(100),
+    "control_endpoints.get_expiring_licenses: License.expiring (conteo por día)":
+        lambda db, now: License.expiring(db, now, now + timedelta(days=30), License.expiry_date),
+    "expiry.ExpirySweeper.sweep: License.expired_batch":
+        lambda db, now: License.expired_batch(db, now, BATCH_SIZE),
+    # Consulta de la relación (lazy="selectin"), generada por el ORM
+    "License.modules: módulos de la licencia (selectin)":
+        lambda db, now: db.query(LicenseModule).filter(LicenseModule.license_key.in_([KEY])),
+    "control_endpoints.get_licenses_page: License.listing con un módulo":
+        lambda db, now: count(db, License.listing(db, now, module="medical_pharmacy").order_by(None)),
+    "control_endpoints.get_licenses_page: License.listing, primera página":
+        lambda db, now: License.listing(db, now).offset(0).limit(100),
+}
+
+
+def explain(db, query):
+    """Devuelve (plan legible, [tablas recorridas secuencialmente])"""
+    connection = db.connection()
+    dialect = connection.dialect
+    # IN (...) con los parámetros ya expandidos
+    compiled = query.statement.compile(dialect=dialect, compile_kwargs={"render_postcompile": True})
+
+    if dialect.name == "postgresql":
+        row = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+        plan = row if isinstance(row, list) else json.loads(row)
+        scans = []
+
+        def walk(node):
+            if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") in LARGE_TABLES:
+                scans.append(node["Relation Name"])
+            for child in node.get("Plans", ()):
+                walk(child)
+
+        walk(plan[0]["Plan"])
+        return json.dumps(plan[0]["Plan"], indent=1)[:2000], scans
+
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+    details = [row[-1] for row in rows]
+    scans = [
+        detail.split()[1] for detail in details
+        if detail.startswith("SCAN ") and "INDEX" not in detail and detail.split()[1] in LARGE_TABLES
+    ]
+    return "\n".join(details), scans
+
+
+@pytest.mark.parametrize("name", list(HOT_QUERIES))
+def test_hot_query_uses_index(seeded_licenses, db, name):
+    plan, scans = explain(db, HOT_QUERIES[name](db, datetime.utcnow()))
+    assert not scans, f"recorrido secuencial de {', '.join(scans)}:\n{plan}"
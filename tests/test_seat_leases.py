@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrencia de puestos arrendados
+==================================
+Validadores concurrentes (un hilo y una conexión por sesión) contra una licencia
+con pocos puestos; nunca se conceden más puestos de los contratados:
+
+1. Ráfaga: todas las sesiones piden puesto a la vez; se conceden como mucho
+   ``seats`` y cada puesto a una sola sesión.
+2. Rotación: las sesiones adquieren, renuevan, liberan o dejan vencer
+   arrendamientos cortos. Ningún puesto está en manos de dos sesiones a la vez y
+   un hilo monitor nunca ve más puestos ocupados que los contratados.
+"""
+
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from seats import SeatLeases
+
+STRESS_PREFIX = "STRESS-"
+LEASE_SECONDS = 1
+CHURN_SECONDS = 2
+
+
+@pytest.fixture
+def session_factory(database):
+    """Sesiones con un pool del tamaño de la prueba (el del servidor es más pequeño)"""
+    if database.dialect.name == "sqlite":
+        yield sessionmaker(bind=database)
+        return
+    stress_engine = create_engine(database.url, pool_size=64, max_overflow=0)
+    yield sessionmaker(bind=stress_engine)
+    stress_engine.dispose()
+
+
+@pytest.fixture
+def license_key(license_factory):
+    return license_factory(STRESS_PREFIX)[0]
+
+
+def overlaps(intervals):
+    """Concesiones de un mismo puesto a sesiones distintas que se solapan en el tiempo"""
+    conflicts = []
+    for slot, grants in intervals.items():
+        # Renovaciones de la misma sesión: un solo intervalo. La renovación sustituye el
+        # fin anterior, y si después se libera, el fin queda recortado al de la liberación
+        merged = []
+        for start, end, session_id in sorted(grants):
+            if merged and merged[-1][2] == session_id and start <= merged[-1][1]:
+                merged[-1][1] = end
+            else:
+                merged.append([start, end, session_id])
+        for previous, current in zip(merged, merged[1:]):
+            if current[0] < previous[1] and current[2] != previous[2]:
+                conflicts.append((slot, previous[2], current[2], previous[1] - current[0]))
+    return conflicts
+
+
+def run_threads(target, count: int, *extra):
+    threads = [threading.Thread(target=target, args=(n,)) for n in range(count)]
+    threads += [threading.Thread(target=fn) for fn in extra]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+@pytest.mark.parametrize("validators,seats", [(10, 2), (30, 5)])
+def test_burst_never_oversells(session_factory, license_key, validators, seats):
+    barrier = threading.Barrier(validators)
+    grants, errors = [], []
+    lock = threading.Lock()
+
+    def validator(index: int):
+        db = session_factory()
+        try:
+            barrier.wait()
+            grant = SeatLeases.acquire(db, license_key, f"burst-{index}", seats, LEASE_SECONDS)
+            db.commit()
+            if grant is not None:
+                with lock:
+                    grants.append(grant)
+        except Exception as e:
+            db.rollback()
+            with lock:
+                errors.append(f"{type(e).__name__}: {e}")
+        finally:
+            db.close()
+
+    run_threads(validator, validators)
+
+    slots = [grant.slot for grant in grants]
+    assert not errors
+    assert 0 < len(grants) <= seats
+    assert len(set(slots)) == len(slots)
+
+
+@pytest.mark.parametrize("validators,seats", [(10, 2), (30, 5)])
+def test_churn_never_overlaps(session_factory, license_key, validators, seats):
+    intervals = defaultdict(list)  # slot -> [(inicio, fin, sesión)]
+    counts = defaultdict(int)
+    errors, samples = [], []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + CHURN_SECONDS
+
+    def validator(index: int):
+        db = session_factory()
+        session_id = f"churn-{index}"
+        rng = random.Random(index)
+        try:
+            while time.monotonic() < stop_at:
+                try:
+                    grant = SeatLeases.acquire(db, license_key, session_id, seats, LEASE_SECONDS)
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    with lock:
+                        errors.append(f"{type(e).__name__}: {e}")
+                    continue
+                if grant is None:
+                    time.sleep(rng.uniform(0, 0.05))
+                    continue
+
+                end = grant.expires_at
+                action = rng.random()
+                time.sleep(rng.uniform(0, LEASE_SECONDS * 0.5))
+                if action < 0.4:
+                    # Cierre ordenado: el puesto deja de ser suyo como muy pronto ahora
+                    end = min(end, datetime.utcnow())
+                    SeatLeases.release(db, license_key, session_id)
+                    db.commit()
+                elif action < 0.6:
+                    # La sesión desaparece y el arrendamiento vence solo
+                    time.sleep(LEASE_SECONDS)
+                # Si no, la siguiente vuelta renueva
+                with lock:
+                    counts["granted"] += 1
+                    intervals[grant.slot].append((grant.expires_at - timedelta(seconds=LEASE_SECONDS), end, session_id))
+        finally:
+            db.close()
+
+    def monitor():
+        db = session_factory()
+        try:
+            while time.monotonic() < stop_at:
+                samples.append(SeatLeases.in_use(db, license_key, seats))
+                db.rollback()
+                time.sleep(0.05)
+        finally:
+            db.close()
+
+    run_threads(validator, validators, monitor)
+
+    assert not errors
+    assert counts["granted"] > 0
+    assert overlaps(intervals) == []
+    assert max(samples) <= seats
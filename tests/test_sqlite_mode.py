@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Lock de escritura de sqlite_mode.py: propiedad por conexión y espera entre procesos"""
+
+import fcntl
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+from sqlalchemy import text
+
+from sqlite_mode import WriterLock, create_sqlite_engine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_sqlite_engine(f"sqlite:///{tmp_path / 'writer.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+    yield engine
+    engine.dispose()
+
+
+def test_second_writer_on_same_thread_fails_fast(engine):
+    # Dos sesiones en el hilo del event loop: la segunda no puede esperar a la primera
+    with engine.connect() as first, engine.connect() as second:
+        first.execute(text("INSERT INTO items (name) VALUES ('a')"))
+        started = time.monotonic()
+        with pytest.raises(Exception, match="database is locked"):
+            second.execute(text("INSERT INTO items (name) VALUES ('b')"))
+        assert time.monotonic() - started < 1
+        first.commit()
+
+    with engine.connect() as conn:
+        conn.execute(text("INSERT INTO items (name) VALUES ('c')"))
+        conn.commit()
+        assert conn.execute(text("SELECT count(*) FROM items")).scalar() == 2
+
+
+def test_writer_on_other_thread_waits_for_commit(engine):
+    errors = []
+
+    def write():
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("INSERT INTO items (name) VALUES ('thread')"))
+                conn.commit()
+        except Exception as e:
+            errors.append(e)
+
+    with engine.connect() as conn:
+        conn.execute(text("INSERT INTO items (name) VALUES ('main')"))
+        thread = threading.Thread(target=write)
+        thread.start()
+        time.sleep(0.2)
+        assert thread.is_alive()
+        conn.commit()
+    thread.join(timeout=5)
+
+    assert not errors
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM items")).scalar() == 2
+
+
+def hold_flock(path: str) -> int:
+    """Otro worker con el flock: un descriptor propio basta (flock es por descripción abierta)"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    return fd
+
+
+def test_waits_for_other_process_without_polling(tmp_path):
+    lock = WriterLock(str(tmp_path / "db.writer.lock"))
+    fd = hold_flock(lock.path)
+    threading.Timer(0.2, lambda: fcntl.flock(fd, fcntl.LOCK_UN)).start()
+
+    started = time.monotonic()
+    lock.acquire(object(), timeout=5)
+    assert 0.15 < time.monotonic() - started < 2
+    lock.release()
+    os.close(fd)
+
+
+def test_timeout_leaves_flock_free_once_granted(tmp_path):
+    lock = WriterLock(str(tmp_path / "db.writer.lock"))
+    fd = hold_flock(lock.path)
+    with pytest.raises(sqlite3.OperationalError):
+        lock.acquire(object(), timeout=0.1)
+
+    # La espera abandonada se concede al soltar el otro worker y se libera sola
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    lock.acquire(object(), timeout=2)
+    with pytest.raises(BlockingIOError):
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    lock.release()
+    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    os.close(fd)
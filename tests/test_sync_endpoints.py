@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Orden del advisory lock del change_log respecto a los locks de fila"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+import sync_endpoints
+from main import License, LicenseValidation
+
+
+@pytest.fixture
+def trace(database, monkeypatch):
+    """Secuencia de 'lock' (advisory lock) y sentencias SQL ejecutadas"""
+    events = []
+    monkeypatch.setattr(sync_endpoints, "lock_change_log", lambda session: events.append("lock"))
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        events.append(statement.split(None, 1)[0].upper())
+
+    event.listen(database, "before_cursor_execute", record)
+    yield events
+    event.remove(database, "before_cursor_execute", record)
+
+
+def new_license() -> License:
+    return License(
+        license_key=f"TEST-{uuid.uuid4().hex[:12]}", client_name="Clínica", client_email="c@example.com",
+        license_type="standard", hardware_fingerprint=uuid.uuid4().hex,
+        expiry_date=datetime.utcnow() + timedelta(days=30)
+    )
+
+
+def test_lock_precedes_first_flush_statement(db, trace):
+    license_obj = new_license()
+    db.add(license_obj)
+    db.flush()
+    assert trace[0] == "lock"
+    assert "INSERT" in trace[1:]
+
+    # Segundo flush de la misma transacción: el lock ya se tomó antes de sus filas
+    trace.clear()
+    license_obj.client_name = "Otra clínica"
+    db.flush()
+    assert trace.index("lock") < trace.index("UPDATE")
+
+
+def test_untracked_flush_does_not_lock(db, trace):
+    db.add(LicenseValidation(license_key="TEST-NONE", hardware_fingerprint="hw", module_name="medical_clinic",
+                             validation_result="valid"))
+    db.flush()
+    assert "lock" not in trace
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""Respuestas de validación de LicenseRules"""
+
+from utils import LicenseRules, RevalidationScheduler
+
+
+def test_error_response_schedules_next_check():
+    response = LicenseRules.error_response("SAP-ERROR-KEY", "medical_clinic")
+    assert response["valid"] is False
+    assert response["next_check_after"] == RevalidationScheduler.next_check_after("SAP-ERROR-KEY")
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Carga de validaciones
+=====================
+Reproduce la carga de /license/validate con la caché fría (lectura de la
+licencia, INSERT en license_validations y UPDATE de contadores en un commit)
+con N hilos concurrentes contra la base de datos de los tests. Ninguna ronda
+debe fallar: con SQLite, ningún "database is locked".
+"""
+
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func
+
+from main import License, LicenseValidation, SessionLocal
+
+LOAD_SECONDS = 1
+USER_AGENT = "test_validation_load"
+
+
+def validation_round(db, license_key: str):
+    """Misma secuencia de sentencias que _run_validations con la caché fría"""
+    record = db.query(License).filter(License.license_key == license_key, License.is_active == True).first()
+    db.add(LicenseValidation(
+        license_key=license_key,
+        module_name="medical_base",
+        hardware_fingerprint=record.hardware_fingerprint,
+        ip_address="127.0.0.1",
+        user_agent=USER_AGENT,
+        validation_result="success"
+    ))
+    db.query(License).filter(License.license_key == license_key).update({
+        License.last_validation: datetime.utcnow(),
+        License.validation_count: func.coalesce(License.validation_count, 0) + 1
+    }, synchronize_session=False)
+    db.commit()
+
+
+@pytest.mark.parametrize("threads", [1, 8, 32])
+def test_concurrent_validations_do_not_fail(seeded_licenses, threads):
+    # Solo licencias activas (una de cada diez está desactivada)
+    keys = [key for n, key in enumerate(seeded_licenses) if n % 10 != 0]
+    rounds, errors = [], []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + LOAD_SECONDS
+
+    def worker(index: int):
+        db = SessionLocal()
+        i = index
+        try:
+            while time.monotonic() < stop_at:
+                key = keys[i % len(keys)]
+                i += threads
+                started = time.perf_counter()
+                try:
+                    validation_round(db, key)
+                    with lock:
+                        rounds.append(time.perf_counter() - started)
+                except Exception as e:
+                    db.rollback()
+                    with lock:
+                        errors.append(f"{type(e).__name__}: {e}")
+        finally:
+            db.close()
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    db = SessionLocal()
+    try:
+        db.query(LicenseValidation).filter(LicenseValidation.user_agent == USER_AGENT).delete(
+            synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    assert not errors, sorted(set(errors))[:5]
+    assert rounds
@@ -11,8 +11,10 @@ import json
 class UniversalLicenseExamples:
     """Ejemplos de licenciamiento para diferentes industrias"""
     
-    def __init__(self, server_url="http://localhost:8000"):
+    def __init__(self, server_url="http://localhost:8000", timeout=10):
         self.server_url = server_url
+        self.timeout = timeout
+        self.session = requests.Session()
     
     # ============================================================================
     # EJEMPLO 1: MÓDULO DE RETAIL/COMERCIO
@@ -39,7 +41,7 @@ class UniversalLicenseExamples:
             ]
         }
         
-        response = requests.post(f"{self.server_url}/license/request", json=license_data)
+        response = self.session.post(f"{self.server_url}/license/request", json=license_data, timeout=self.timeout)
         if response.status_code == 200:
             license_info = response.json()
             print(f"✅ Licencia retail creada: {license_info['license_key']}")
@@ -52,7 +54,7 @@ class UniversalLicenseExamples:
                 "user_count": 3
             }
             
-            validation = requests.post(f"{self.server_url}/license/validate", json=validation_data)
+            validation = self.session.post(f"{self.server_url}/license/validate", json=validation_data, timeout=self.timeout)
             if validation.status_code == 200:
                 result = validation.json()
                 print(f"✅ Validación POS: {result['message']}")
@@ -84,7 +86,7 @@ class UniversalLicenseExamples:
             ]
         }
         
-        response = requests.post(f"{self.server_url}/license/request", json=license_data)
+        response = self.session.post(f"{self.server_url}/license/request", json=license_data, timeout=self.timeout)
         if response.status_code == 200:
             license_info = response.json()
             print(f"✅ Licencia bancaria creada: {license_info['license_key']}")
@@ -116,7 +118,7 @@ class UniversalLicenseExamples:
             ]
         }
         
-        response = requests.post(f"{self.server_url}/license/request", json=license_data)
+        response = self.session.post(f"{self.server_url}/license/request", json=license_data, timeout=self.timeout)
         if response.status_code == 200:
             license_info = response.json()
             print(f"✅ Licencia manufactura creada: {license_info['license_key']}")
@@ -147,7 +149,7 @@ class UniversalLicenseExamples:
             ]
         }
         
-        response = requests.post(f"{self.server_url}/license/request", json=license_data)
+        response = self.session.post(f"{self.server_url}/license/request", json=license_data, timeout=self.timeout)
         if response.status_code == 200:
             license_info = response.json()
             print(f"✅ Licencia educativa creada: {license_info['license_key']}")
@@ -162,6 +164,17 @@ class UniversalLicenseExamples:
 class OdooUniversalLicenseValidator:
     """Validador universal para cualquier módulo Odoo"""
     
+    # Un cliente por servidor: reutiliza conexiones y caché entre módulos
+    _clients = {}
+    
+    @classmethod
+    def get_client(cls, license_server):
+        from license_client import SapientiaLicenseClient
+        
+        if license_server not in cls._clients:
+            cls._clients[license_server] = SapientiaLicenseClient(license_server)
+        return cls._clients[license_server]
+    
     @staticmethod
     def validate_module_license(module_name, license_server="http://license-server:8000"):
         """
@@ -184,31 +197,20 @@ class OdooUniversalLicenseValidator:
             return super().create(vals)
         """
         
-        import subprocess
         import platform
-        import psutil
         import socket
+        from license_client import get_hardware_info
         
         # Obtener información del hardware
         try:
-            # MAC Address
-            import uuid
-            mac = ':'.join(['{:02x}'.format((uuid.getnode() >> i) & 0xff) 
-                           for i in range(0, 8*6, 8)][::-1])
-            
-            # Información del sistema
-            import cpuinfo
-            cpu_info = cpuinfo.get_cpu_info()
-            processor_id = cpu_info.get('brand_raw', 'Unknown CPU')
-            
-            os_info = f"{platform.system()} {platform.release()}"
-            hostname = socket.gethostname()
+            # MAC y procesador desde la caché (cpuinfo solo se consulta una vez por arranque)
+            cached = get_hardware_info()
             
             hardware_info = {
-                "mac_address": mac,
-                "processor_id": processor_id,
-                "os_info": os_info,
-                "hostname": hostname
+                "mac_address": cached["mac_address"],
+                "processor_id": cached["processor_id"],
+                "os_info": f"{platform.system()} {platform.release()}",
+                "hostname": socket.gethostname()
             }
             
             # Obtener license key desde configuración Odoo
@@ -235,29 +237,21 @@ class OdooUniversalLicenseValidator:
                 print(f"❌ Error obteniendo license key: {e}")
                 return False
             
-            # Validar con servidor de licencias
-            validation_data = {
-                "license_key": license_key,
-                "module_name": module_name,
-                "hardware_info": hardware_info,
-                "user_count": 1  # Se puede obtener dinámicamente
-            }
+            # Validar con servidor de licencias (SDK con pool, reintentos y caché offline)
+            from license_client import LicenseServerUnavailable
             
-            import requests
-            response = requests.post(f"{license_server}/license/validate", 
-                                   json=validation_data, 
-                                   timeout=10)
+            try:
+                client = OdooUniversalLicenseValidator.get_client(license_server)
+                result = client.validate(license_key, module_name, hardware_info, user_count=1)
+            except LicenseServerUnavailable as e:
+                print(f"❌ Error servidor de licencias: {e}")
+                return False
             
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('valid', False):
-                    print(f"✅ Licencia válida para {module_name}")
-                    return True
-                else:
-                    print(f"❌ Licencia inválida para {module_name}: {result.get('error', 'Unknown')}")
-                    return False
+            if result.get('valid', False):
+                print(f"✅ Licencia válida para {module_name}{' (caché)' if result.get('cached') else ''}")
+                return True
             else:
-                print(f"❌ Error servidor de licencias: {response.status_code}")
+                print(f"❌ Licencia inválida para {module_name}: {result.get('error', 'Unknown')}")
                 return False
                 
         except Exception as e:
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import hashlib
+import os
 import secrets
 from datetime import datetime
 from schemas import HardwareInfo
@@ -39,12 +40,143 @@ class SecurityManager:
         similarity = common_chars / max(len(stored_fingerprint), len(current_fingerprint))
         return similarity >= 0.85
 
+class LoadMonitor:
+    """Contador de requests en curso del worker (medida de carga para el servidor)"""
+    
+    def __init__(self):
+        self.in_flight = 0
+    
+    def enter(self):
+        self.in_flight += 1
+    
+    def exit(self):
+        self.in_flight -= 1
+
+load_monitor = LoadMonitor()
+
+class RevalidationScheduler:
+    """Calcula cuándo debe revalidar cada cliente (next_check_after)
+    
+    El intervalo base se desplaza con un jitter determinista por licencia, de modo
+    que los workers de distintos clientes no revalidan al mismo tiempo, y se estira
+    cuando el servidor tiene más requests en curso de lo esperado.
+    """
+    
+    BASE_SECONDS = int(os.getenv("SAPIENTIA_REVALIDATE_SECONDS", 3600))
+    JITTER_FRACTION = float(os.getenv("SAPIENTIA_REVALIDATE_JITTER", 0.25))
+    TARGET_IN_FLIGHT = int(os.getenv("SAPIENTIA_TARGET_IN_FLIGHT", 32))
+    MAX_STRETCH = float(os.getenv("SAPIENTIA_REVALIDATE_MAX_STRETCH", 6))
+    
+    @classmethod
+    def jitter_factor(cls, license_key: str) -> float:
+        """Factor en [1 - J, 1 + J) derivado de la clave de licencia"""
+        digest = hashlib.sha256(license_key.encode()).digest()
+        unit = int.from_bytes(digest[:8], "big") / 2 ** 64
+        return 1 + cls.JITTER_FRACTION * (2 * unit - 1)
+    
+    @classmethod
+    def load_stretch(cls, in_flight: int) -> float:
+        """1.0 con carga normal; crece linealmente al superar el objetivo"""
+        if cls.TARGET_IN_FLIGHT <= 0 or in_flight <= cls.TARGET_IN_FLIGHT:
+            return 1.0
+        return min(cls.MAX_STRETCH, in_flight / cls.TARGET_IN_FLIGHT)
+    
+    @classmethod
+    def next_check_after(cls, license_key: str, in_flight: int = None) -> int:
+        """Segundos que el cliente debe esperar antes de volver a validar"""
+        if in_flight is None:
+            in_flight = load_monitor.in_flight
+        return int(cls.BASE_SECONDS * cls.jitter_factor(license_key) * cls.load_stretch(in_flight))
+
+class LicenseRules:
+    """Reglas de validación sin acceso a BD (servidor central y validador de borde)
+    
+    ``license_record`` es cualquier objeto con los atributos del estado de una
+    licencia (client_name, license_type, hardware_fingerprint, expiry_date,
+    max_users, current_users, allowed_modules) o None si no existe/está inactiva.
+    """
+    
+    @staticmethod
+    def check(license_record, module_name: str, current_fingerprint: str, user_count: int):
+        """Devuelve el mensaje de error de la validación o None si la licencia es válida"""
+        if not license_record:
+            return "Licencia no encontrada o inactiva"
+        if datetime.utcnow() > license_record.expiry_date:
+            return "Licencia expirada"
+        if not SecurityManager.validate_hardware_match(
+            license_record.hardware_fingerprint, current_fingerprint
+        ):
+            return "Hardware no coincide con la licencia"
+        if module_name not in license_record.allowed_modules:
+            return f"Módulo '{module_name}' no permitido en esta licencia"
+        return LicenseRules.check_users(license_record, user_count)
+    
+    @staticmethod
+    def check_users(license_record, user_count: int):
+        """Regla de límite de usuarios (la única que depende del cliente y no de la licencia)"""
+        if license_record.max_users > 0 and user_count > license_record.max_users:
+            return f"Excede límite de usuarios ({license_record.max_users})"
+        return None
+    
+    @staticmethod
+    def response(license_key: str, module_name: str, license_record, error_message) -> dict:
+        """Construye la respuesta pública de una validación"""
+        next_check_after = RevalidationScheduler.next_check_after(license_key)
+        if error_message is None:
+            return {
+                "valid": True,
+                "license_key": license_key,
+                "module_name": module_name,
+                "client_name": license_record.client_name,
+                "license_type": license_record.license_type,
+                "expires_at": license_record.expiry_date.isoformat(),
+                "max_users": license_record.max_users,
+                "current_users": license_record.current_users,
+                "allowed_modules": license_record.allowed_modules,
+                "next_check_after": next_check_after,
+                "message": "Licencia válida"
+            }
+        return {
+            "valid": False,
+            "license_key": license_key,
+            "module_name": module_name,
+            "error": error_message,
+            "next_check_after": next_check_after,
+            "message": "Validación de licencia fallida"
+        }
+    
+    @staticmethod
+    def error_response(license_key: str, module_name: str, error: str = "Error interno del servidor") -> dict:
+        return {
+            "valid": False,
+            "license_key": license_key,
+            "module_name": module_name,
+            "error": error,
+            "next_check_after": RevalidationScheduler.next_check_after(license_key),
+            "message": "Error al validar licencia"
+        }
+
+# Clave del advisory lock de Postgres que serializa la carga inicial entre procesos
+SEED_ADVISORY_LOCK_KEY = 0x5A91E7
+
 def populate_initial_data(db):
-    """Populate initial license types and modules"""
+    """Populate initial license types and modules
+    
+    Seguro con varios workers o nodos arrancando a la vez: en Postgres un advisory
+    lock de transacción serializa la carga y los demás encuentran los datos ya
+    insertados; en SQLite, si otro proceso insertó primero, el commit falla por
+    unicidad y se descarta.
+    """
     from main import LicenseType, MedicalModule
+    from sqlalchemy import text
+    from sqlalchemy.exc import IntegrityError
+    
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SEED_ADVISORY_LOCK_KEY})
     
     # Verificar si ya existen datos
     if db.query(LicenseType).count() > 0:
+        db.rollback()  # libera el advisory lock
         return
     
     # Tipos de licencia iniciales
@@ -117,5 +249,42 @@ def populate_initial_data(db):
         module = MedicalModule(**mod_data)
         db.add(module)
     
-    db.commit()
-    print("✅ Datos iniciales cargados")
\ No newline at end of file
+    try:
+        db.commit()
+    except IntegrityError:
+        # Otro proceso cargó los mismos datos primero
+        db.rollback()
+        return
+    print("✅ Datos iniciales cargados")
+
+
+# Clave del advisory lock de Postgres que serializa las migraciones entre procesos
+MIGRATION_ADVISORY_LOCK_KEY = 0x5A91E9
+
+def run_migrations():
+    """Aplica las migraciones de Alembic pendientes (alembic upgrade head)
+    
+    create_all solo crea tablas nuevas; columnas e índices añadidos a tablas
+    existentes llegan por migraciones. Con varios workers o nodos arrancando a la
+    vez, en Postgres un advisory lock de sesión deja migrar a uno solo.
+    """
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import text
+    from main import engine
+    
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    config = Config(os.path.join(base_dir, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(base_dir, "migrations"))
+    config.attributes["configure_logger"] = False
+    
+    if engine.dialect.name != "postgresql":
+        command.upgrade(config, "head")
+        return
+    
+    with engine.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_ADVISORY_LOCK_KEY})
+        try:
+            command.upgrade(config, "head")
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_ADVISORY_LOCK_KEY})